@@ -45,7 +45,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'smartapp.statement_timeout.StatementTimeoutMiddleware',
+    'smartapp.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'smartapp.db_routers.ReplicaStickinessMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -73,21 +76,189 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'smart.wsgi.application'
 
+# Route submit_order, submit_feedback and the feedback API to their async
+# views. Turn on when serving smart.asgi:application (e.g. with uvicorn);
+# under WSGI each async view would need an event loop of its own.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '0') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Connection handling is tuned through environment variables:
+#   DB_CONN_MAX_AGE          seconds to keep a connection open between requests
+#                            (0 closes it after every request)
+#   DB_POOL                  set to 1 to use psycopg's built-in connection pool
+#                            instead of persistent connections (psycopg 3 only)
+#   DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE / DB_POOL_TIMEOUT
+#   DB_STATEMENT_TIMEOUT_MS  server-side cap on any single statement run by a
+#                            web worker (0 disables); management commands and
+#                            migrations run without it
+
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+DB_POOL = os.environ.get('DB_POOL', '0') == '1'
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 5000))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'smartrestaurant',
-        'USER': 'postgres',
-        'PASSWORD': '0000',
-        'HOST': 'localhost',
-        'PORT': '5432',
+        'NAME': os.environ.get('DB_NAME', 'smartrestaurant'),
+        'USER': os.environ.get('DB_USER', 'postgres'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', '0000'),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        # Pooled connections are returned to the pool after each request, so
+        # Django must not also hold them open.
+        'CONN_MAX_AGE': 0 if DB_POOL else DB_CONN_MAX_AGE,
+        # Ping reused connections before a request so a dropped server
+        # connection fails over to a fresh one instead of erroring.
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
     }
 }
 
+if DB_POOL:
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+        'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    }
+
+# Read replica for analytics views and exports (see smartapp/db_routers.py).
+# Set DB_REPLICA_HOST to a streaming replica of the default database; without
+# it every read stays on default. Locally, DB_SQLITE_REPLICA below sets up the
+# same with two SQLite files.
+if os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = dict(
+        DATABASES['default'],
+        HOST=os.environ['DB_REPLICA_HOST'],
+        PORT=os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        OPTIONS=dict(DATABASES['default']['OPTIONS']),
+    )
+
+# Local development and tests on SQLite files instead of PostgreSQL: DB_SQLITE
+# names the default database file and DB_SQLITE_REPLICA, optionally, a second
+# file used as the replica (kept a copy of the first by hand; the test runner
+# creates a fresh database for each).
+if os.environ.get('DB_SQLITE'):
+    DATABASES = {
+        'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / os.environ['DB_SQLITE']},
+    }
+    if os.environ.get('DB_SQLITE_REPLICA'):
+        DATABASES['replica'] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / os.environ['DB_SQLITE_REPLICA']}
+
+DATABASE_ROUTERS = ['smartapp.db_routers.ReplicaRouter']
+DATABASE_REPLICA_ALIAS = 'replica'
+# How long a client that just wrote keeps reading from default
+DATABASE_REPLICA_STICKY_SECONDS = 10
+
+
+# Cache
+# Local memory per process in development; set REDIS_URL to share one cache
+# across all workers in production.
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+            'KEY_PREFIX': 'smart',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'smart-default',
+        }
+    }
+
+# Server-side lifetime of cached public pages, in seconds
+PAGE_CACHE_TIMEOUT = 600
+# Browser/CDN max-age for cached public pages, in seconds
+PAGE_CACHE_MAX_AGE = 300
+# Bump (or set RELEASE) on deploy so pages cached by the previous release are ignored
+PAGE_CACHE_VERSION = os.environ.get('RELEASE', '1')
+
+# Rate limiting of public submissions (smartapp.rate_limit).
+# Set RATE_LIMIT_ENABLED=0 for load tests from a single client
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') == '1'
+# Requests allowed per (requests, seconds) sliding window, per scope and key
+RATE_LIMITS = {
+    'submit_order': {
+        'ip': (30, 60),
+        'session': (10, 60),
+        'table': (6, 300),
+    },
+    'submit_feedback': {
+        'ip': (10, 60),
+        'session': (3, 300),
+    },
+}
+# Reverse proxies that append to X-Forwarded-For; 0 trusts REMOTE_ADDR only
+RATE_LIMIT_PROXY_COUNT = int(os.environ.get('RATE_LIMIT_PROXY_COUNT', 0))
+# Keys each process keeps token buckets and known blocks for
+RATE_LIMIT_LOCAL_KEYS = 10000
+
+# Live table state for the floor view (smartapp.table_state)
+# Tables are numbered 1..TABLE_COUNT; orders for other numbers aren't tracked
+TABLE_COUNT = int(os.environ.get('TABLE_COUNT', 30))
+# Open orders older than this were never closed and are ignored when a worker rebuilds its state
+TABLE_OPEN_ORDER_HOURS = 12
+
+# Sales analytics (smartapp.analytics)
+# Days the dashboard shows when no range is given
+ANALYTICS_DEFAULT_DAYS = 30
+# Longest date range one report may cover
+ANALYTICS_MAX_DAYS = 366
+# Reports are also dropped when any order changes, so this only bounds staleness of cache entries
+ANALYTICS_CACHE_TIMEOUT = 3600
+# Orders at one table less than this many minutes apart count as one seating
+ANALYTICS_SEATING_GAP_MINUTES = 45
+
+# Dish demand forecasts for kitchen prep (smartapp.forecasting)
+# Days of order history each nightly forecast is fitted on; whole weeks are used
+FORECAST_HISTORY_DAYS = 364
+# Weight of the latest week in each dish's weekday x hour profile
+FORECAST_PROFILE_SMOOTHING = 0.1
+# Weight of the latest day in the recent-demand level the profile is scaled by
+FORECAST_LEVEL_SMOOTHING = 0.1
+# Portions a weekday needs before its own hourly shape outweighs the dish's whole-week shape
+FORECAST_PROFILE_PRIOR = 20.0
+# Finished days replayed by the backtest_demand_forecast command
+FORECAST_BACKTEST_DAYS = 28
+# Best-selling dishes listed individually in the backtest report
+FORECAST_BACKTEST_TOP_DISHES = 10
+
+# Seconds the in-process feedback search index (used when the database isn't
+# PostgreSQL) goes between rebuilds; other workers' edits and deletes trigger
+# one sooner through the shared cache, and without REDIS_URL this is how long
+# they can go unseen
+FEEDBACK_SEARCH_MAX_AGE = 600
+
+# Rows fetched per database round trip by CSV/XLSX exports (smartapp.exports)
+EXPORT_CHUNK_SIZE = 2000
+
+# Discount vouchers (smartapp.vouchers)
+VOUCHER_VALID_DAYS = 90
+# Codes the in-process bloom filter is sized for before it is rebuilt larger
+VOUCHER_FILTER_CAPACITY = 10000
+# Share of made-up codes the filter lets through to the database
+VOUCHER_FILTER_ERROR_RATE = 0.001
+# Seconds between the filter's catch-up reads when the cache isn't shared
+# (no REDIS_URL); bounds how long another worker's new voucher is refused
+VOUCHER_FILTER_MAX_AGE = 30
+# Vouchers flagged per UPDATE by the expire_vouchers command
+VOUCHER_EXPIRY_BATCH_SIZE = 1000
+
+# Response compression (smartapp.compression.CompressionMiddleware).
+# Responses smaller than this many bytes are sent as they are
+COMPRESSION_MIN_SIZE = 1024
+# Compressed besides text/*
+COMPRESSION_CONTENT_TYPES = ('application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+# Brotli quality 0-11; 5 compresses better than gzip -6 at a similar CPU cost
+COMPRESSION_BROTLI_QUALITY = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -143,6 +314,35 @@ STATICFILES_DIRS = [
 
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Responsive image variants generated by `manage.py build_static`
+STATIC_VARIANTS_DIR = BASE_DIR / 'static_variants'
+STATIC_IMAGE_SOURCES = [BASE_DIR / 'static', BASE_DIR / 'images']
+STATIC_IMAGE_WIDTHS = [160, 480, 960, 1600]
+STATIC_IMAGE_FORMATS = ['avif', 'webp', 'jpeg']
+
+if STATIC_VARIANTS_DIR.exists():
+    STATICFILES_DIRS.append(STATIC_VARIANTS_DIR)
+
+# Content-hashed filenames (via collectstatic) so static files can be cached forever
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'smartapp.storage.HashedStaticStorage',
+    },
+}
+
+MEDIA_URL = '/media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Local copies of FoodItem.img (see smartapp/menu_images.py)
+MENU_IMAGE_DIR = 'menu_images'
+# (width, height) thumbnails; the second is the 2x version of the menu card
+MENU_IMAGE_SIZES = [(200, 140), (400, 280)]
+# Fetch a FoodItem's image in the background as soon as its URL is saved
+MENU_IMAGE_FETCH_ON_SAVE = True
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -176,3 +376,63 @@ LOGGING = {
         },
     },
 }
+
+# Wait time estimation
+# Parallel cooking stations the kitchen backlog is spread over
+KITCHEN_STATIONS = 4
+# Prep minutes assumed for dishes without enough KDS history
+WAIT_TIME_DEFAULT_PREP = 15
+# Extra minutes per additional item in an order and per queued item ahead of it
+WAIT_TIME_ITEM_MINUTES = 2
+# Upper bound for a single estimate, in minutes
+WAIT_TIME_MAX = 90
+# Finished orders needed before a dish's learned prep time replaces the default
+WAIT_TIME_MIN_SAMPLES = 3
+# Weight of the newest sample in the rolling prep-time average
+WAIT_TIME_SMOOTHING = 0.2
+# Most portions of one dish the kitchen cooks together in a single batch
+KITCHEN_BATCH_SIZE = 10
+# Seconds before the in-process kitchen queue and floor view are rebuilt from
+# the database. Other workers' order writes trigger a rebuild sooner through
+# the shared cache; without REDIS_URL this is how long they can go unseen.
+ORDER_STATE_MAX_AGE = 30
+
+# Aspect-level sentiment
+# Feedback processed per bulk write by the extract_aspects command
+ASPECT_BATCH_SIZE = 500
+# Minimum extraction throughput per core (texts/sec) for typical reviews of
+# under 50 words; extract_aspects --benchmark reports against it
+ASPECT_TARGET_TEXTS_PER_SEC = 10000
+
+# Feedback rescoring after a model retrain
+# Checkpoints and flip reports, one subdirectory per model fingerprint
+RESCORE_CHECKPOINT_DIR = BASE_DIR / 'rescore'
+# Worker processes; None uses every CPU
+RESCORE_WORKERS = None
+# Rows scored and written per bulk_update
+RESCORE_CHUNK_SIZE = 1000
+
+# Sentiment model artifacts
+# Directory holding sentiment_model.pkl, sentiment_vectorizer.pkl and sentiment_model.json
+SENTIMENT_MODEL_DIR = BASE_DIR / 'smartapp'
+# How often a worker checks the artifacts for a newly deployed model, in seconds
+SENTIMENT_MODEL_POLL_SECONDS = 5
+
+# Shadow scoring of a candidate sentiment model
+# Directory with a candidate model's artifacts; unset disables shadow scoring
+SENTIMENT_SHADOW_MODEL_DIR = os.environ.get('SENTIMENT_SHADOW_MODEL_DIR') or None
+# Background threads scoring with the candidate
+SENTIMENT_SHADOW_WORKERS = 1
+# Feedback waiting for shadow scoring; more than this is dropped, never waited on
+SENTIMENT_SHADOW_QUEUE_SIZE = 1000
+
+# Sentiment inference executor
+# 'inline' scores in the request's own thread; 'process' uses a pool of
+# long-lived worker processes so inference doesn't hold the web worker's GIL
+SENTIMENT_EXECUTOR = os.environ.get('SENTIMENT_EXECUTOR', 'inline')
+# Worker processes in the pool
+SENTIMENT_EXECUTOR_WORKERS = int(os.environ.get('SENTIMENT_EXECUTOR_WORKERS', 2))
+# Most texts sent to a worker in one batch
+SENTIMENT_EXECUTOR_BATCH = 32
+# Seconds a request waits for a score before carrying on with sentiment=None
+SENTIMENT_EXECUTOR_TIMEOUT = float(os.environ.get('SENTIMENT_EXECUTOR_TIMEOUT', 2.0))
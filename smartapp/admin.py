@@ -1,8 +1,10 @@
+from django import forms
 from django.contrib import admin
-from .models import Order, OrderItem, FoodItem, Feedback, DiscountVoucher
+from .models import Order, OrderItem, FoodItem, Feedback, FeedbackAspect, DiscountVoucher, DishForecast, ALLERGEN_CHOICES
 from django.utils.html import format_html
 from django.db import models
 from django.utils import timezone
+from .feedback_search import filter_feedback
 
 # Inline for OrderItem in Order admin
 class OrderItemInline(admin.TabularInline):
@@ -11,13 +13,42 @@ class OrderItemInline(admin.TabularInline):
     readonly_fields = ('total_price',)
     fields = ('item_name', 'category', 'quantity', 'unit_price', 'total_price', 'notes')
 
+# Inline for FeedbackAspect in Feedback admin
+class FeedbackAspectInline(admin.TabularInline):
+    model = FeedbackAspect
+    extra = 0
+    fields = ('aspect', 'polarity')
+
+class FoodItemForm(forms.ModelForm):
+    # The allergens bitmask, edited as a checkbox per allergen
+    allergens = forms.TypedMultipleChoiceField(
+        choices=ALLERGEN_CHOICES, coerce=int, required=False, widget=forms.CheckboxSelectMultiple,
+    )
+
+    class Meta:
+        model = FoodItem
+        fields = '__all__'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.initial['allergens'] = [bit for bit, _ in ALLERGEN_CHOICES if self.instance.allergens & bit]
+
+    def clean_allergens(self):
+        return sum(self.cleaned_data['allergens'])
+
+
 @admin.register(FoodItem)
 class FoodItemAdmin(admin.ModelAdmin):
-    list_display = ['name', 'price', 'category']
+    form = FoodItemForm
+    list_display = ['name', 'price', 'category', 'allergen_list']
     list_filter = ['category']
     search_fields = ['name']
     ordering = ['category', 'name']
 
+    @admin.display(description='Allergens')
+    def allergen_list(self, obj):
+        return ', '.join(obj.allergen_labels())
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ['id', 'customer_name', 'table_number', 'food_item', 'get_items', 'total_amount', 'status', 'order_time']
@@ -39,22 +70,39 @@ class OrderItemAdmin(admin.ModelAdmin):
 
 @admin.register(Feedback)
 class FeedbackAdmin(admin.ModelAdmin):
-    list_display = ['id', 'customer_name', 'category', 'rating', 'feedback_text', 'sentiment', 'confidence', 'created_at']
-    list_filter = ['category', 'rating', 'sentiment', 'created_at']
+    list_display = ['id', 'customer_name', 'category', 'rating', 'feedback_text', 'sentiment', 'confidence', 'emotion', 'created_at']
+    list_filter = ['category', 'rating', 'sentiment', 'emotion', 'model_version', 'created_at']
     search_fields = ['customer_name', 'feedback_text']
     ordering = ['-created_at']
     readonly_fields = ['created_at']
+    inlines = [FeedbackAspectInline]
+
+    def get_search_results(self, request, queryset, search_term):
+        # Names and feedback text both go through the search index
+        if not search_term:
+            return super().get_search_results(request, queryset, search_term)
+        return filter_feedback(queryset, search_term), False
 
 
 @admin.register(DiscountVoucher)
 class DiscountVoucherAdmin(admin.ModelAdmin):
-    list_display = ['voucher_code', 'customer_name', 'discount_percentage', 'is_used', 'created_at', 'used_at']
-    list_filter = ['is_used', 'discount_percentage', 'created_at']
+    list_display = ['voucher_code', 'customer_name', 'discount_percentage', 'is_used', 'is_expired', 'created_at', 'expires_at', 'used_at', 'order']
+    list_filter = ['is_used', 'is_expired', 'discount_percentage', 'created_at']
     search_fields = ['customer_name', 'voucher_code']
     ordering = ['-created_at']
     readonly_fields = ['created_at', 'voucher_code']
+    raw_id_fields = ['order']
     
     def get_readonly_fields(self, request, obj=None):
         if obj:  # editing an existing object
             return self.readonly_fields + ['feedback', 'customer_name', 'discount_percentage']
         return self.readonly_fields
+
+
+@admin.register(DishForecast)
+class DishForecastAdmin(admin.ModelAdmin):
+    list_display = ['date', 'item_name', 'category', 'total', 'created_at']
+    list_filter = ['date', 'category']
+    search_fields = ['item_name']
+    ordering = ['-date', '-total']
+    readonly_fields = ['date', 'item_name', 'category', 'hourly', 'total', 'created_at']
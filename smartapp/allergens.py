@@ -0,0 +1,125 @@
+"""
+Allergen tags and allergy conflict checks
+Free-text allergies are matched against a synonym table compiled into one
+regex, and dishes carry their allergens as bitmasks, so checking a cart
+against an allergy is one AND per item
+"""
+
+import re
+import threading
+from functools import lru_cache
+
+from .models import ALLERGEN_CHOICES, FoodItem
+from .caching import menu_version
+from .menu_search import normalize
+
+# Allergen codes for menu files: 'tree_nuts' for "Tree nuts"
+CODES = {label.lower().replace(' ', '_'): bit for bit, label in ALLERGEN_CHOICES}
+ALL_ALLERGENS = sum(CODES.values())
+
+# Words customers use for each allergen, as normalize() leaves them. A word
+# may stand for several: "nuts" rules out peanuts and tree nuts alike.
+SYNONYMS = {
+    'gluten': ['gluten', 'wheat', 'flour', 'maida', 'atta', 'barley', 'rye', 'semolina', 'celiac', 'coeliac', 'bread', 'pasta', 'noodle'],
+    'crustaceans': ['crustacean', 'shellfish', 'seafood', 'shrimp', 'prawn', 'crab', 'lobster'],
+    'eggs': ['egg', 'mayonnaise', 'mayo'],
+    'fish': ['fish', 'seafood', 'anchovy', 'tuna', 'salmon'],
+    'peanuts': ['peanut', 'groundnut', 'nut'],
+    'tree_nuts': ['tree nut', 'nut', 'almond', 'cashew', 'walnut', 'pistachio', 'hazelnut', 'pecan', 'macadamia'],
+    'milk': ['milk', 'dairy', 'lactose', 'cheese', 'butter', 'cream', 'paneer', 'ghee', 'yogurt', 'yoghurt', 'curd', 'dahi', 'casein', 'whey'],
+    'soy': ['soy', 'soya', 'soybean', 'bhatmas', 'tofu'],
+    'sesame': ['sesame', 'til', 'tahini'],
+    'mustard': ['mustard'],
+    'celery': ['celery', 'celeriac'],
+    'sulphites': ['sulphite', 'sulfite', 'sulphur dioxide', 'sulfur dioxide'],
+    'lupin': ['lupin', 'lupine'],
+    'molluscs': ['mollusc', 'mollusk', 'shellfish', 'seafood', 'squid', 'octopus', 'mussel', 'oyster', 'clam'],
+}
+
+
+def _compile(synonyms):
+    masks = {}
+    for code, words in synonyms.items():
+        for word in words:
+            masks[word] = masks.get(word, 0) | CODES[code]
+    # Longest first, so "tree nut" wins over "nut"; plurals match too
+    alternatives = '|'.join(re.escape(word) for word in sorted(masks, key=len, reverse=True))
+    return re.compile(rf'\b({alternatives})(?:s|es)?\b'), masks
+
+
+_PATTERN, _WORD_MASKS = _compile(SYNONYMS)
+
+
+@lru_cache(maxsize=1024)
+def allergy_mask(text):
+    """
+    ALLERGEN_CHOICES bits mentioned in free-text allergy input
+    """
+    mask = 0
+    for match in _PATTERN.finditer(' '.join(normalize(text))):
+        mask |= _WORD_MASKS[match.group(1)]
+    return mask
+
+
+def parse_codes(value):
+    """
+    An allergen list from a menu file, as a list of codes or a string
+    separated by commas, semicolons or pipes, to a bitmask; ValueError for
+    unknown codes
+    """
+    if not value:
+        return 0
+    if isinstance(value, str):
+        value = re.split(r'[,;|]', value)
+    mask = 0
+    for code in value:
+        code = str(code).strip().lower().replace(' ', '_')
+        if not code:
+            continue
+        if code not in CODES:
+            raise ValueError(f"Unknown allergen: {code} (expected one of {', '.join(CODES)})")
+        mask |= CODES[code]
+    return mask
+
+
+class AllergenIndex:
+    """
+    Allergen bits of every dish, keyed by name and rebuilt whenever the menu
+    version changes, so a conflict check never touches the database
+    """
+
+    _current = None
+    _lock = threading.Lock()
+
+    def __init__(self, masks, version=None):
+        self.masks = masks
+        self.version = version
+
+    @classmethod
+    def current(cls):
+        version = menu_version()
+        index = cls._current
+        if index is None or index.version != version:
+            with cls._lock:
+                index = cls._current
+                if index is None or index.version != version:
+                    index = cls(dict(FoodItem.objects.values_list('name', 'allergens')), version)
+                    cls._current = index
+        return index
+
+    def conflicts(self, allergy, names):
+        """
+        (allergens recognised in `allergy`, [conflicting bits for each of `names`])
+        """
+        mask = allergy_mask(allergy) if allergy else 0
+        if not mask:
+            return 0, [0] * len(names)
+        masks = self.masks
+        return mask, [masks.get(name, 0) & mask for name in names]
+
+
+def check_cart(allergy, cart):
+    """
+    AllergenIndex.conflicts() for a submit_order cart
+    """
+    return AllergenIndex.current().conflicts(allergy, [item.get('name') for item in cart])
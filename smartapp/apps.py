@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SmartappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'smartapp'
+
+    def ready(self):
+        from . import signals  # noqa: F401
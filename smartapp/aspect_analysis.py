@@ -0,0 +1,291 @@
+"""
+Aspect-Level Sentiment for Restaurant Feedback
+Finds what a review talks about (taste, temperature, speed, price, hygiene,
+staff) and whether each aspect is praised or criticised, using a word-level
+Aho-Corasick automaton so every text is scanned once whatever the lexicon size
+"""
+
+import re
+import threading
+from collections import deque
+from django.db import transaction
+
+from .models import Feedback, FeedbackAspect
+
+ASPECTS = ('taste', 'temperature', 'speed', 'price', 'hygiene', 'staff')
+
+POSITIVE = 1
+NEUTRAL = 0
+NEGATIVE = -1
+
+# aspect -> {phrase: built-in polarity}; NEUTRAL phrases take their polarity
+# from nearby opinion words ("the staff were lovely")
+ASPECT_LEXICON = {
+    'taste': {
+        'taste': NEUTRAL, 'tastes': NEUTRAL, 'flavour': NEUTRAL, 'flavor': NEUTRAL, 'flavours': NEUTRAL,
+        'flavors': NEUTRAL, 'food': NEUTRAL, 'dish': NEUTRAL, 'momo': NEUTRAL, 'momos': NEUTRAL,
+        'delicious': POSITIVE, 'tasty': POSITIVE, 'yummy': POSITIVE, 'flavourful': POSITIVE,
+        'flavorful': POSITIVE, 'mouthwatering': POSITIVE, 'authentic': POSITIVE,
+        'bland': NEGATIVE, 'tasteless': NEGATIVE, 'salty': NEGATIVE, 'too salty': NEGATIVE,
+        'too spicy': NEGATIVE, 'too oily': NEGATIVE, 'oily': NEGATIVE, 'greasy': NEGATIVE,
+        'burnt': NEGATIVE, 'undercooked': NEGATIVE, 'overcooked': NEGATIVE, 'stale': NEGATIVE,
+        'soggy': NEGATIVE, 'raw': NEGATIVE,
+    },
+    'temperature': {
+        'temperature': NEUTRAL,
+        'hot': POSITIVE, 'warm': POSITIVE, 'piping hot': POSITIVE, 'fresh and hot': POSITIVE,
+        'steaming': POSITIVE,
+        'cold': NEGATIVE, 'lukewarm': NEGATIVE, 'luke warm': NEGATIVE, 'not hot': NEGATIVE,
+        'gone cold': NEGATIVE, 'frozen': NEGATIVE, 'reheated': NEGATIVE,
+    },
+    'speed': {
+        'wait': NEUTRAL, 'waiting': NEUTRAL, 'service time': NEUTRAL, 'delivery': NEUTRAL,
+        'quick': POSITIVE, 'quickly': POSITIVE, 'fast': POSITIVE, 'prompt': POSITIVE,
+        'on time': POSITIVE, 'no wait': POSITIVE, 'in no time': POSITIVE,
+        'slow': NEGATIVE, 'slowly': NEGATIVE, 'late': NEGATIVE, 'delay': NEGATIVE, 'delayed': NEGATIVE,
+        'waited': NEGATIVE, 'long wait': NEGATIVE, 'took forever': NEGATIVE, 'took ages': NEGATIVE,
+        'forever': NEGATIVE, 'ages': NEGATIVE,
+    },
+    'price': {
+        'price': NEUTRAL, 'prices': NEUTRAL, 'pricing': NEUTRAL, 'cost': NEUTRAL, 'bill': NEUTRAL,
+        'cheap': POSITIVE, 'affordable': POSITIVE, 'reasonable': POSITIVE, 'value for money': POSITIVE,
+        'worth the price': POSITIVE, 'worth the money': POSITIVE, 'good value': POSITIVE,
+        'expensive': NEGATIVE, 'overpriced': NEGATIVE, 'pricey': NEGATIVE, 'costly': NEGATIVE,
+        'rip off': NEGATIVE, 'ripoff': NEGATIVE, 'not worth': NEGATIVE, 'overcharged': NEGATIVE,
+    },
+    'hygiene': {
+        'hygiene': NEUTRAL, 'cleanliness': NEUTRAL, 'table': NEUTRAL, 'tables': NEUTRAL,
+        'toilet': NEUTRAL, 'washroom': NEUTRAL, 'plates': NEUTRAL, 'cutlery': NEUTRAL,
+        'clean': POSITIVE, 'spotless': POSITIVE, 'hygienic': POSITIVE, 'tidy': POSITIVE,
+        'dirty': NEGATIVE, 'filthy': NEGATIVE, 'unhygienic': NEGATIVE, 'messy': NEGATIVE,
+        'smelly': NEGATIVE, 'stinks': NEGATIVE, 'hair': NEGATIVE, 'hair in': NEGATIVE,
+        'cockroach': NEGATIVE, 'fly': NEGATIVE, 'flies': NEGATIVE, 'insect': NEGATIVE,
+        'sticky': NEGATIVE, 'stained': NEGATIVE,
+    },
+    'staff': {
+        'staff': NEUTRAL, 'waiter': NEUTRAL, 'waiters': NEUTRAL, 'waitress': NEUTRAL, 'server': NEUTRAL,
+        'manager': NEUTRAL, 'service': NEUTRAL, 'team': NEUTRAL, 'chef': NEUTRAL,
+        'friendly': POSITIVE, 'polite': POSITIVE, 'helpful': POSITIVE, 'courteous': POSITIVE,
+        'attentive': POSITIVE, 'welcoming': POSITIVE, 'hospitable': POSITIVE,
+        'rude': NEGATIVE, 'impolite': NEGATIVE, 'unfriendly': NEGATIVE, 'arrogant': NEGATIVE,
+        'ignored': NEGATIVE, 'unprofessional': NEGATIVE, 'careless': NEGATIVE, 'inattentive': NEGATIVE,
+        'wrong order': NEGATIVE,
+    },
+}
+
+# Generic opinion words that lend polarity to a NEUTRAL aspect mention nearby
+OPINIONS = {
+    'good': POSITIVE, 'great': POSITIVE, 'excellent': POSITIVE, 'amazing': POSITIVE, 'awesome': POSITIVE,
+    'nice': POSITIVE, 'lovely': POSITIVE, 'perfect': POSITIVE, 'fantastic': POSITIVE, 'wonderful': POSITIVE,
+    'best': POSITIVE, 'superb': POSITIVE, 'outstanding': POSITIVE, 'fine': POSITIVE, 'loved': POSITIVE,
+    'love': POSITIVE, 'enjoyed': POSITIVE, 'impressive': POSITIVE, 'pleasant': POSITIVE,
+    'bad': NEGATIVE, 'poor': NEGATIVE, 'terrible': NEGATIVE, 'awful': NEGATIVE, 'horrible': NEGATIVE,
+    'worst': NEGATIVE, 'pathetic': NEGATIVE, 'disappointing': NEGATIVE, 'disappointed': NEGATIVE,
+    'mediocre': NEGATIVE, 'hate': NEGATIVE, 'hated': NEGATIVE, 'disgusting': NEGATIVE,
+    'unacceptable': NEGATIVE, 'average': NEGATIVE, 'too long': NEGATIVE,
+}
+
+NEGATORS = frozenset((
+    'not', 'no', 'never', 'nothing', 'hardly', 'barely', 'without', 'nor', 'neither',
+    "isn't", "wasn't", "aren't", "weren't", "don't", "doesn't", "didn't", "won't", "can't", "couldn't",
+    'isnt', 'wasnt', 'arent', 'werent', 'dont', 'doesnt', 'didnt', 'wont', 'cant', 'couldnt',
+))
+
+# Tokens an opinion or negation may reach across
+OPINION_WINDOW = 4
+NEGATION_WINDOW = 3
+
+# Checked in order; the first aspect criticised decides the emotion
+NEGATIVE_EMOTIONS = (
+    ('hygiene', 'disgusted'),
+    ('staff', 'angry'),
+    ('speed', 'frustrated'),
+    ('price', 'dissatisfied'),
+    ('taste', 'disappointed'),
+    ('temperature', 'disappointed'),
+)
+
+ASPECT_CODES = {label.lower(): code for code, label in FeedbackAspect.ASPECT_CHOICES}
+
+_TOKEN_RE = re.compile(r"[a-z]+(?:'[a-z]+)?|[.,;:!?]")
+CLAUSE_BREAKS = frozenset('.,;:!?') | {'but', 'although', 'though', 'however', 'except'}
+
+
+def tokenize(text):
+    """
+    Lowercase word tokens; punctuation is kept so clauses can be told apart
+    """
+    return _TOKEN_RE.findall((text or '').lower().replace('’', "'"))
+
+
+class PhraseAutomaton:
+    """
+    Aho-Corasick automaton over word sequences.
+
+    goto[state] maps the next word to a state, fail[state] is the longest
+    proper suffix that is also a phrase prefix, and out[state] lists the
+    (phrase length, payload) pairs ending there with suffix outputs folded in.
+    """
+
+    def __init__(self, phrases):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for phrase, payload in phrases:
+            state = 0
+            words = phrase.split()
+            for word in words:
+                nxt = self.goto[state].get(word)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][word] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                state = nxt
+            self.out[state].append((len(words), payload))
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and word not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nxt] = self.goto[fallback].get(word, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def find(self, tokens):
+        """
+        (start, end, payload) for every phrase occurrence, longest match
+        first where matches overlap
+        """
+        goto, fail, out = self.goto, self.fail, self.out
+        matches = []
+        state = 0
+        for end, word in enumerate(tokens, 1):
+            while state and word not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(word, 0)
+            for length, payload in out[state]:
+                matches.append((end - length, end, payload))
+
+        matches.sort(key=lambda m: (m[0], m[0] - m[1]))
+        kept = []
+        covered_to = 0
+        for start, end, payload in matches:
+            if start >= covered_to:
+                kept.append((start, end, payload))
+                covered_to = end
+        return kept
+
+
+class AspectExtractor:
+    """
+    Rule-based aspect extraction run after SentimentAnalyzer
+    Returns {aspect: polarity} with polarity -1, 0 or 1
+    """
+
+    _automaton = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def _load_automaton(cls):
+        if cls._automaton is None:
+            with cls._lock:
+                if cls._automaton is None:
+                    phrases = [(phrase, (aspect, polarity))
+                               for aspect, terms in ASPECT_LEXICON.items()
+                               for phrase, polarity in terms.items()]
+                    phrases += [(phrase, (None, polarity)) for phrase, polarity in OPINIONS.items()]
+                    cls._automaton = PhraseAutomaton(phrases)
+        return cls._automaton
+
+    @classmethod
+    def extract(cls, text):
+        tokens = tokenize(text)
+        if not tokens:
+            return {}
+        matches = cls._load_automaton().find(tokens)
+
+        # Opinions and negations never reach into another clause
+        clause_of = []
+        clause = 0
+        for token in tokens:
+            if token in CLAUSE_BREAKS:
+                clause += 1
+            clause_of.append(clause)
+
+        def negated(start):
+            return any(
+                tokens[i] in NEGATORS and clause_of[i] == clause_of[start]
+                for i in range(max(0, start - NEGATION_WINDOW), start)
+            )
+
+        opinions = []
+        for start, end, (aspect, polarity) in matches:
+            if aspect is None:
+                opinions.append((start, -polarity if negated(start) else polarity))
+
+        totals = {}
+        for start, end, (aspect, polarity) in matches:
+            if aspect is None:
+                continue
+            if polarity == NEUTRAL:
+                # Nearest opinion word either side within the window
+                near = [(abs(o_start - start), o_polarity) for o_start, o_polarity in opinions
+                        if abs(o_start - start) <= OPINION_WINDOW and clause_of[o_start] == clause_of[start]]
+                polarity = min(near)[1] if near else NEUTRAL
+            elif negated(start):
+                polarity = -polarity
+            totals[aspect] = totals.get(aspect, 0) + polarity
+
+        return {aspect: (total > 0) - (total < 0) for aspect, total in totals.items()}
+
+    @classmethod
+    def extract_batch(cls, texts):
+        cls._load_automaton()
+        return [cls.extract(text) for text in texts]
+
+    @classmethod
+    def emotion_for(cls, aspects, sentiment=None):
+        """
+        One word for Feedback.emotion from the aspect polarities and the
+        overall sentiment
+        """
+        for aspect, emotion in NEGATIVE_EMOTIONS:
+            if aspects.get(aspect) == NEGATIVE:
+                return emotion
+        if aspects.get('taste') == POSITIVE:
+            return 'delighted'
+        if POSITIVE in aspects.values() or sentiment == 'positive':
+            return 'satisfied'
+        if sentiment == 'negative':
+            return 'disappointed'
+        return 'neutral'
+
+
+def aspect_rows(feedback, aspects):
+    return [
+        FeedbackAspect(feedback=feedback, aspect=ASPECT_CODES[aspect], polarity=polarity)
+        for aspect, polarity in aspects.items()
+    ]
+
+
+def annotate_feedback(feedbacks, batch_size=500):
+    """
+    Extract aspects for a batch of Feedback objects, replace their aspect
+    rows and set emotion, in three bulk queries
+    """
+    results = AspectExtractor.extract_batch([feedback.feedback_text for feedback in feedbacks])
+    rows = []
+    for feedback, aspects in zip(feedbacks, results):
+        feedback.emotion = AspectExtractor.emotion_for(aspects, feedback.sentiment)
+        rows.extend(aspect_rows(feedback, aspects))
+
+    with transaction.atomic():
+        FeedbackAspect.objects.filter(feedback__in=[f.id for f in feedbacks]).delete()
+        FeedbackAspect.objects.bulk_create(rows, batch_size=batch_size)
+        Feedback.objects.bulk_update(feedbacks, ['emotion'], batch_size=batch_size)
+    return len(rows)
@@ -0,0 +1,236 @@
+"""
+Caching helpers for public pages and the menu
+Full-page caching with ETags for static pages, plus a menu version used to key
+template fragments, and hit/miss counters for both
+"""
+
+import hashlib
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.utils import make_template_fragment_key
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+MENU_VERSION_KEY = 'menu_version'
+FEEDBACK_VERSION_KEY = 'feedback_version'
+FEEDBACK_ROWS_VERSION_KEY = 'feedback_rows_version'
+VOUCHER_VERSION_KEY = 'voucher_version'
+ORDER_VERSION_KEY = 'order_version'
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+# Value this process last bumped each version key to
+_own_bumps = {}
+
+
+def record(name, event):
+    with _stats_lock:
+        _stats[f'{name}:{event}'] += 1
+
+
+def cache_stats():
+    """
+    Hit/miss counters for this process, with hit rates per cache name
+    """
+    with _stats_lock:
+        counts = dict(_stats)
+    report = {}
+    for key, count in counts.items():
+        name, event = key.rsplit(':', 1)
+        report.setdefault(name, {'hit': 0, 'miss': 0, 'not_modified': 0})[event] = count
+    for name, entry in report.items():
+        lookups = entry['hit'] + entry['miss']
+        entry['hit_rate'] = round(entry['hit'] / lookups, 3) if lookups else None
+    return report
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        # A cold cache has nothing keyed by the old version, so any fresh value is safe
+        version = time.time_ns()
+        cache.add(key, version, None)
+        version = cache.get(key, version)
+    return version
+
+
+def _bump(key):
+    version = time.time_ns()
+    cache.set(key, version, None)
+    _own_bumps[key] = version
+    return version
+
+
+def cache_is_shared():
+    """
+    Whether the default cache is shared between worker processes, so a
+    version bumped in one reaches all of them
+    """
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def bumped_here(key, version):
+    """
+    Whether `version` of `key` is the value this process last bumped it to,
+    i.e. no other process has changed the data since
+    """
+    return version == _own_bumps.get(key)
+
+
+def menu_version():
+    """
+    Current menu version; changes whenever a FoodItem is added, edited or removed
+    """
+    return _version(MENU_VERSION_KEY)
+
+
+def bump_menu_version():
+    return _bump(MENU_VERSION_KEY)
+
+
+def feedback_version():
+    """
+    Current feedback version; changes whenever feedback is rewritten in bulk,
+    which model signals don't report
+    """
+    return _version(FEEDBACK_VERSION_KEY)
+
+
+def bump_feedback_version():
+    return _bump(FEEDBACK_VERSION_KEY)
+
+
+def feedback_rows_version():
+    """
+    Changes on every saved or deleted Feedback row. Kept apart from
+    feedback_version, which also triggers a search index rebuild.
+    """
+    return _version(FEEDBACK_ROWS_VERSION_KEY)
+
+
+def bump_feedback_rows_version():
+    return _bump(FEEDBACK_ROWS_VERSION_KEY)
+
+
+def voucher_version():
+    """
+    Changes whenever a voucher is issued, in any process
+    """
+    return _version(VOUCHER_VERSION_KEY)
+
+
+def bump_voucher_version():
+    return _bump(VOUCHER_VERSION_KEY)
+
+
+def order_version():
+    """
+    Changes whenever an order or order item is saved or deleted
+    """
+    return _version(ORDER_VERSION_KEY)
+
+
+def bump_order_version():
+    return _bump(ORDER_VERSION_KEY)
+
+
+def order_state_stale(state, version):
+    """
+    Whether per-process order state (kitchen queue, table tracker), loaded at
+    `state.version` and `state.loaded_at` (time.monotonic()), may have missed
+    another process's writes: the order version moved to one this process
+    didn't set, or ORDER_STATE_MAX_AGE passed. The age bound covers workers
+    that don't share a cache. A version this process set is adopted, since
+    its own writes already updated the state.
+    """
+    if time.monotonic() - state.loaded_at > settings.ORDER_STATE_MAX_AGE:
+        return True
+    if version != state.version:
+        if not bumped_here(ORDER_VERSION_KEY, version):
+            return True
+        state.version = version
+    return False
+
+
+def data_etag(*versions):
+    """
+    Strong ETag from the data versions a response is rendered from, so
+    conditional requests are answered without rendering or hashing the body
+    """
+    key = ':'.join(str(v) for v in (settings.PAGE_CACHE_VERSION, *versions))
+    return '"%s"' % hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+
+
+def order_page_etag(request):
+    # The page embeds a CSRF token, so it is only reusable with the same
+    # CSRF cookie; without one, rendering sets it and there is nothing to match
+    csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+    if not csrf_cookie:
+        return None
+    return data_etag('order', menu_version(), csrf_cookie)
+
+
+def menu_etag(request):
+    return data_etag('menu', menu_version())
+
+
+def feedback_listing_etag(request):
+    return data_etag('feedback', feedback_version(), feedback_rows_version())
+
+
+def menu_fragment_cached(fragment_name, version):
+    """
+    Whether the {% cache %} fragment for this menu version is already stored
+    """
+    hit = cache.has_key(make_template_fragment_key(fragment_name, [version]))
+    record(f'fragment:{fragment_name}', 'hit' if hit else 'miss')
+    return hit
+
+
+def cached_page(view_func):
+    """
+    Full-page cache for pages that render the same bytes for every visitor.
+
+    The rendered body is stored with its ETag, so a conditional GET is answered
+    with a 304 straight from the cache without calling the view. Responses that
+    set cookies or aren't 200 are passed through uncached.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view_func(request, *args, **kwargs)
+
+        name = f'page:{view_func.__name__}'
+        key = f'page:{settings.PAGE_CACHE_VERSION}:{request.path}'
+        entry = cache.get(key)
+        if entry is None:
+            record(name, 'miss')
+            response = view_func(request, *args, **kwargs)
+            if response.status_code != 200 or response.cookies or getattr(response, 'streaming', False):
+                return response
+            content = response.content
+            entry = {
+                'etag': '"%s"' % hashlib.md5(content, usedforsecurity=False).hexdigest(),
+                'content': content,
+                'content_type': response['Content-Type'],
+            }
+            cache.set(key, entry, settings.PAGE_CACHE_TIMEOUT)
+        else:
+            record(name, 'hit')
+
+        not_modified = get_conditional_response(request, etag=entry['etag'])
+        if not_modified is not None:
+            record(name, 'not_modified')
+            response = not_modified
+        else:
+            response = HttpResponse(entry['content'], content_type=entry['content_type'])
+        response['ETag'] = entry['etag']
+        patch_cache_control(response, public=True, max_age=settings.PAGE_CACHE_MAX_AGE)
+        return response
+    return wrapper
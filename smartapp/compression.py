@@ -0,0 +1,167 @@
+"""
+Response compression
+Brotli or gzip for text responses above a size threshold, with strong ETags
+kept per content-coding so conditional requests still match
+"""
+
+import re
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# Strong ETags get the coding appended inside the quotes, e.g. "abc-br"
+ETAG_CODING = re.compile(r'^(W/)?"(.*)-(br|gzip)"$')
+
+
+def accepted_coding(request):
+    """
+    'br' or 'gzip' from the request's Accept-Encoding, or None; brotli wins
+    when both are accepted and the brotli package is installed
+    """
+    accepted = set()
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, *params = [p.strip() for p in part.split(';')]
+        q = 1.0
+        for param in params:
+            if param.startswith('q='):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if name and q > 0:
+            accepted.add(name.lower())
+    if BROTLI_AVAILABLE and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def compressible(response):
+    content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+    return content_type.startswith('text/') or content_type in settings.COMPRESSION_CONTENT_TYPES
+
+
+def compress(content, coding):
+    if coding == 'br':
+        return brotli.compress(content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return compress_string(content)
+
+
+def _brotli_sequence(sequence):
+    compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+    for chunk in sequence:
+        # Flush per chunk so a streamed export reaches the client as it is produced
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def _abrotli_sequence(sequence):
+    compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+    async for chunk in sequence:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def _agzip_sequence(sequence):
+    async for chunk in sequence:
+        yield compress_string(chunk)
+
+
+class CompressionMiddleware:
+    """
+    Compress text, JSON, JavaScript and SVG responses of at least
+    COMPRESSION_MIN_SIZE bytes, and streamed ones, with brotli or gzip.
+
+    Unlike GZipMiddleware this keeps ETags strong: a compressed response's
+    ETag gets the coding as a suffix ("abc-br"). Suffixes are stripped from
+    If-None-Match before the view sees it, so views compare against their
+    own uncompressed tags, and a 304 gets back the tag the client sent.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        sent_tags = self._strip_etag_codings(request)
+        return self._compress(request, self.get_response(request), sent_tags)
+
+    async def __acall__(self, request):
+        sent_tags = self._strip_etag_codings(request)
+        return self._compress(request, await self.get_response(request), sent_tags)
+
+    def _strip_etag_codings(self, request):
+        """
+        Rewrite If-None-Match without coding suffixes; returns
+        {stripped tag: tag as sent}
+        """
+        header = request.META.get('HTTP_IF_NONE_MATCH')
+        if not header:
+            return {}
+        sent_tags = {}
+        tags = []
+        for tag in header.split(','):
+            tag = tag.strip()
+            match = ETAG_CODING.match(tag)
+            stripped = f'{match.group(1) or ""}"{match.group(2)}"' if match else tag
+            sent_tags[stripped] = tag
+            tags.append(stripped)
+        request.META['HTTP_IF_NONE_MATCH'] = ', '.join(tags)
+        return sent_tags
+
+    def _compress(self, request, response, sent_tags):
+        if response.status_code == 304:
+            etag = response.get('ETag')
+            if etag in sent_tags and sent_tags[etag] != etag:
+                # Stands in for a compressed 200, so carries its headers
+                response['ETag'] = sent_tags[etag]
+                patch_vary_headers(response, ('Accept-Encoding',))
+            return response
+
+        if response.has_header('Content-Encoding') or not compressible(response):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = accepted_coding(request)
+        if coding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                sequence = _abrotli_sequence if coding == 'br' else _agzip_sequence
+            else:
+                sequence = _brotli_sequence if coding == 'br' else compress_sequence
+            response.streaming_content = sequence(response.streaming_content)
+            del response.headers['Content-Length']
+        else:
+            compressed = compress(response.content, coding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = f'{etag[:-1]}-{coding}"'
+        response.headers['Content-Encoding'] = coding
+        return response
@@ -0,0 +1,149 @@
+"""
+Database routing for read replicas
+Analytics views opt in to reading from a replica; everything else stays on default
+"""
+
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import signing
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_COOKIE = 'db_primary_pin'
+
+# Set while an analytics view or export is running
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+# Set when this client wrote recently, so it must read its own writes
+_primary_pinned = contextvars.ContextVar('primary_pinned', default=False)
+# Set as soon as the current request writes anything
+_wrote = contextvars.ContextVar('wrote_primary', default=False)
+
+
+def replica_alias():
+    """
+    The configured replica alias, or None when no replica is set up
+    """
+    alias = getattr(settings, 'DATABASE_REPLICA_ALIAS', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+class ReplicaRouter:
+    """
+    Sends reads inside `reading_from_replica()` to the replica alias.
+    Writes, and reads from clients that wrote recently, go to default.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and not (_primary_pinned.get() or _wrote.get()):
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as default
+        same_data = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in same_data and obj2._state.db in same_data:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+@contextmanager
+def reading_from_replica():
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def read_from_replica(view_func):
+    """
+    Run a read-only view against the replica when one is configured
+    """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            # The flag is a ContextVar, so the ORM's worker threads see it too
+            with reading_from_replica():
+                return await view_func(request, *args, **kwargs)
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        with reading_from_replica():
+            return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Gives read-your-writes consistency on top of ReplicaRouter.
+
+    A request that writes sets a short-lived signed cookie; while it is valid
+    that client's reads stay on default, so replica lag never hides what they
+    just submitted. Must sit after SessionMiddleware so session saves, which
+    happen on the way out, are not counted as writes.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sticky_seconds = getattr(settings, 'DATABASE_REPLICA_STICKY_SECONDS', 10)
+        # A sync-only middleware would force Django to run every async view
+        # below it in a thread, so this one follows whichever mode it is given
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if replica_alias() is None:
+            return self.get_response(request)
+
+        tokens = self._start(request)
+        try:
+            response = self.get_response(request)
+            self._finish(response)
+        finally:
+            self._reset(tokens)
+        return response
+
+    async def __acall__(self, request):
+        if replica_alias() is None:
+            return await self.get_response(request)
+
+        tokens = self._start(request)
+        try:
+            response = await self.get_response(request)
+            self._finish(response)
+        finally:
+            self._reset(tokens)
+        return response
+
+    def _start(self, request):
+        try:
+            pinned = request.get_signed_cookie(STICKY_COOKIE, max_age=self.sticky_seconds) == '1'
+        except (KeyError, signing.BadSignature):
+            pinned = False
+        return _primary_pinned.set(pinned), _wrote.set(False)
+
+    def _finish(self, response):
+        if _wrote.get():
+            response.set_signed_cookie(
+                STICKY_COOKIE, '1', max_age=self.sticky_seconds, httponly=True, samesite='Lax'
+            )
+
+    def _reset(self, tokens):
+        pin_token, wrote_token = tokens
+        _wrote.reset(wrote_token)
+        _primary_pinned.reset(pin_token)
@@ -1,15 +1,18 @@
 """
 Retrain sentiment model with better positive/negative examples
 """
+import sys
 import pandas as pd
 import numpy as np
-import pickle
 import re
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 
+sys.path.insert(0, '.')
+from smartapp.sentiment_analysis import save_artifacts
+
 print("Training sentiment model...")
 
 # Load Swiggy data
@@ -118,13 +121,15 @@ test_acc = model.score(X_test, y_test)
 print(f"Train Accuracy: {train_acc:.2f}")
 print(f"Test Accuracy: {test_acc:.2f}")
 
-# Save model
-with open('smartapp/sentiment_model.pkl', 'wb') as f:
-    pickle.dump(model, f)
-with open('smartapp/sentiment_vectorizer.pkl', 'wb') as f:
-    pickle.dump(vectorizer, f)
+# Save model; running workers pick it up without a restart
+metadata = save_artifacts(
+    model, vectorizer, 'smartapp',
+    training_rows=len(all_reviews),
+    train_accuracy=round(train_acc, 4),
+    test_accuracy=round(test_acc, 4),
+)
 
-print("Model saved!")
+print(f"Model saved! Version: {metadata['version']}")
 
 # Test
 test_reviews = [
@@ -0,0 +1,196 @@
+"""
+CSV and XLSX exports of orders and feedback for accounting
+Rows are read with values_list().iterator() in chunks and written out as
+they arrive, so a year of data exports in constant memory
+"""
+
+import csv
+import io
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import Order, Feedback
+from .db_routers import replica_alias
+from .serialization import format_datetimes
+
+try:
+    import xlsxwriter
+    XLSX_AVAILABLE = True
+except ImportError:
+    XLSX_AVAILABLE = False
+
+FORMATS = ('csv', 'xlsx')
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+# Spreadsheet apps run cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class Export:
+    """
+    One exportable table: `columns` is a list of (header, lookup, kind),
+    kind being None, 'datetime' or 'decimal'. Lookups may follow relations;
+    a reverse relation gives one row per related object.
+    """
+
+    def __init__(self, name, model, date_lookup, order_by, columns):
+        self.name = name
+        self.model = model
+        self.date_lookup = date_lookup
+        self.order_by = order_by
+        self.columns = columns
+        self.headers = [header for header, _, _ in columns]
+
+    def queryset(self, date_from=None, date_to=None):
+        # Exports are read-only and may lag a little, so they use the replica
+        queryset = self.model.objects.using(replica_alias() or DEFAULT_DB_ALIAS)
+        if date_from:
+            queryset = queryset.filter(**{f'{self.date_lookup}__gte': date_from})
+        if date_to:
+            queryset = queryset.filter(**{f'{self.date_lookup}__lt': date_to})
+        return queryset.order_by(*self.order_by).values_list(*[lookup for _, lookup, _ in self.columns])
+
+    def chunks(self, date_from=None, date_to=None, chunk_size=None):
+        """
+        Lists of row tuples, EXPORT_CHUNK_SIZE at a time, straight from the cursor
+        """
+        chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+        chunk = []
+        for row in self.queryset(date_from, date_to).iterator(chunk_size=chunk_size):
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def text_rows(self, rows):
+        """
+        `rows` with datetimes formatted like the JSON API and text made safe
+        to open in a spreadsheet
+        """
+        columns = [list(column) for column in zip(*rows)]
+        for index, (_, _, kind) in enumerate(self.columns):
+            if kind == 'datetime':
+                columns[index] = format_datetimes(columns[index])
+            elif kind is None:
+                columns[index] = [_safe_text(value) for value in columns[index]]
+        return zip(*columns)
+
+
+def _safe_text(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+ORDERS = Export('orders', Order, 'order_time', ['id', 'items__id'], [
+    ('order_id', 'id', None),
+    ('order_time', 'order_time', 'datetime'),
+    ('table_number', 'table_number', None),
+    ('customer_name', 'customer_name', None),
+    ('ordered_by', 'ordered_by', None),
+    ('status', 'status', None),
+    ('order_total', 'total_amount', 'decimal'),
+    ('item_name', 'items__item_name', None),
+    ('item_category', 'items__category', None),
+    ('quantity', 'items__quantity', None),
+    ('unit_price', 'items__unit_price', 'decimal'),
+    ('item_total', 'items__total_price', 'decimal'),
+])
+
+FEEDBACK = Export('feedback', Feedback, 'created_at', ['id'], [
+    ('feedback_id', 'id', None),
+    ('created_at', 'created_at', 'datetime'),
+    ('customer_name', 'customer_name', None),
+    ('order_id', 'order_id', None),
+    ('order_table', 'order__table_number', None),
+    ('category', 'category', None),
+    ('rating', 'rating', None),
+    ('sentiment', 'sentiment', None),
+    ('confidence', 'confidence', None),
+    ('emotion', 'emotion', None),
+    ('model_version', 'model_version', None),
+    ('feedback_text', 'feedback_text', None),
+])
+
+EXPORTS = {export.name: export for export in (ORDERS, FEEDBACK)}
+
+
+def csv_chunks(export, date_from=None, date_to=None, progress=None):
+    """
+    The CSV as text chunks, one per database chunk; calls
+    progress(rows written) after each
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # The BOM makes Excel read the file as UTF-8
+    buffer.write('\ufeff')
+    writer.writerow(export.headers)
+    written = 0
+    for rows in export.chunks(date_from, date_to):
+        writer.writerows(export.text_rows(rows))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        written += len(rows)
+        if progress:
+            progress(written)
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+async def acsv_chunks(export, date_from=None, date_to=None):
+    """
+    csv_chunks for ASGI responses, which would otherwise read a sync
+    iterator to the end before sending anything
+    """
+    chunks = csv_chunks(export, date_from, date_to)
+    # One worker thread for the whole export keeps the cursor on one connection
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    while True:
+        chunk = await next_chunk(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def write_xlsx(export, target, date_from=None, date_to=None, progress=None):
+    """
+    Write the export as an .xlsx workbook to `target`, a path or binary
+    file. xlsxwriter's constant_memory mode flushes each row as it is
+    written, so memory stays flat whatever the row count.
+    """
+    if not XLSX_AVAILABLE:
+        raise RuntimeError("xlsxwriter not installed; export as CSV or pip install xlsxwriter")
+
+    workbook = xlsxwriter.Workbook(target, {
+        'constant_memory': True,
+        # Customer text is data, never a formula or link
+        'strings_to_formulas': False,
+        'strings_to_urls': False,
+        'remove_timezone': True,
+        'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+    })
+    worksheet = workbook.add_worksheet(export.name)
+    worksheet.write_row(0, 0, export.headers, workbook.add_format({'bold': True}))
+    worksheet.freeze_panes(1, 0)
+    decimals = [index for index, (_, _, kind) in enumerate(export.columns) if kind == 'decimal']
+
+    written = 0
+    for rows in export.chunks(date_from, date_to):
+        for row in rows:
+            if decimals:
+                row = list(row)
+                for index in decimals:
+                    if row[index] is not None:
+                        row[index] = float(row[index])
+            written += 1
+            worksheet.write_row(written, 0, row)
+        if progress:
+            progress(written)
+    workbook.close()
+    return written
@@ -0,0 +1,300 @@
+"""
+Feedback search
+Ranked search over feedback text and customer names with sentiment, category
+and date filters.
+Uses PostgreSQL full-text search when the database supports it, otherwise an
+in-process BM25 inverted index kept up to date as feedback is written.
+"""
+
+import bisect
+import heapq
+import math
+import threading
+import time
+from collections import Counter
+from django.conf import settings
+from django.db import connections, router
+
+from .models import Feedback
+from .menu_search import normalize, trigrams, prefix_distance, typo_limit
+from .caching import FEEDBACK_ROWS_VERSION_KEY, bumped_here, feedback_version, feedback_rows_version
+
+STOP_WORDS = frozenset(
+    'a an and are as at be but by for from had has have i in is it its me my '
+    'of on or so that the their them they this to too us was we were with you'.split()
+)
+
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text):
+    return [token for token in normalize(text) if token not in STOP_WORDS]
+
+
+class FeedbackSearchIndex:
+    """
+    BM25 inverted index over Feedback.customer_name and feedback_text.
+
+    Postings map each token to {feedback id: term frequency}; per-document
+    metadata holds what the filters need, so a search never touches the
+    database. Signals keep the index current in the process that writes, and
+    every search first pulls in rows other processes added since (one query on
+    the primary key). Edits and deletes can't be found that way, so when
+    another process has changed feedback rows the index is rebuilt instead.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.postings = {}
+        self.doc_terms = {}
+        self.doc_len = {}
+        self.meta = {}
+        self.total_len = 0
+        self.max_id = 0
+        self.version = None
+        self.rows_version = None
+        self.built_at = time.monotonic()
+        self._vocab = None
+        self._trigram_tokens = None
+
+    @classmethod
+    def shared(cls):
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls()
+        return cls._shared
+
+    @classmethod
+    def reset_shared(cls):
+        with cls._shared_lock:
+            cls._shared = None
+
+    def add(self, feedback_id, customer_name, text, sentiment, category, created_at):
+        with self._lock:
+            if feedback_id in self.doc_terms:
+                self.remove(feedback_id)
+            terms = Counter(tokenize(f'{customer_name} {text}'))
+            for token, tf in terms.items():
+                self.postings.setdefault(token, {})[feedback_id] = tf
+            length = sum(terms.values())
+            self.doc_terms[feedback_id] = terms
+            self.doc_len[feedback_id] = length
+            self.meta[feedback_id] = (sentiment, category, created_at)
+            self.total_len += length
+            self.max_id = max(self.max_id, feedback_id)
+            self._vocab = None
+            self._trigram_tokens = None
+
+    def remove(self, feedback_id):
+        with self._lock:
+            terms = self.doc_terms.pop(feedback_id, None)
+            if terms is None:
+                return
+            for token in terms:
+                docs = self.postings.get(token)
+                if docs is not None:
+                    docs.pop(feedback_id, None)
+                    if not docs:
+                        del self.postings[token]
+            self.total_len -= self.doc_len.pop(feedback_id)
+            del self.meta[feedback_id]
+            self._vocab = None
+            self._trigram_tokens = None
+
+    def stale(self, version, rows_version):
+        """
+        Whether the index has to be rebuilt: feedback was rewritten in bulk
+        (e.g. rescored), another process saved or deleted rows, or it is
+        older than FEEDBACK_SEARCH_MAX_AGE, which bounds how long other
+        workers' edits go unseen when they don't share a cache. Row changes
+        made by this process are already indexed and only adopted.
+        """
+        if version != self.version or time.monotonic() - self.built_at > settings.FEEDBACK_SEARCH_MAX_AGE:
+            return True
+        if rows_version != self.rows_version:
+            if not bumped_here(FEEDBACK_ROWS_VERSION_KEY, rows_version):
+                return True
+            self.rows_version = rows_version
+        return False
+
+    def catch_up(self):
+        """
+        Index feedback added since the last load, e.g. by another worker
+        """
+        rows = (
+            Feedback.objects.filter(id__gt=self.max_id).order_by('id')
+            .values_list('id', 'customer_name', 'feedback_text', 'sentiment', 'category', 'created_at')
+        )
+        for row in rows.iterator(chunk_size=2000):
+            self.add(*row)
+
+    def _expand(self, token):
+        """
+        [(vocabulary token, weight)] for a query token: the token itself, any
+        token it is a prefix of, or failing both, near misspellings
+        """
+        if self._vocab is None:
+            self._vocab = sorted(self.postings)
+        matches = []
+        start = bisect.bisect_left(self._vocab, token)
+        for vocab in self._vocab[start:start + 50]:
+            if not vocab.startswith(token):
+                break
+            matches.append((vocab, 1.0 if vocab == token else 0.8))
+        if matches:
+            return matches
+
+        limit = typo_limit(token)
+        if not limit:
+            return []
+        if self._trigram_tokens is None:
+            grams = {}
+            for vocab in self._vocab:
+                for gram in trigrams(vocab):
+                    grams.setdefault(gram, set()).add(vocab)
+            self._trigram_tokens = grams
+        candidates = set()
+        for gram in trigrams(token):
+            candidates |= self._trigram_tokens.get(gram, set())
+        for vocab in candidates:
+            distance = prefix_distance(token, vocab, limit)
+            if distance <= limit:
+                matches.append((vocab, 0.6 / (distance + 1)))
+        return matches
+
+    def search(self, query, sentiment=None, category=None, date_from=None, date_to=None, limit=None):
+        """
+        Feedback ids ranked by BM25, best first
+        """
+        tokens = tokenize(query)
+        with self._lock:
+            n_docs = len(self.doc_len)
+            if not n_docs:
+                return []
+            avg_len = self.total_len / n_docs
+
+            def allowed(doc_id):
+                doc_sentiment, doc_category, created_at = self.meta[doc_id]
+                return (
+                    (sentiment is None or doc_sentiment == sentiment)
+                    and (category is None or doc_category == category)
+                    and (date_from is None or created_at >= date_from)
+                    and (date_to is None or created_at < date_to)
+                )
+
+            if not tokens:
+                ids = [doc_id for doc_id in self.meta if allowed(doc_id)]
+                ids.sort(reverse=True)
+                return ids[:limit] if limit else ids
+
+            # Score the rarest token first; later tokens only need to look at
+            # documents that are still candidates
+            expanded = sorted(
+                ([(vocab, weight, self.postings[vocab]) for vocab, weight in self._expand(token)] for token in tokens),
+                key=lambda matches: sum(len(docs) for _, _, docs in matches),
+            )
+            scores = None
+            for matches in expanded:
+                token_scores = {}
+                for vocab, weight, docs in matches:
+                    idf = weight * math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                    if scores is not None and len(scores) < len(docs):
+                        pairs = ((d, docs[d]) for d in scores if d in docs)
+                    else:
+                        pairs = docs.items()
+                    for doc_id, tf in pairs:
+                        score = idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * self.doc_len[doc_id] / avg_len))
+                        if score > token_scores.get(doc_id, 0):
+                            token_scores[doc_id] = score
+                # Every query token has to match
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {d: s + token_scores[d] for d, s in scores.items() if d in token_scores}
+                if not scores:
+                    return []
+
+            candidates = ((-score, -doc_id) for doc_id, score in scores.items() if allowed(doc_id))
+            best = heapq.nsmallest(limit, candidates) if limit else sorted(candidates)
+        return [-neg_id for _, neg_id in best]
+
+
+def uses_postgres_search():
+    alias = router.db_for_read(Feedback) or 'default'
+    return connections[alias].vendor == 'postgresql'
+
+
+def search_feedback(query, sentiment=None, category=None, date_from=None, date_to=None, limit=None):
+    """
+    Ranked feedback ids matching `query` and the filters
+    """
+    if uses_postgres_search():
+        return _postgres_search(query, sentiment, category, date_from, date_to, limit)
+
+    index = FeedbackSearchIndex.shared()
+    # Read before catching up, so a write meanwhile forces another rebuild
+    version, rows_version = feedback_version(), feedback_rows_version()
+    if index.stale(version, rows_version):
+        FeedbackSearchIndex.reset_shared()
+        index = FeedbackSearchIndex.shared()
+        index.version, index.rows_version = version, rows_version
+    index.catch_up()
+    return index.search(query, sentiment, category, date_from, date_to, limit)
+
+
+def _postgres_search(query, sentiment, category, date_from, date_to, limit):
+    from django.contrib.postgres.search import SearchRank
+
+    queryset = Feedback.objects.all()
+    if sentiment:
+        queryset = queryset.filter(sentiment=sentiment)
+    if category:
+        queryset = queryset.filter(category=category)
+    if date_from:
+        queryset = queryset.filter(created_at__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(created_at__lt=date_to)
+
+    tokens = tokenize(query)
+    if tokens:
+        vector, search_query = _postgres_query(tokens)
+        queryset = (
+            queryset.annotate(search=vector)
+            .filter(search=search_query)
+            .annotate(rank=SearchRank(vector, search_query))
+            .order_by('-rank', '-id')
+        )
+    else:
+        queryset = queryset.order_by('-id')
+
+    ids = queryset.values_list('id', flat=True)
+    return list(ids[:limit] if limit else ids)
+
+
+def _postgres_query(tokens):
+    from django.contrib.postgres.search import SearchQuery, SearchVector
+
+    # Tokens are plain [a-z0-9] after normalize(), so building a raw prefix
+    # query from them is safe; ':*' gives typeahead matching
+    search_query = SearchQuery(' & '.join(f'{t}:*' for t in tokens), config='english', search_type='raw')
+    # Must match the expression index from migration 0021
+    return SearchVector('customer_name', 'feedback_text', config='english'), search_query
+
+
+def filter_feedback(queryset, query):
+    """
+    `queryset` narrowed to the feedback matching `query`, unranked and
+    without a limit; for listings that keep their own ordering
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return queryset
+    if uses_postgres_search():
+        vector, search_query = _postgres_query(tokens)
+        return queryset.annotate(search=vector).filter(search=search_query)
+    return queryset.filter(id__in=search_feedback(query))
@@ -0,0 +1,239 @@
+"""
+Per-dish demand forecasts for kitchen prep
+Order item history becomes one dish x day x hour array and every dish's
+weekday x hour profile and current level are fitted at once with numpy
+"""
+
+import logging
+import time
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import CharField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import OrderItem, DishForecast
+from .db_routers import replica_alias
+from .analytics import values_frame
+
+try:
+    import numpy as np
+    import pandas as pd
+    FORECAST_AVAILABLE = True
+except ImportError:
+    FORECAST_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Recent demand may move the forecast at most this factor away from the profile
+MAX_LEVEL_SHIFT = 2.0
+# Dishes expected to sell fewer portions than this in the day aren't stored
+MIN_DAILY_PORTIONS = 0.05
+
+
+class DemandHistory:
+    """
+    Portions ordered per dish, day and local hour: `demand[dish, day, hour]`,
+    day 0 being `first_day`
+    """
+
+    def __init__(self, names, categories, demand, first_day):
+        self.names = names
+        self.categories = categories
+        self.demand = demand
+        self.first_day = first_day
+
+    @classmethod
+    def load(cls, first_day, days):
+        start = timezone.make_aware(datetime.combine(first_day, datetime.min.time()))
+        # A nightly batch read, so it goes to the replica
+        frame = values_frame(
+            OrderItem.objects.using(replica_alias() or DEFAULT_DB_ALIAS)
+            .filter(order__order_time__gte=start, order__order_time__lt=start + timedelta(days=days))
+            .annotate(order_time_text=Cast('order__order_time', CharField()))
+            .values_list('item_name', 'category', 'quantity', 'order_time_text'),
+            [('item_name', 'O'), ('category', 'O'), ('quantity', 'f8'), ('order_time', 'O')],
+        )
+        local = (
+            pd.to_datetime(frame['order_time'], format='ISO8601', utc=True)
+            .dt.tz_convert(settings.TIME_ZONE).dt.tz_localize(None)
+        )
+        # Local hours since midnight of first_day; clipped for the hour a DST change repeats
+        slots = ((local - pd.Timestamp(first_day)) // pd.Timedelta(hours=1)).to_numpy().clip(0, days * 24 - 1)
+        dish, names = pd.factorize(frame['item_name'])
+        # factorize numbers dishes by first appearance, so these line up with names
+        _, first_seen = np.unique(dish, return_index=True)
+        demand = np.bincount(
+            dish * days * 24 + slots, weights=frame['quantity'].to_numpy(), minlength=len(names) * days * 24,
+        ).reshape(len(names), days, 24)
+        return cls(list(names), list(frame['category'].to_numpy()[first_seen]), demand, first_day)
+
+    def window(self, end, days):
+        """
+        The `days` days of demand before day index `end`
+        """
+        return self.demand[:, max(0, end - days):end]
+
+
+def _decay(count, alpha):
+    """
+    Exponential weights for `count` periods, oldest first, summing to 1
+    """
+    weights = alpha * (1 - alpha) ** np.arange(count - 1, -1, -1)
+    return weights / weights.sum()
+
+
+def fit(demand, first_day, target, profile_smoothing=None, level_smoothing=None, profile_prior=None):
+    """
+    Expected portions per dish and hour on `target`, a (dishes, 24) array,
+    from `demand[dish, day, hour]` for the days starting at first_day.
+
+    The baseline is each dish's weekday x hour profile: the exponentially
+    smoothed demand of the same hour on the same weekday over past weeks.
+    Hourly shapes of thinly sold weekdays lean on the dish's shape across the
+    whole week. The profile is then scaled by an exponentially smoothed
+    ratio of recent daily demand to what the profile expected on those days,
+    so a dish picking up or dropping off moves the forecast within days.
+    """
+    profile_smoothing = profile_smoothing or settings.FORECAST_PROFILE_SMOOTHING
+    level_smoothing = level_smoothing or settings.FORECAST_LEVEL_SMOOTHING
+    profile_prior = settings.FORECAST_PROFILE_PRIOR if profile_prior is None else profile_prior
+
+    dishes, days, _ = demand.shape
+    weeks = days // 7
+    if weeks == 0:
+        return np.zeros((dishes, 24))
+    # Whole weeks only, so each column of the reshape is one weekday
+    skipped = days - weeks * 7
+    by_week = demand[:, skipped:].reshape(dishes, weeks, 7, 24)
+    weekday = (target - first_day).days - skipped
+
+    profile = np.tensordot(by_week, _decay(weeks, profile_smoothing), axes=(1, 0))  # dishes x 7 x 24
+    weekday_totals = profile.sum(2)
+    week_shape = profile.sum(1)
+    week_shape /= np.maximum(week_shape.sum(1, keepdims=True), 1e-12)
+    # Blend weekday and whole-week hourly shapes, weighted by portions vs prior
+    profile = (profile + profile_prior * week_shape[:, None, :]) * (
+        weekday_totals / np.maximum(weekday_totals + profile_prior, 1e-12)
+    )[:, :, None]
+
+    daily = by_week.sum(3).reshape(dishes, weeks * 7)
+    expected = np.tile(weekday_totals, (1, weeks))
+    recent = _decay(weeks * 7, level_smoothing)
+    seen = daily @ recent
+    usual = expected @ recent
+    level = np.divide(seen, usual, out=np.ones(dishes), where=usual > 0)
+    level = level.clip(1 / MAX_LEVEL_SHIFT, MAX_LEVEL_SHIFT)
+    return profile[:, weekday % 7] * level[:, None]
+
+
+def _require():
+    if not FORECAST_AVAILABLE:
+        raise RuntimeError("Demand forecasting needs numpy and pandas installed")
+
+
+def forecast_day(target, history_days=None):
+    """
+    (history, forecast) for `target` from the FORECAST_HISTORY_DAYS days
+    before it; a target further ahead than tomorrow uses history up to today
+    """
+    _require()
+    history_days = history_days or settings.FORECAST_HISTORY_DAYS
+    end = min(target, timezone.localdate() + timedelta(days=1))
+    first_day = end - timedelta(days=history_days)
+
+    started = time.perf_counter()
+    history = DemandHistory.load(first_day, history_days)
+    loaded = time.perf_counter()
+    forecast = fit(history.demand, first_day, target)
+    finished = time.perf_counter()
+    logger.info(
+        f"Demand forecast for {target}: {len(history.names)} dishes over {history_days} days, "
+        f"loaded in {(loaded - started) * 1000:.0f} ms, fitted in {(finished - loaded) * 1000:.0f} ms"
+    )
+    return history, forecast
+
+
+def store_forecast(target, history, forecast):
+    """
+    Replace the stored forecasts for `target`; returns the number of dishes kept
+    """
+    totals = forecast.sum(1)
+    rows = [
+        DishForecast(
+            date=target,
+            item_name=name,
+            category=category,
+            hourly=[round(float(q), 2) for q in hourly],
+            total=round(float(total), 2),
+        )
+        for name, category, hourly, total in zip(history.names, history.categories, forecast, totals)
+        if total >= MIN_DAILY_PORTIONS
+    ]
+    with transaction.atomic():
+        DishForecast.objects.filter(date=target).delete()
+        DishForecast.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def _wape(predicted, actual):
+    """
+    Absolute error as a share of actual demand, and the signed bias likewise
+    """
+    total = actual.sum()
+    if not total:
+        return None, None
+    return float(np.abs(predicted - actual).sum() / total), float((predicted - actual).sum() / total)
+
+
+def backtest(days=None, history_days=None, **params):
+    """
+    Forecast each of the last `days` finished days from only the history
+    before it, as the nightly job would have, and score the forecasts against
+    what was ordered, next to the naive same-weekday-last-week forecast.
+    `params` override fit()'s smoothing settings.
+    """
+    _require()
+    days = days or settings.FORECAST_BACKTEST_DAYS
+    history_days = history_days or settings.FORECAST_HISTORY_DAYS
+    first_target = timezone.localdate() - timedelta(days=days)
+    first_day = first_target - timedelta(days=history_days)
+    history = DemandHistory.load(first_day, history_days + days)
+
+    started = time.perf_counter()
+    forecasts = np.stack([
+        fit(history.window(history_days + i, history_days), first_day + timedelta(days=i),
+            first_target + timedelta(days=i), **params)
+        for i in range(days)
+    ])
+    fit_seconds = (time.perf_counter() - started) / days
+
+    actual = history.demand[:, history_days:].transpose(1, 0, 2)  # day x dish x hour
+    naive = history.demand[:, history_days - 7:history_days - 7 + days].transpose(1, 0, 2)
+
+    def scores(predicted):
+        hourly_wape, bias = _wape(predicted, actual)
+        daily_wape, _ = _wape(predicted.sum(2), actual.sum(2))
+        return {'hourly_wape': hourly_wape, 'daily_wape': daily_wape, 'bias': bias}
+
+    volume = actual.sum((0, 2))
+    top = volume.argsort()[::-1][:settings.FORECAST_BACKTEST_TOP_DISHES]
+    return {
+        'from': first_target.isoformat(),
+        'days': days,
+        'dishes': len(history.names),
+        'portions': float(volume.sum()),
+        'fit_ms': fit_seconds * 1000,
+        'model': scores(forecasts),
+        'naive': scores(naive),
+        'top_dishes': [
+            {
+                'item_name': history.names[dish],
+                'portions': float(volume[dish]),
+                'model_daily_wape': _wape(forecasts[:, dish].sum(1), actual[:, dish].sum(1))[0],
+                'naive_daily_wape': _wape(naive[:, dish].sum(1), actual[:, dish].sum(1))[0],
+            }
+            for dish in top if volume[dish]
+        ],
+    }
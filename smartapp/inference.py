@@ -0,0 +1,162 @@
+"""
+Out-of-process sentiment inference
+Runs the sentiment model in a small pool of long-lived worker processes so
+text cleanup and vectorization don't hold the web worker's GIL
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _init_worker():
+    import django
+    django.setup()
+    from .sentiment_analysis import SentimentAnalyzer
+    SentimentAnalyzer._load_model()
+
+
+def _analyze_batch(texts):
+    # Runs in a worker process; the model there hot-swaps like it does in-process
+    from .sentiment_analysis import SentimentAnalyzer
+    return SentimentAnalyzer._load_model().analyze_batch(texts)
+
+
+class InferenceExecutor:
+    """
+    Process pool fed by a dispatcher thread.
+
+    Callers get a Future per text. The dispatcher sends whatever is queued
+    (up to SENTIMENT_EXECUTOR_BATCH texts) to the pool as one batch, so under
+    load many requests share one pickle round trip and one vectorizer call,
+    and a lone request is sent straight away.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, workers=2, batch_size=32, timeout=2.0):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self._pending = queue.Queue()
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._dispatcher = threading.Thread(target=self._dispatch, name='sentiment-dispatcher', daemon=True)
+        self._dispatcher.start()
+
+    @classmethod
+    def shared(cls):
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls(
+                        settings.SENTIMENT_EXECUTOR_WORKERS,
+                        settings.SENTIMENT_EXECUTOR_BATCH,
+                        settings.SENTIMENT_EXECUTOR_TIMEOUT,
+                    )
+        return cls._shared
+
+    @classmethod
+    def reset_shared(cls):
+        with cls._shared_lock:
+            if cls._shared is not None:
+                cls._shared.shutdown()
+            cls._shared = None
+
+    def pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn, not fork: forking a threaded web worker can copy held locks
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                )
+            return self._pool
+
+    def warm_up(self):
+        """
+        Start every worker and load the model there; the first request
+        otherwise pays for process start-up and may time out
+        """
+        pool = self.pool()
+        for future in [pool.submit(_analyze_batch, ['warm up']) for _ in range(self.workers)]:
+            future.result()
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def submit(self, text):
+        future = Future()
+        self._pending.put((text, future))
+        return future
+
+    def _dispatch(self):
+        while True:
+            batch = [self._pending.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                results = self.pool().submit(_analyze_batch, [text for text, _ in batch])
+            except (BrokenProcessPool, RuntimeError) as e:
+                self._fail(batch, e)
+                continue
+            results.add_done_callback(lambda done, batch=batch: self._resolve(batch, done))
+
+    def _resolve(self, batch, done):
+        try:
+            results = done.result()
+        except BrokenProcessPool as e:
+            # A worker died (e.g. OOM-killed); start a fresh pool next time
+            logger.error(f"Sentiment worker pool broken, restarting it: {e}")
+            self.shutdown()
+            self._fail(batch, e)
+            return
+        except Exception as e:
+            self._fail(batch, e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _fail(self, batch, error):
+        for _, future in batch:
+            future.set_exception(RuntimeError(f"Sentiment analysis failed: {error}"))
+
+    def analyze(self, text):
+        """
+        Score `text` in a worker process; RuntimeError on timeout or failure
+        """
+        future = self.submit(text)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise RuntimeError(f"Sentiment analysis timed out after {self.timeout}s")
+
+    async def analyze_async(self, text):
+        """
+        analyze() for ASGI views: awaits the worker without blocking the event loop
+        """
+        future = self.submit(text)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"Sentiment analysis timed out after {self.timeout}s")
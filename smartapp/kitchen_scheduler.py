@@ -0,0 +1,187 @@
+"""
+Kitchen batching scheduler
+Groups identical dishes across open orders into cook batches
+"""
+
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F, Prefetch
+
+from .models import Order, OrderItem, allergen_labels
+from .wait_time import QUEUED_STATUSES, WaitTimeEstimator
+from .caching import order_version, order_state_stale
+
+
+class KitchenScheduler:
+    """
+    Maintains the pending dishes of every open order, keyed by item name.
+
+    Orders are added when they are placed and dropped when the kitchen marks them
+    ready, so building the "what to cook next" queue only walks the distinct
+    dishes currently waiting rather than every ticket in the database. Once
+    the kitchen starts an order its tickets stay here but leave the queue.
+    Batches are ordered by latest start time (deadline minus prep time), so the
+    dish with the least slack comes first and longer dishes win ties.
+
+    Each worker keeps its own copy and rebuilds it when another process has
+    changed orders (see caching.order_state_stale).
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self):
+        self.batch_size = getattr(settings, 'KITCHEN_BATCH_SIZE', 10)
+        self._lock = threading.RLock()
+        # item_name -> {order_id: ticket}
+        self.dishes = {}
+        # order_id -> item names it contributes to
+        self.order_dishes = {}
+        # Orders the kitchen has started cooking
+        self.started = set()
+        self.version = None
+        self.loaded_at = None
+
+    @classmethod
+    def shared(cls):
+        """
+        Process-wide scheduler, loaded from the database on first use and
+        again after other processes' order writes
+        """
+        # Read before loading, so a write during the load forces another
+        version = order_version()
+        scheduler = cls._shared
+        if scheduler is None or order_state_stale(scheduler, version):
+            with cls._shared_lock:
+                scheduler = cls._shared
+                if scheduler is None or order_state_stale(scheduler, version):
+                    scheduler = cls()
+                    scheduler.load_from_db()
+                    scheduler.version = version
+                    scheduler.loaded_at = time.monotonic()
+                    cls._shared = scheduler
+        return scheduler
+
+    @classmethod
+    def reset_shared(cls):
+        with cls._shared_lock:
+            cls._shared = None
+
+    def order_added(self, order, items):
+        """
+        Add an open order's items ({'name', 'category', 'quantity'}) to the queue
+        """
+        deadline = order.order_time + timedelta(minutes=order.estimated_wait_time)
+        with self._lock:
+            if order.id in self.order_dishes:
+                return
+            names = []
+            for item in items:
+                tickets = self.dishes.setdefault(item['name'], {})
+                ticket = tickets.get(order.id)
+                if ticket is None:
+                    tickets[order.id] = {
+                        'order_id': order.id,
+                        'table_number': order.table_number,
+                        'category': item['category'],
+                        'quantity': item['quantity'],
+                        'order_time': order.order_time,
+                        'deadline': deadline,
+                        # Allergens in the dish that this ticket's diner can't have
+                        'allergen_conflicts': item.get('allergen_conflicts', 0),
+                        'allergens': allergen_labels(item.get('allergen_conflicts', 0)),
+                    }
+                    names.append(item['name'])
+                else:
+                    ticket['quantity'] += item['quantity']
+                    if item.get('allergen_conflicts'):
+                        ticket['allergen_conflicts'] |= item['allergen_conflicts']
+                        ticket['allergens'] = allergen_labels(ticket['allergen_conflicts'])
+            self.order_dishes[order.id] = names
+
+    def order_started(self, order_id):
+        """
+        The kitchen is cooking the order; its dishes no longer need batching
+        """
+        with self._lock:
+            if order_id in self.order_dishes:
+                self.started.add(order_id)
+
+    def order_done(self, order_id):
+        with self._lock:
+            self.started.discard(order_id)
+            for name in self.order_dishes.pop(order_id, ()):
+                tickets = self.dishes.get(name)
+                if tickets is None:
+                    continue
+                tickets.pop(order_id, None)
+                if not tickets:
+                    del self.dishes[name]
+
+    def cook_queue(self):
+        """
+        Consolidated cook batches, most urgent first
+        """
+        estimator = WaitTimeEstimator.shared()
+        with self._lock:
+            snapshot = [
+                (name, [ticket for order_id, ticket in tickets.items() if order_id not in self.started])
+                for name, tickets in self.dishes.items()
+            ]
+
+        batches = []
+        for name, tickets in snapshot:
+            if not tickets:
+                continue
+            tickets.sort(key=lambda t: (t['deadline'], t['order_time']))
+            prep = estimator.prep_minutes(name, tickets[0]['category'])
+            batch = None
+            for ticket in tickets:
+                # A ticket joins a batch whole if it fits; one larger than a
+                # whole batch is split across as many as it takes
+                remaining = ticket['quantity']
+                while remaining > 0:
+                    portions = min(remaining, self.batch_size) if self.batch_size else remaining
+                    if batch is None or (self.batch_size and batch['quantity'] + portions > self.batch_size):
+                        batch = {
+                            'item_name': name,
+                            'category': ticket['category'],
+                            'quantity': 0,
+                            'prep_minutes': int(round(prep)),
+                            'deadline': ticket['deadline'],
+                            'start_by': ticket['deadline'] - timedelta(minutes=prep),
+                            'tickets': [],
+                        }
+                        batches.append(batch)
+                    batch['quantity'] += portions
+                    batch['tickets'].append(ticket if portions == ticket['quantity'] else dict(ticket, quantity=portions))
+                    remaining -= portions
+
+        batches.sort(key=lambda b: (b['start_by'], -b['prep_minutes']))
+        return batches
+
+    def load_from_db(self):
+        """
+        Rebuild the queue from orders that are still open
+        """
+        orders = (
+            Order.objects.filter(status__in=QUEUED_STATUSES)
+            .annotate(started_at=F('kds__start_time'))
+            .prefetch_related(Prefetch('items', queryset=OrderItem.objects.only(
+                'order_id', 'item_name', 'category', 'quantity', 'allergen_conflicts')))
+            .order_by('order_time')
+        )
+        for order in orders.iterator(chunk_size=1000):
+            self.order_added(order, [
+                {
+                    'name': item.item_name,
+                    'category': item.category,
+                    'quantity': item.quantity,
+                    'allergen_conflicts': item.allergen_conflicts,
+                }
+                for item in order.items.all()
+            ])
+            if order.started_at:
+                self.order_started(order.id)
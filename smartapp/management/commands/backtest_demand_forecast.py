@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from smartapp.forecasting import backtest
+
+class Command(BaseCommand):
+    help = 'Forecast recent days from the history before each and report accuracy against what was ordered'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Finished days to forecast (default: FORECAST_BACKTEST_DAYS)')
+        parser.add_argument('--history-days', type=int, help='Days of history per forecast (default: FORECAST_HISTORY_DAYS)')
+
+    def handle(self, *args, **options):
+        try:
+            report = backtest(options['days'], options['history_days'])
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        if not report['portions']:
+            self.stdout.write(self.style.WARNING('No orders in the backtest period'))
+            return
+
+        self.stdout.write(
+            f"{report['days']} days from {report['from']}: {report['portions']:.0f} portions of "
+            f"{report['dishes']} dishes, {report['fit_ms']:.0f} ms per fit"
+        )
+        self._report('Weekday x hour profile', report['model'])
+        self._report('Same day last week', report['naive'])
+        self.stdout.write('Daily WAPE by dish (model / naive):')
+        for dish in report['top_dishes']:
+            self.stdout.write(
+                f"  {dish['item_name'][:40]:<40} {dish['portions']:>7.0f}  "
+                f"{dish['model_daily_wape'] * 100:5.1f}% / {dish['naive_daily_wape'] * 100:5.1f}%"
+            )
+
+    def _report(self, label, scores):
+        # WAPE: absolute error as a share of portions actually ordered
+        self.stdout.write(self.style.SUCCESS(
+            f"{label}: WAPE hourly {scores['hourly_wape'] * 100:.1f}%, daily {scores['daily_wape'] * 100:.1f}%, "
+            f"bias {scores['bias'] * 100:+.1f}%"
+        ))
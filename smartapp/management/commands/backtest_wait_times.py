@@ -0,0 +1,63 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+from django.utils import timezone
+from smartapp.models import KDS, OrderItem
+from smartapp.wait_time import WaitTimeEstimator, legacy_wait_time, _order_items
+
+class Command(BaseCommand):
+    help = 'Replay finished orders through the wait time estimator and report its accuracy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help='How many days of history to replay')
+        parser.add_argument('--tolerance', type=int, default=5, help='Minutes an estimate may be off and still count as on time')
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days'])
+        history = (
+            KDS.objects.filter(kitchen_status='Ready', ready_time__isnull=False, order__order_time__gte=since)
+            .select_related('order')
+            .prefetch_related(Prefetch('order__items', queryset=OrderItem.objects.only(
+                'order_id', 'item_name', 'category', 'quantity')))
+        )
+
+        # Arrivals and completions in time order; the estimator only knows what had
+        # happened before each order was placed.
+        events = []
+        for kds in history.iterator(chunk_size=1000):
+            items = _order_items(kds.order)
+            events.append((kds.order.order_time, 1, kds, items))
+            events.append((kds.ready_time, 0, kds, items))
+        events.sort(key=lambda e: (e[0], e[1]))
+
+        if not events:
+            self.stdout.write(self.style.WARNING('No finished orders to backtest'))
+            return
+
+        estimator = WaitTimeEstimator()
+        engine_errors = []
+        legacy_errors = []
+        for _, is_arrival, kds, items in events:
+            if is_arrival:
+                actual = (kds.ready_time - kds.order.order_time).total_seconds() / 60
+                estimate = estimator.estimate(items)
+                engine_errors.append(estimate - actual)
+                legacy_errors.append(legacy_wait_time(sum(i['quantity'] for i in items)) - actual)
+                estimator.order_queued(kds.order_id, items)
+            else:
+                if kds.start_time:
+                    estimator.learn(items, (kds.ready_time - kds.start_time).total_seconds() / 60)
+                estimator.order_done(kds.order_id)
+
+        self.stdout.write(f'Orders replayed: {len(engine_errors)}')
+        self._report('Load-aware estimator', engine_errors, options['tolerance'])
+        self._report('Legacy 15 + 2/item', legacy_errors, options['tolerance'])
+
+    def _report(self, label, errors, tolerance):
+        n = len(errors)
+        mae = sum(abs(e) for e in errors) / n
+        bias = sum(errors) / n
+        on_time = sum(1 for e in errors if abs(e) <= tolerance) / n * 100
+        self.stdout.write(self.style.SUCCESS(
+            f'{label}: MAE {mae:.1f} min, bias {bias:+.1f} min, within ±{tolerance} min {on_time:.1f}%'
+        ))
@@ -0,0 +1,189 @@
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from smartapp.models import Feedback, Order
+
+try:
+    import uvicorn  # noqa: F401
+    UVICORN_AVAILABLE = True
+except ImportError:
+    UVICORN_AVAILABLE = False
+
+# Rows the benchmark creates carry this name and are deleted afterwards
+BENCHMARK_CUSTOMER = 'async-benchmark'
+
+ORDER_BODY = json.dumps({
+    'name': BENCHMARK_CUSTOMER,
+    'table': 7,
+    'cart': [
+        {'name': 'Paneer Tikka', 'quantity': 2, 'price': 250, 'category': 'Starters'},
+        {'name': 'Butter Naan', 'quantity': 3, 'price': 60, 'category': 'Breads'},
+    ],
+}).encode()
+
+FEEDBACK_BODY = json.dumps({
+    'customer_name': BENCHMARK_CUSTOMER,
+    'feedback_category': 'Food',
+    'rating': 3,
+    'feedback_text': 'The biryani was tasty but it arrived cold and the waiter was slow',
+}).encode()
+
+ENDPOINTS = {
+    'order': ('POST', '/submit_order/', ORDER_BODY),
+    'feedback': ('POST', '/submit_feedback/', FEEDBACK_BODY),
+    'list': ('GET', '/api/feedback/', b''),
+}
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def _request(reader, writer, method, path, body):
+    writer.write(
+        f'{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n'
+        f'Content-Length: {len(body)}\r\n\r\n'.encode() + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def _load(port, endpoint, connections, total):
+    """
+    Send `total` requests over `connections` keep-alive connections.
+    Returns (latencies, errors, elapsed seconds).
+    """
+    method, path, body = ENDPOINTS[endpoint]
+    latencies = []
+    errors = 0
+    remaining = total
+
+    async def client():
+        nonlocal remaining, errors
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                try:
+                    status = await _request(reader, writer, method, path, body)
+                except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+                    errors += 1
+                    writer.close()
+                    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                    continue
+                latencies.append(time.perf_counter() - started)
+                if status >= 400:
+                    errors += 1
+        finally:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(connections)))
+    return latencies, errors, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = 'Compare sync and async order/feedback endpoints under concurrent connections with uvicorn'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='feedback')
+        parser.add_argument('--connections', default='10,50,100,200',
+                            help='Comma-separated concurrent connection counts to try')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per connection count')
+        parser.add_argument('--latency-budget', type=float, default=500.0,
+                            help='p95 latency in ms a connection count must stay under to count as served')
+
+    def handle(self, *args, **options):
+        if not UVICORN_AVAILABLE:
+            raise CommandError('uvicorn is not installed: pip install uvicorn')
+        levels = [int(n) for n in options['connections'].split(',') if n.strip()]
+        endpoint = options['endpoint']
+
+        try:
+            capacity = {}
+            for mode in ('sync', 'async'):
+                self.stdout.write(f"\n{mode} views, {endpoint} endpoint")
+                capacity[mode] = self._run_mode(mode, endpoint, levels, options)
+        finally:
+            Order.objects.filter(customer_name=BENCHMARK_CUSTOMER).delete()
+            Feedback.objects.filter(customer_name=BENCHMARK_CUSTOMER).delete()
+
+        self.stdout.write('')
+        budget = options['latency_budget']
+        for mode, served in capacity.items():
+            if served:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{mode}: up to {served} concurrent connections with p95 under {budget:.0f} ms and no errors"
+                ))
+            else:
+                self.stdout.write(self.style.WARNING(f"{mode}: no tried connection count stayed under {budget:.0f} ms"))
+
+    def _run_mode(self, mode, endpoint, levels, options):
+        port = _free_port()
+        # Every request comes from one address, which the rate limits would throttle
+        env = dict(os.environ, ASYNC_VIEWS='1' if mode == 'async' else '0', RATE_LIMIT_ENABLED='0')
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'smart.asgi:application', '--port', str(port),
+             '--log-level', 'warning', '--no-access-log'],
+            cwd=str(settings.BASE_DIR), env=env,
+            # Per-request log lines would drown the results
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            self._wait_until_up(server, port)
+            # Load the sentiment model and the kitchen state before measuring
+            asyncio.run(_load(port, endpoint, 1, 3))
+
+            served = 0
+            for connections in levels:
+                latencies, errors, elapsed = asyncio.run(_load(port, endpoint, connections, options['requests']))
+                p95 = _percentile(latencies, 0.95) * 1000
+                self.stdout.write(
+                    f"  {connections:>4} conns: {len(latencies) / elapsed:7.1f} req/s  "
+                    f"p50 {statistics.median(latencies) * 1000 if latencies else 0:7.1f} ms  "
+                    f"p95 {p95:7.1f} ms  p99 {_percentile(latencies, 0.99) * 1000:7.1f} ms  "
+                    f"errors {errors}"
+                )
+                if not errors and p95 <= options['latency_budget']:
+                    served = connections
+            return served
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+    def _wait_until_up(self, server, port, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'uvicorn exited with status {server.returncode}; try running it directly')
+            try:
+                with socket.create_connection(('127.0.0.1', port), timeout=1):
+                    return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f'uvicorn did not start on port {port} within {timeout}s')
@@ -0,0 +1,79 @@
+import time
+from django.core import signals
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.conf import settings
+from smartapp.models import FoodItem, Order
+
+class Command(BaseCommand):
+    help = 'Compare request latency and throughput with and without connection reuse'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Simulated requests per profile')
+        parser.add_argument(
+            '--sqlite', nargs='?', const=str(settings.BASE_DIR / 'db.sqlite3'), default=None,
+            help='Benchmark against a SQLite file instead of the default database (defaults to db.sqlite3)',
+        )
+
+    def handle(self, *args, **options):
+        base = dict(connections['default'].settings_dict)
+        if options['sqlite']:
+            base.update(ENGINE='django.db.backends.sqlite3', NAME=options['sqlite'], OPTIONS={})
+
+        profiles = [
+            ('new connection per request', {'CONN_MAX_AGE': 0}),
+            ('persistent connections', {'CONN_MAX_AGE': 600}),
+        ]
+        if base['ENGINE'] == 'django.db.backends.postgresql':
+            pool_options = dict(base['OPTIONS'], pool={'min_size': 2, 'max_size': 4})
+            profiles.append(('connection pool', {'CONN_MAX_AGE': 0, 'OPTIONS': pool_options}))
+
+        self.stdout.write(f"Engine: {base['ENGINE']}  database: {base['NAME']}")
+        results = []
+        for label, overrides in profiles:
+            alias = f"bench_{len(results)}"
+            profile = dict(base, **overrides)
+            if 'pool' not in profile['OPTIONS']:
+                profile['OPTIONS'] = {k: v for k, v in profile['OPTIONS'].items() if k != 'pool'}
+            connections.settings[alias] = profile
+            try:
+                results.append((label, self._run(alias, options['requests'])))
+            finally:
+                connections[alias].close()
+                if 'pool' in profile['OPTIONS']:
+                    connections[alias].close_pool()
+                del connections[alias]
+                del connections.settings[alias]
+
+        baseline = results[0][1]['mean']
+        for label, r in results:
+            self.stdout.write(self.style.SUCCESS(
+                f"{label:28s} mean {r['mean'] * 1000:7.3f} ms  p95 {r['p95'] * 1000:7.3f} ms  "
+                f"{r['throughput']:8.0f} req/s  ({baseline / r['mean']:.2f}x)"
+            ))
+
+    def _run(self, alias, n):
+        """
+        Each iteration mimics one order-page request: the request signals drive
+        Django's connection lifecycle exactly as they do for real requests.
+        """
+        timings = []
+        started = time.perf_counter()
+        for _ in range(n):
+            t0 = time.perf_counter()
+            signals.request_started.send(sender=self.__class__)
+            # Only columns present in every schema revision, so an older
+            # db.sqlite3 works as a stand-in
+            list(FoodItem.objects.using(alias).values_list('id', 'name', 'price', 'category'))
+            list(FoodItem.objects.using(alias).values_list('category', flat=True).distinct())
+            Order.objects.using(alias).filter(status='pending').count()
+            signals.request_finished.send(sender=self.__class__)
+            timings.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - started
+
+        timings.sort()
+        return {
+            'mean': sum(timings) / n,
+            'p95': timings[int(n * 0.95) - 1],
+            'throughput': n / elapsed,
+        }
@@ -0,0 +1,52 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from smartapp.models import Feedback
+from smartapp.feedback_search import FeedbackSearchIndex, search_feedback, uses_postgres_search
+
+DEFAULT_QUERIES = ['food', 'cold food', 'slow service', 'delicious momo', 'rude staff', 'dirty table', 'delicous']
+
+
+class Command(BaseCommand):
+    help = 'Compare feedback search latency against a plain icontains scan'
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='*', help='Queries to time (defaults to a built-in set)')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per query')
+
+    def handle(self, *args, **options):
+        queries = options['queries'] or DEFAULT_QUERIES
+        repeat = options['repeat']
+        total = Feedback.objects.count()
+        backend = 'PostgreSQL full-text' if uses_postgres_search() else 'in-process BM25'
+        self.stdout.write(f"{total} feedback rows, search backend: {backend}")
+
+        if not uses_postgres_search():
+            FeedbackSearchIndex.reset_shared()
+            start = time.perf_counter()
+            FeedbackSearchIndex.shared().catch_up()
+            self.stdout.write(f"Index built in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        for query in queries:
+            ranked, search_ms = self._time(lambda: search_feedback(query, limit=50), repeat)
+            matched, scan_ms = self._time(lambda: self._icontains(query), repeat)
+            self.stdout.write(self.style.SUCCESS(
+                f"{query!r:20s} index {search_ms:8.3f} ms ({len(ranked):3d} shown)  "
+                f"icontains {scan_ms:8.3f} ms ({len(matched):3d} shown)  "
+                f"{scan_ms / search_ms if search_ms else 0:6.1f}x"
+            ))
+
+    def _icontains(self, query):
+        # What the admin did before: every word as a substring, newest first
+        queryset = Feedback.objects.all()
+        for word in query.split():
+            queryset = queryset.filter(feedback_text__icontains=word)
+        return list(queryset.order_by('-created_at').values_list('id', flat=True)[:50])
+
+    def _time(self, fn, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = fn()
+            timings.append(time.perf_counter() - start)
+        return result, statistics.median(timings) * 1000
@@ -0,0 +1,71 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+from smartapp.compression import BROTLI_AVAILABLE, compress
+
+DEFAULT_PATHS = [
+    '/',
+    '/order/',
+    '/api/menu/search/?q=pa',
+    '/api/feedback/',
+    '/api/feedback/?format=compact',
+]
+
+
+def _cpu_ms(func, repeat):
+    started = time.process_time()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.process_time() - started) * 1000 / repeat
+
+
+class Command(BaseCommand):
+    help = 'Measure compression savings and conditional-GET savings per endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help=f"Paths to measure (default: {' '.join(DEFAULT_PATHS)})")
+        parser.add_argument('--repeat', type=int, default=5, help='Timed repetitions per measurement')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or DEFAULT_PATHS
+        repeat = options['repeat']
+        if 'testserver' not in settings.ALLOWED_HOSTS and '*' not in settings.ALLOWED_HOSTS:
+            settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+        client = Client()
+        codings = ['gzip', 'br'] if BROTLI_AVAILABLE else ['gzip']
+
+        for path in paths:
+            # The first request sets cookies (e.g. CSRF) the ETag may depend on
+            client.get(path)
+            response, render_ms = _cpu_ms(lambda: client.get(path), repeat)
+            if response.status_code != 200:
+                self.stdout.write(self.style.WARNING(f"{path}: HTTP {response.status_code}, skipped"))
+                continue
+            body = response.content
+            self.stdout.write(f"\n{path}  {len(body):,} bytes, {render_ms:.1f} ms CPU to render")
+
+            for coding in codings:
+                compressed, compress_ms = _cpu_ms(lambda: compress(body, coding), repeat)
+                if len(body) < settings.COMPRESSION_MIN_SIZE:
+                    note = ' (under COMPRESSION_MIN_SIZE, sent uncompressed)'
+                else:
+                    note = ''
+                self.stdout.write(
+                    f"  {coding:<5} {len(compressed):>10,} bytes  "
+                    f"{100 - len(compressed) * 100 / len(body):5.1f}% smaller  "
+                    f"{compress_ms:6.2f} ms CPU{note}"
+                )
+
+            etag = response.get('ETag')
+            if not etag:
+                self.stdout.write('  no ETag, conditional requests always re-render')
+                continue
+            not_modified, conditional_ms = _cpu_ms(lambda: client.get(path, HTTP_IF_NONE_MATCH=etag), repeat)
+            if not_modified.status_code == 304:
+                self.stdout.write(self.style.SUCCESS(
+                    f"  304   {conditional_ms:.2f} ms CPU instead of {render_ms:.1f} ms, "
+                    f"{len(body):,} bytes not sent"
+                ))
+            else:
+                self.stdout.write(self.style.WARNING(f"  revalidation returned HTTP {not_modified.status_code}"))
@@ -0,0 +1,81 @@
+import itertools
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from smartapp.models import Feedback
+from smartapp.inference import InferenceExecutor
+from smartapp.sentiment_analysis import SentimentAnalyzer
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+class Command(BaseCommand):
+    help = 'Compare in-thread and process-pool sentiment inference under concurrent load'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent request threads')
+        parser.add_argument('--requests', type=int, default=400, help='Texts scored per mode')
+
+    def handle(self, *args, **options):
+        texts = list(Feedback.objects.values_list('feedback_text', flat=True)[:options['requests']])
+        if not texts:
+            texts = ['The food was great but the service was slow']
+        # Fewer rows than --requests are reused, so every mode scores the full count
+        texts = list(itertools.islice(itertools.cycle(texts), options['requests']))
+
+        executor = InferenceExecutor.shared()
+        executor.warm_up()
+        SentimentAnalyzer._load_model()
+
+        original = settings.SENTIMENT_EXECUTOR
+        try:
+            for mode in ('inline', 'process'):
+                settings.SENTIMENT_EXECUTOR = mode
+                self._report(mode, *self._run(texts, options['threads']))
+        finally:
+            settings.SENTIMENT_EXECUTOR = original
+            InferenceExecutor.reset_shared()
+
+    def _run(self, texts, threads):
+        """
+        Score `texts` from a thread pool while a ticker thread does small
+        pure-Python jobs, standing in for the rest of request handling; its
+        latency shows how much inference holds the GIL
+        """
+        ticks = []
+        stop = threading.Event()
+
+        def ticker():
+            while not stop.is_set():
+                started = time.perf_counter()
+                sum(i * i for i in range(2000))
+                ticks.append(time.perf_counter() - started)
+                time.sleep(0.001)
+
+        def call(text):
+            started = time.perf_counter()
+            SentimentAnalyzer.analyze_sentiment(text)
+            return time.perf_counter() - started
+
+        tick_thread = threading.Thread(target=ticker)
+        tick_thread.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            latencies = list(pool.map(call, texts))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        tick_thread.join()
+        return len(texts) / elapsed, latencies, ticks
+
+    def _report(self, mode, throughput, latencies, ticks):
+        self.stdout.write(self.style.SUCCESS(
+            f'{mode:8s} {throughput:7.0f} texts/s  '
+            f'call p50 {statistics.median(latencies) * 1000:6.2f} ms  p95 {_percentile(latencies, 0.95) * 1000:6.2f} ms  '
+            f'other work p50 {statistics.median(ticks) * 1000:5.2f} ms  p99 {_percentile(ticks, 0.99) * 1000:6.2f} ms'
+        ))
@@ -0,0 +1,95 @@
+import gzip
+import os
+from django.conf import settings
+from django.contrib.staticfiles.finders import get_finder
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from smartapp.static_images import build_variants
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+COMPRESSIBLE = ('.css', '.js', '.html', '.svg', '.json', '.txt')
+
+
+class Command(BaseCommand):
+    help = (
+        'Build deployable static files: responsive image variants, collectstatic with '
+        'content-hashed names, and .gz/.br copies of text assets for the web server '
+        'to serve directly (e.g. nginx gzip_static/brotli_static)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild every image variant')
+        parser.add_argument('--skip-images', action='store_true', help='Only collect and precompress')
+
+    def handle(self, *args, **options):
+        if not options['skip_images']:
+            try:
+                manifest, source_bytes, variant_bytes = build_variants(
+                    force=options['force'], log=self.stdout.write
+                )
+            except RuntimeError as e:
+                raise CommandError(f'Cannot build image variants: {e}')
+            self.stdout.write(self.style.SUCCESS(
+                f'Images: {len(manifest)} sources, {_mb(source_bytes)} -> {_mb(variant_bytes)} '
+                f'at full width ({_saved(source_bytes, variant_bytes)} saved)'
+            ))
+
+        # settings only lists the variants directory once it exists, so make sure
+        # a first build collects what it just generated
+        if os.path.isdir(settings.STATIC_VARIANTS_DIR) and settings.STATIC_VARIANTS_DIR not in settings.STATICFILES_DIRS:
+            settings.STATICFILES_DIRS.append(settings.STATIC_VARIANTS_DIR)
+            get_finder.cache_clear()
+
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.stdout.write(self.style.SUCCESS(f'Collected static files into {settings.STATIC_ROOT}'))
+
+        original, gz_total, br_total = self._precompress()
+        summary = f'Precompressed text assets: {_mb(original)} -> gzip {_mb(gz_total)}'
+        if BROTLI_AVAILABLE:
+            summary += f', brotli {_mb(br_total)}'
+        else:
+            summary += ' (install brotli for .br files)'
+        self.stdout.write(self.style.SUCCESS(summary))
+
+    def _precompress(self):
+        original = gz_total = br_total = 0
+        for dirpath, dirnames, filenames in os.walk(staticfiles_storage.location):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if not filename.endswith(COMPRESSIBLE):
+                    continue
+                path = os.path.join(dirpath, filename)
+                with open(path, 'rb') as f:
+                    data = f.read()
+                original += len(data)
+
+                # mtime=0 keeps the output identical between builds
+                compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                gz_total += self._write_if_smaller(path + '.gz', compressed, len(data))
+                if BROTLI_AVAILABLE:
+                    compressed = brotli.compress(data, quality=11)
+                    br_total += self._write_if_smaller(path + '.br', compressed, len(data))
+        return original, gz_total, br_total
+
+    def _write_if_smaller(self, path, data, original_size):
+        if len(data) >= original_size:
+            if os.path.exists(path):
+                os.remove(path)
+            return original_size
+        with open(path, 'wb') as f:
+            f.write(data)
+        return len(data)
+
+
+def _mb(n):
+    return f'{n / 1024 / 1024:.2f} MB'
+
+
+def _saved(before, after):
+    return f'{(1 - after / before) * 100:.0f}%' if before else '0%'
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from smartapp.caching import bump_menu_version
+from smartapp.menu_images import cache_image, prune
+from smartapp.models import FoodItem
+
+class Command(BaseCommand):
+    help = 'Fetch FoodItem images into local storage and generate menu thumbnails'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Re-download and regenerate every image')
+        parser.add_argument('--prune', action='store_true', help='Delete cached images no FoodItem uses any more')
+
+    def handle(self, *args, **options):
+        urls = sorted(set(FoodItem.objects.exclude(img__isnull=True).exclude(img='').values_list('img', flat=True)))
+        fetched = failed = 0
+        for url in urls:
+            try:
+                if cache_image(url, force=options['force']):
+                    fetched += 1
+                    self.stdout.write(f'Cached {url}')
+            except RuntimeError as e:
+                raise CommandError(str(e))
+            except Exception as e:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f'Failed {url}: {e}'))
+
+        if options['prune']:
+            self.stdout.write(f'Removed {prune(urls)} unused files')
+
+        if fetched:
+            # Cached menu fragments still point at the remote URLs
+            bump_menu_version()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(urls)} images: {fetched} cached, {len(urls) - fetched - failed} already up to date, {failed} failed'
+        ))
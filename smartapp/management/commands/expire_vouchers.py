@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from smartapp.vouchers import expire_vouchers
+
+class Command(BaseCommand):
+    help = 'Flag unused discount vouchers past their expiry date as expired'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Vouchers per UPDATE (default: VOUCHER_EXPIRY_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        expired = expire_vouchers(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Expired {expired} vouchers'))
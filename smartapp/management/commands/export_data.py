@@ -0,0 +1,62 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from django.utils import timezone
+from datetime import datetime, time as day_start, timedelta
+from smartapp import exports
+
+def _start_of_day(value):
+    day = parse_date(value)
+    if day is None:
+        raise CommandError(f'Invalid date: {value} (expected YYYY-MM-DD)')
+    return timezone.make_aware(datetime.combine(day, day_start.min))
+
+class Command(BaseCommand):
+    help = 'Export orders (one row per item) or feedback as CSV or XLSX, streaming rows from the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(exports.EXPORTS), help='What to export')
+        parser.add_argument('--format', choices=exports.FORMATS, default='csv', help='File format (default: csv)')
+        parser.add_argument('--output', '-o', help='File to write (default: <name>-<date>.<format>; "-" for stdout, CSV only)')
+        parser.add_argument('--from', dest='date_from', help='First day to include, YYYY-MM-DD')
+        parser.add_argument('--to', dest='date_to', help='Last day to include, YYYY-MM-DD')
+
+    def handle(self, *args, **options):
+        export = exports.EXPORTS[options['name']]
+        file_format = options['format']
+        date_from = _start_of_day(options['date_from']) if options['date_from'] else None
+        date_to = _start_of_day(options['date_to']) + timedelta(days=1) if options['date_to'] else None
+        output = options['output'] or f"{export.name}-{timezone.now():%Y%m%d}.{file_format}"
+        if output == '-' and file_format != 'csv':
+            raise CommandError('Only CSV can be written to stdout')
+
+        total = export.queryset(date_from, date_to).count()
+        start = time.perf_counter()
+        written = 0
+
+        def progress(rows):
+            nonlocal written
+            written = rows
+            percent = written * 100 / total if total else 100
+            rate = written / max(time.perf_counter() - start, 1e-9)
+            # Progress goes to stderr so "-o -" output stays clean
+            self.stderr.write(f'\r{written:,}/{total:,} rows ({percent:.0f}%), {rate:,.0f} rows/s', ending='')
+            self.stderr.flush()
+
+        if file_format == 'xlsx':
+            try:
+                exports.write_xlsx(export, output, date_from, date_to, progress=progress)
+            except RuntimeError as e:
+                raise CommandError(str(e))
+        elif output == '-':
+            for chunk in exports.csv_chunks(export, date_from, date_to, progress=progress):
+                self.stdout.write(chunk, ending='')
+        else:
+            with open(output, 'w', newline='', encoding='utf-8') as f:
+                for chunk in exports.csv_chunks(export, date_from, date_to, progress=progress):
+                    f.write(chunk)
+        self.stderr.write('')
+
+        elapsed = time.perf_counter() - start
+        target = 'stdout' if output == '-' else output
+        self.stderr.write(self.style.SUCCESS(f'Exported {written:,} {export.name} rows to {target} in {elapsed:.1f}s'))
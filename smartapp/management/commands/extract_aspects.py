@@ -0,0 +1,60 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from smartapp.models import Feedback
+from smartapp.aspect_analysis import AspectExtractor, annotate_feedback
+
+class Command(BaseCommand):
+    help = 'Extract aspect-level sentiment for feedback and fill in emotion'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-process feedback that already has an emotion')
+        parser.add_argument('--batch-size', type=int, default=settings.ASPECT_BATCH_SIZE)
+        parser.add_argument('--benchmark', action='store_true',
+                            help='Only measure extraction throughput on stored feedback; nothing is written')
+
+    def handle(self, *args, **options):
+        if options['benchmark']:
+            return self._benchmark()
+
+        queryset = Feedback.objects.only('id', 'feedback_text', 'sentiment', 'emotion').order_by('id')
+        if not options['all']:
+            queryset = queryset.filter(emotion__isnull=True)
+        total = queryset.count()
+        batch_size = options['batch_size']
+
+        done = aspects = 0
+        batch = []
+        start = time.perf_counter()
+        for feedback in queryset.iterator(chunk_size=batch_size):
+            batch.append(feedback)
+            if len(batch) == batch_size:
+                aspects += annotate_feedback(batch, batch_size)
+                done += len(batch)
+                batch = []
+                self.stdout.write(f'{done}/{total} feedback processed')
+        if batch:
+            aspects += annotate_feedback(batch, batch_size)
+            done += len(batch)
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {done} feedback, {aspects} aspects, in {elapsed:.1f}s'
+            f' ({done / elapsed if elapsed else 0:.0f} feedback/s including writes)'
+        ))
+
+    def _benchmark(self):
+        texts = list(Feedback.objects.values_list('feedback_text', flat=True))
+        if not texts:
+            self.stdout.write('No feedback to benchmark')
+            return
+        AspectExtractor.extract_batch(texts[:1])
+        start = time.perf_counter()
+        AspectExtractor.extract_batch(texts)
+        rate = len(texts) / (time.perf_counter() - start)
+
+        target = settings.ASPECT_TARGET_TEXTS_PER_SEC
+        words = sum(len(text.split()) for text in texts) / len(texts)
+        message = f'{len(texts)} texts, {words:.0f} words on average: {rate:.0f} texts/s on one core (target {target})'
+        style = self.style.SUCCESS if rate >= target else self.style.WARNING
+        self.stdout.write(style(message))
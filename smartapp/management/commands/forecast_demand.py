@@ -0,0 +1,34 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from django.utils import timezone
+from smartapp.forecasting import forecast_day, store_forecast
+
+class Command(BaseCommand):
+    help = 'Forecast hourly demand per dish for a day and store it for kitchen prep (run nightly after closing)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Day to forecast, YYYY-MM-DD (default: tomorrow)')
+        parser.add_argument('--history-days', type=int, help='Days of history to fit on (default: FORECAST_HISTORY_DAYS)')
+
+    def handle(self, *args, **options):
+        if options['date']:
+            target = parse_date(options['date'])
+            if target is None:
+                raise CommandError(f"Invalid date: {options['date']} (expected YYYY-MM-DD)")
+        else:
+            target = timezone.localdate() + timedelta(days=1)
+        if options['history_days'] is not None and options['history_days'] < 7:
+            raise CommandError('At least 7 days of history are needed')
+
+        start = time.perf_counter()
+        try:
+            history, forecast = forecast_day(target, options['history_days'])
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        stored = store_forecast(target, history, forecast)
+        self.stdout.write(self.style.SUCCESS(
+            f'Forecast {forecast.sum():.0f} portions of {stored} dishes for {target} '
+            f'in {time.perf_counter() - start:.2f}s'
+        ))
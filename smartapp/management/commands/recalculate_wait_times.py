@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from smartapp.wait_time import WaitTimeEstimator
+
+class Command(BaseCommand):
+    help = 'Re-estimate wait times of queued orders from the current kitchen load'
+
+    def handle(self, *args, **options):
+        estimator = WaitTimeEstimator()
+        estimator.load_from_db()
+        changed = estimator.recalculate_queue()
+
+        self.stdout.write(f'Queued items by category: {estimator.queued_by_category}')
+        self.stdout.write(self.style.SUCCESS(f'Updated estimated wait time for {changed} orders'))
@@ -0,0 +1,37 @@
+import os
+import shutil
+import time
+from django.core.management.base import BaseCommand
+from smartapp.rescoring import checkpoint_dir, rescore_all
+
+class Command(BaseCommand):
+    help = 'Rescore all stored feedback with the current sentiment model, in parallel and resumably'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Worker processes (default: RESCORE_WORKERS or CPU count)')
+        parser.add_argument('--chunk-size', type=int, help='Rows per bulk write (default: RESCORE_CHUNK_SIZE)')
+        parser.add_argument('--checkpoint-dir', help='Where checkpoints and the report go (default: RESCORE_CHECKPOINT_DIR)')
+        parser.add_argument('--restart', action='store_true', help='Discard checkpoints for this model and start over')
+
+    def handle(self, *args, **options):
+        directory = checkpoint_dir(options['checkpoint_dir'])
+        if options['restart'] and os.path.isdir(directory):
+            shutil.rmtree(directory)
+        elif os.path.exists(os.path.join(directory, 'plan.json')):
+            self.stdout.write(f'Resuming from checkpoints in {directory}')
+
+        start = time.perf_counter()
+        totals, report_path = rescore_all(
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            directory=directory,
+            progress=self.stdout.write,
+        )
+        elapsed = time.perf_counter() - start
+
+        for transition, count in sorted(totals['transitions'].items()):
+            self.stdout.write(f'  {transition}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f"Rescored {totals['scored']} feedback in {elapsed:.1f}s, "
+            f"{totals['flipped']} changed label; report: {report_path}"
+        ))
@@ -0,0 +1,79 @@
+import statistics
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Avg, Count, Q
+from django.utils import timezone
+from smartapp.models import ShadowScore
+
+CONFIDENCE_BINS = [(0, 50), (50, 70), (70, 90), (90, 100.01)]
+
+
+class Command(BaseCommand):
+    help = 'Summarize how a shadow-scored candidate sentiment model diverges from production'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--candidate', help='Candidate model version (default: the most recently scored)')
+        parser.add_argument('--days', type=int, help='Only feedback shadow-scored in the last N days')
+
+    def handle(self, *args, **options):
+        scores = ShadowScore.objects.all()
+        if options['days']:
+            scores = scores.filter(created_at__gte=timezone.now() - timedelta(days=options['days']))
+        candidate = options['candidate'] or (
+            scores.order_by('-created_at').values_list('candidate_version', flat=True).first()
+        )
+        if not candidate:
+            raise CommandError('No shadow scores recorded yet')
+        scores = scores.filter(candidate_version=candidate)
+
+        summary = scores.aggregate(
+            total=Count('id'),
+            agreed=Count('id', filter=Q(agreed=True)),
+            production_confidence=Avg('production_confidence'),
+            candidate_confidence=Avg('candidate_confidence'),
+        )
+        if not summary['total']:
+            raise CommandError(f'No shadow scores for candidate {candidate}')
+        productions = sorted(scores.values_list('production_version', flat=True).distinct())
+
+        self.stdout.write(f"Candidate {candidate} vs production {', '.join(productions)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['total']} feedback, agreement {summary['agreed'] / summary['total']:.1%}"
+        ))
+
+        self.stdout.write('\nLatency per text (ms)       p50      p95')
+        for label, field in (('production', 'production_ms'), ('candidate', 'candidate_ms')):
+            timings = sorted(t for t in scores.values_list(field, flat=True) if t is not None)
+            if timings:
+                p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+                self.stdout.write(f'  {label:24s} {statistics.median(timings):7.3f}  {p95:7.3f}')
+
+        self.stdout.write('\nConfidence            mean  ' + '  '.join(f'{lo}-{min(hi, 100):.0f}%' for lo, hi in CONFIDENCE_BINS))
+        for label, field in (('production', 'production_confidence'), ('candidate', 'candidate_confidence')):
+            bins = scores.aggregate(**{
+                f'b{i}': Count('id', filter=Q(**{f'{field}__gte': lo, f'{field}__lt': hi}))
+                for i, (lo, hi) in enumerate(CONFIDENCE_BINS)
+            })
+            counts = '  '.join(f"{bins[f'b{i}']:>6}" for i in range(len(CONFIDENCE_BINS)))
+            self.stdout.write(f"  {label:18s} {summary[field]:5.1f}  {counts}")
+
+        self.stdout.write('\nLabel changes (production -> candidate)')
+        changes = (
+            scores.filter(agreed=False).values('production_sentiment', 'candidate_sentiment')
+            .annotate(count=Count('id')).order_by('-count')
+        )
+        for row in changes:
+            self.stdout.write(f"  {row['production_sentiment']} -> {row['candidate_sentiment']}: {row['count']}")
+
+        for label, field in (('category', 'feedback__category'), ('rating', 'feedback__rating')):
+            self.stdout.write(f'\nDivergence by {label}')
+            rows = (
+                scores.values(field)
+                .annotate(total=Count('id'), disagreed=Count('id', filter=Q(agreed=False)))
+                .order_by(field)
+            )
+            for row in rows:
+                self.stdout.write(
+                    f"  {str(row[field]):12s} {row['total']:6d} scored  "
+                    f"{row['disagreed'] / row['total']:6.1%} disagree"
+                )
@@ -0,0 +1,149 @@
+"""
+Local copies and thumbnails of FoodItem.img
+Each remote image is fetched once into MEDIA_ROOT and served from our own
+domain; files are named after a hash of the URL, so changing a FoodItem's URL
+automatically produces a fresh copy
+"""
+
+import hashlib
+import io
+import logging
+import os
+import threading
+import urllib.request
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+
+from .caching import bump_menu_version
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+MAX_DOWNLOAD_BYTES = 15 * 1024 * 1024
+USER_AGENT = 'SmartRestaurant-MenuImageCache/1.0'
+
+
+def image_dir():
+    return os.path.join(settings.MEDIA_ROOT, settings.MENU_IMAGE_DIR)
+
+
+def url_key(url):
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()[:20]
+
+
+def thumb_name(url, width):
+    return f'{url_key(url)}-{width}.webp'
+
+
+def thumb_url(url, width):
+    """
+    Local thumbnail URL for `url`, or None until it has been cached
+    """
+    if not url:
+        return None
+    name = thumb_name(url, width)
+    if not os.path.exists(os.path.join(image_dir(), name)):
+        return None
+    return reverse('menu_image', args=[name])
+
+
+def fetch_bytes(url, timeout=10):
+    """
+    Download `url`; only http(s) is accepted and the body is size-capped
+    """
+    if urlsplit(url).scheme not in ('http', 'https'):
+        raise ValueError(f"Unsupported image URL: {url}")
+    request = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        data = response.read(MAX_DOWNLOAD_BYTES + 1)
+    if len(data) > MAX_DOWNLOAD_BYTES:
+        raise ValueError(f"Image larger than {MAX_DOWNLOAD_BYTES} bytes: {url}")
+    return data
+
+
+def cache_image(url, force=False, fetch=fetch_bytes):
+    """
+    Make sure every thumbnail size of `url` exists locally.
+    Returns True when something was (re)generated.
+    """
+    if not PIL_AVAILABLE:
+        raise RuntimeError("Pillow not installed")
+
+    directory = image_dir()
+    widths = [w for w, _ in settings.MENU_IMAGE_SIZES]
+    if not force and all(os.path.exists(os.path.join(directory, thumb_name(url, w))) for w in widths):
+        return False
+
+    original_path = os.path.join(directory, 'originals', url_key(url))
+    if force or not os.path.exists(original_path):
+        data = fetch(url)
+        os.makedirs(os.path.dirname(original_path), exist_ok=True)
+        _atomic_write(original_path, data)
+    else:
+        with open(original_path, 'rb') as f:
+            data = f.read()
+
+    with Image.open(io.BytesIO(data)) as source:
+        source.load()
+        image = source.convert('RGB')
+    for width, height in settings.MENU_IMAGE_SIZES:
+        thumb = ImageOps.fit(image, (width, height), Image.LANCZOS)
+        buffer = io.BytesIO()
+        thumb.save(buffer, 'WEBP', quality=80, method=6)
+        _atomic_write(os.path.join(directory, thumb_name(url, width)), buffer.getvalue())
+    return True
+
+
+def cache_after_commit(urls):
+    """
+    Cache `urls` in one background thread once the current transaction
+    commits, when MENU_IMAGE_FETCH_ON_SAVE is on; the menu version is bumped
+    afterwards so pages switch to the local thumbnails
+    """
+    urls = sorted({url for url in urls if url})
+    if not urls or not settings.MENU_IMAGE_FETCH_ON_SAVE:
+        return
+    transaction.on_commit(lambda: threading.Thread(target=_cache_in_background, args=(urls,), daemon=True).start())
+
+
+def _cache_in_background(urls):
+    cached = False
+    for url in urls:
+        try:
+            cached = cache_image(url) or cached
+        except Exception as e:
+            logger.warning(f"Could not cache menu image {url}: {e}")
+    if cached:
+        bump_menu_version()
+
+
+def prune(keep_urls):
+    """
+    Delete cached files for URLs no FoodItem uses any more
+    """
+    keep = {url_key(url) for url in keep_urls if url}
+    removed = 0
+    directory = image_dir()
+    for root in (directory, os.path.join(directory, 'originals')):
+        if not os.path.isdir(root):
+            continue
+        for filename in os.listdir(root):
+            path = os.path.join(root, filename)
+            if os.path.isfile(path) and filename.split('-')[0].split('.')[0] not in keep:
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+def _atomic_write(path, data):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
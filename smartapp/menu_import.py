@@ -0,0 +1,145 @@
+"""
+Menu import engine
+Diffs a menu against the FoodItem table and applies only the changes, in bulk
+and inside one transaction. Items are matched by name, so unchanged rows keep
+their ids and nothing is rewritten when the menu is identical.
+"""
+
+import csv
+import json
+import os
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+
+from .models import FoodItem
+from .caching import bump_menu_version
+from .menu_images import cache_after_commit
+from .allergens import parse_codes
+
+try:
+    import yaml
+    YAML_AVAILABLE = True
+except ImportError:
+    YAML_AVAILABLE = False
+
+FIELDS = ('price', 'category', 'img', 'allergens')
+BATCH_SIZE = 1000
+
+
+def load_menu_file(path):
+    """
+    Read menu rows from a .csv, .json or .yaml/.yml file.
+    Every row needs name and price; category, img and allergens are optional.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, newline='', encoding='utf-8') as f:
+        if ext == '.csv':
+            rows = list(csv.DictReader(f))
+        elif ext == '.json':
+            rows = json.load(f)
+        elif ext in ('.yaml', '.yml'):
+            if not YAML_AVAILABLE:
+                raise ValueError("PyYAML not installed; use a CSV or JSON menu")
+            rows = yaml.safe_load(f)
+        else:
+            raise ValueError(f"Unsupported menu format: {ext}")
+
+    # Allow {"items": [...]} as well as a bare list
+    if isinstance(rows, dict):
+        rows = rows.get('items', [])
+    if not isinstance(rows, list):
+        raise ValueError("Menu file must contain a list of items")
+    return rows
+
+
+def normalize_rows(rows):
+    """
+    {name: {'price', 'category', 'img', 'allergens'}} with the same types
+    the DB returns. Rows without an allergens column leave out 'allergens',
+    so tags set by staff survive an import from a file that doesn't list them.
+    """
+    menu = {}
+    for line, row in enumerate(rows, 1):
+        name = (row.get('name') or '').strip()
+        if not name:
+            raise ValueError(f"Item {line} has no name")
+        if name in menu:
+            raise ValueError(f"Duplicate menu item: {name}")
+        try:
+            price = Decimal(str(row.get('price'))).quantize(Decimal('0.01'))
+        except (InvalidOperation, TypeError):
+            raise ValueError(f"Invalid price for {name}: {row.get('price')!r}")
+        menu[name] = {
+            'price': price,
+            'category': (row.get('category') or 'General').strip(),
+            'img': (row.get('img') or '').strip() or None,
+        }
+        if 'allergens' in row:
+            try:
+                menu[name]['allergens'] = parse_codes(row['allergens'])
+            except ValueError as e:
+                raise ValueError(f"{name}: {e}")
+    return menu
+
+
+def import_menu(rows, prune=True, dry_run=False):
+    """
+    Bring FoodItem in line with `rows`.
+    With prune, items missing from the menu are deleted.
+    Returns counts of created, updated, deleted and unchanged items.
+    """
+    menu = normalize_rows(rows)
+
+    with transaction.atomic():
+        existing = {}
+        for pk, name, price, category, img, allergens in (
+            FoodItem.objects.select_for_update().values_list('id', 'name', 'price', 'category', 'img', 'allergens').iterator()
+        ):
+            existing[name] = (pk, {'price': price, 'category': category, 'img': img, 'allergens': allergens})
+
+        to_create = []
+        to_update = []
+        changed_fields = set()
+        new_images = []
+        for name, values in menu.items():
+            current = existing.get(name)
+            if current is None:
+                to_create.append(FoodItem(name=name, **values))
+                new_images.append(values.get('img'))
+                continue
+            pk, stored = current
+            diff = [field for field in FIELDS if field in values and stored[field] != values[field]]
+            if diff:
+                # Stored values fill in fields the row leaves out, as another
+                # row's changes may put them in the bulk update
+                to_update.append(FoodItem(id=pk, name=name, **{**stored, **values}))
+                changed_fields.update(diff)
+                if 'img' in diff:
+                    new_images.append(values['img'])
+
+        to_delete = [pk for name, (pk, _) in existing.items() if name not in menu] if prune else []
+
+        stats = {
+            'created': len(to_create),
+            'updated': len(to_update),
+            'deleted': len(to_delete),
+            'unchanged': len(menu) - len(to_create) - len(to_update),
+        }
+        if dry_run:
+            return stats
+
+        if to_create:
+            FoodItem.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+        if to_update:
+            FoodItem.objects.bulk_update(to_update, sorted(changed_fields), batch_size=BATCH_SIZE)
+        if to_delete:
+            FoodItem.objects.filter(id__in=to_delete).delete()
+
+        # bulk_create and bulk_update send no model signals (the delete sends
+        # post_delete per item), so invalidate here, and only when the menu
+        # really changed; likewise fetch the images fetch_food_item_image would
+        if to_create or to_update or to_delete:
+            transaction.on_commit(bump_menu_version)
+        cache_after_commit(new_images)
+
+    return stats
@@ -0,0 +1,166 @@
+"""
+In-memory menu search
+Prefix and typo-tolerant matching over FoodItem names and categories, served
+from an index rebuilt whenever the menu version changes
+"""
+
+import heapq
+import re
+import threading
+import unicodedata
+
+from .models import FoodItem
+from .caching import menu_version
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+MAX_PREFIX = 12
+
+
+def normalize(text):
+    """
+    Lowercase ASCII tokens: 'Chatamari (Newari)' -> ['chatamari', 'newari']
+    """
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii')
+    return _TOKEN_RE.findall(text.lower())
+
+
+def trigrams(token):
+    padded = f'  {token}'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def prefix_distance(query, token, limit):
+    """
+    Smallest edit distance between `query` and any prefix of `token`,
+    or limit + 1 as soon as it is certain to exceed `limit`
+    """
+    previous = list(range(len(token) + 1))
+    for i, qc in enumerate(query, 1):
+        current = [i]
+        for j, tc in enumerate(token, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (qc != tc),
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return min(previous)
+
+
+def typo_limit(token):
+    if len(token) < 3:
+        return 0
+    return 1 if len(token) < 6 else 2
+
+
+class MenuSearchIndex:
+    """
+    Token index over the menu.
+
+    Prefix maps send every token prefix (up to MAX_PREFIX characters) straight
+    to the items containing it, so exact typeahead is one dict lookup per query
+    token. Misspelt tokens fall back to trigram postings over the vocabulary,
+    verified with a bounded prefix edit distance.
+    """
+
+    _current = None
+    _lock = threading.Lock()
+
+    def __init__(self, items, version=None):
+        # Shorter names first, so an item's position doubles as its tie-break rank
+        self.items = sorted(items, key=lambda item: (len(item['name']), item['name']))
+        self.version = version
+        self.name_prefixes = {}
+        self.category_prefixes = {}
+        self.name_tokens = {}
+        self.category_tokens = {}
+        self.trigram_tokens = {}
+
+        for idx, item in enumerate(self.items):
+            for tokens, postings, prefixes in (
+                (normalize(item['name']), self.name_tokens, self.name_prefixes),
+                (normalize(item['category']), self.category_tokens, self.category_prefixes),
+            ):
+                for token in tokens:
+                    postings.setdefault(token, set()).add(idx)
+                    for end in range(1, min(len(token), MAX_PREFIX) + 1):
+                        prefixes.setdefault(token[:end], set()).add(idx)
+
+        for token in self.name_tokens.keys() | self.category_tokens.keys():
+            for gram in trigrams(token):
+                self.trigram_tokens.setdefault(gram, set()).add(token)
+
+    @classmethod
+    def current(cls):
+        """
+        Index for the current menu version, rebuilt after any menu change
+        """
+        version = menu_version()
+        index = cls._current
+        if index is None or index.version != version:
+            with cls._lock:
+                index = cls._current
+                if index is None or index.version != version:
+                    index = cls(list(
+                        FoodItem.objects.order_by('name').values('id', 'name', 'category', 'price', 'img')
+                    ), version)
+                    cls._current = index
+        return index
+
+    def _exact(self, token, postings, prefixes):
+        if len(token) <= MAX_PREFIX:
+            return prefixes.get(token, set())
+        found = set()
+        for vocab, idxs in postings.items():
+            if vocab.startswith(token):
+                found |= idxs
+        return found
+
+    def _match_token(self, token):
+        """
+        {item index: score} for one query token; name hits outrank category hits
+        """
+        in_name = self._exact(token, self.name_tokens, self.name_prefixes)
+        in_category = self._exact(token, self.category_tokens, self.category_prefixes)
+        if in_name or in_category:
+            matches = dict.fromkeys(in_category, 2.0)
+            matches.update(dict.fromkeys(in_name, 3.0))
+            return matches
+
+        limit = typo_limit(token)
+        if not limit:
+            return {}
+        # Tokens sharing at least one trigram with the query are the only
+        # candidates worth an edit-distance check
+        candidates = set()
+        for gram in trigrams(token):
+            candidates |= self.trigram_tokens.get(gram, set())
+        matches = {}
+        for vocab in candidates:
+            distance = prefix_distance(token, vocab, limit)
+            if distance > limit:
+                continue
+            score = 1.0 - distance / (limit + 1)
+            for postings, weight in ((self.name_tokens, 1.0), (self.category_tokens, 0.5)):
+                for idx in postings.get(vocab, ()):
+                    if matches.get(idx, 0) < score * weight + weight:
+                        matches[idx] = score * weight + weight
+        return matches
+
+    def search(self, query, limit=10):
+        tokens = normalize(query)
+        if not tokens:
+            return []
+
+        # Every token must match; intersect starting from the rarest
+        per_token = sorted((self._match_token(token) for token in tokens), key=len)
+        scores = per_token[0]
+        for matches in per_token[1:]:
+            scores = {idx: score + matches[idx] for idx, score in scores.items() if idx in matches}
+            if not scores:
+                return []
+
+        best = heapq.nsmallest(limit, scores.items(), key=lambda entry: (-entry[1], entry[0]))
+        return [self.items[idx] for idx, _ in best]
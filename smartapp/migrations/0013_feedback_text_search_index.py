@@ -0,0 +1,34 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+INDEX_NAME = 'feedback_text_search'
+
+
+def text_search_index():
+    # Same expression smartapp.feedback_search queries, so PostgreSQL can use it
+    return GinIndex(SearchVector('feedback_text', config='english'), name=INDEX_NAME)
+
+
+def add_index(apps, schema_editor):
+    # Only PostgreSQL has full-text search; other databases use the in-process index
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.add_index(apps.get_model('smartapp', 'Feedback'), text_search_index())
+
+
+def remove_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.remove_index(apps.get_model('smartapp', 'Feedback'), text_search_index())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartapp', '0012_alter_fooditem_img'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_index, remove_index),
+    ]
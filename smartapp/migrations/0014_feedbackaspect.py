@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartapp', '0013_feedback_text_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedbackAspect',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('aspect', models.PositiveSmallIntegerField(choices=[(1, 'Taste'), (2, 'Temperature'), (3, 'Speed'), (4, 'Price'), (5, 'Hygiene'), (6, 'Staff')])),
+                ('polarity', models.SmallIntegerField(choices=[(1, 'Positive'), (0, 'Neutral'), (-1, 'Negative')])),
+                ('feedback', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aspects', to='smartapp.feedback')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['aspect', 'polarity'], name='smartapp_fe_aspect_88a54f_idx')],
+                'constraints': [models.UniqueConstraint(fields=('feedback', 'aspect'), name='unique_feedback_aspect')],
+            },
+        ),
+    ]
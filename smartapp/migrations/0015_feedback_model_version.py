@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartapp', '0014_feedbackaspect'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feedback',
+            name='model_version',
+            field=models.CharField(blank=True, max_length=16, null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartapp', '0015_feedback_model_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShadowScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('production_version', models.CharField(max_length=16)),
+                ('candidate_version', models.CharField(max_length=16)),
+                ('production_sentiment', models.CharField(max_length=10)),
+                ('candidate_sentiment', models.CharField(max_length=10)),
+                ('production_confidence', models.FloatField()),
+                ('candidate_confidence', models.FloatField()),
+                ('production_ms', models.FloatField(blank=True, null=True)),
+                ('candidate_ms', models.FloatField()),
+                ('agreed', models.BooleanField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('feedback', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shadow_scores', to='smartapp.feedback')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['candidate_version', 'created_at'], name='smartapp_sh_candida_7b5b66_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:31
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def set_expiry(apps, schema_editor):
+    # Existing vouchers get the same validity new ones do, counted from issue
+    DiscountVoucher = apps.get_model('smartapp', 'DiscountVoucher')
+    valid_for = timedelta(days=getattr(settings, 'VOUCHER_VALID_DAYS', 90))
+    DiscountVoucher.objects.filter(expires_at__isnull=True).update(expires_at=models.F('created_at') + valid_for)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartapp', '0016_shadowscore'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discountvoucher',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='discountvoucher',
+            name='is_expired',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='discountvoucher',
+            name='order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='vouchers', to='smartapp.order'),
+        ),
+        migrations.AddIndex(
+            model_name='discountvoucher',
+            index=models.Index(condition=models.Q(('is_expired', False), ('is_used', False)), fields=['expires_at'], name='voucher_redeemable_expiry'),
+        ),
+        migrations.RunPython(set_expiry, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartapp', '0017_discountvoucher_expiry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DishForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('item_name', models.CharField(max_length=200)),
+                ('category', models.CharField(default='General', max_length=100)),
+                ('hourly', models.JSONField()),
+                ('total', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Dish Forecast',
+                'verbose_name_plural': 'Dish Forecasts',
+                'constraints': [models.UniqueConstraint(fields=('date', 'item_name'), name='unique_dish_forecast')],
+            },
+        ),
+    ]
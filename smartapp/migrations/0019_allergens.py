@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartapp', '0018_dishforecast'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='allergyinfo',
+            name='allergens',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='fooditem',
+            name='allergens',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='allergen_conflicts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
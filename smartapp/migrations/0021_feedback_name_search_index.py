@@ -0,0 +1,44 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+OLD_INDEX_NAME = 'feedback_text_search'
+INDEX_NAME = 'feedback_name_text_search'
+
+
+def text_search_index():
+    # The expression 0013 indexed
+    return GinIndex(SearchVector('feedback_text', config='english'), name=OLD_INDEX_NAME)
+
+
+def name_text_search_index():
+    # Same expression smartapp.feedback_search queries, so PostgreSQL can use it
+    return GinIndex(SearchVector('customer_name', 'feedback_text', config='english'), name=INDEX_NAME)
+
+
+def add_names(apps, schema_editor):
+    # Only PostgreSQL has full-text search; other databases use the in-process index
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    feedback = apps.get_model('smartapp', 'Feedback')
+    schema_editor.add_index(feedback, name_text_search_index())
+    schema_editor.remove_index(feedback, text_search_index())
+
+
+def remove_names(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    feedback = apps.get_model('smartapp', 'Feedback')
+    schema_editor.add_index(feedback, text_search_index())
+    schema_editor.remove_index(feedback, name_text_search_index())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartapp', '0020_order_completed_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_names, remove_names),
+    ]
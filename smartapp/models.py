@@ -4,15 +4,43 @@ from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth.hashers import make_password, check_password
 
+# Allergen bits for FoodItem.allergens, AllergyInfo.allergens and
+# OrderItem.allergen_conflicts. Stored in the database, so only ever append.
+ALLERGEN_CHOICES = [
+    (1 << 0, "Gluten"),
+    (1 << 1, "Crustaceans"),
+    (1 << 2, "Eggs"),
+    (1 << 3, "Fish"),
+    (1 << 4, "Peanuts"),
+    (1 << 5, "Tree nuts"),
+    (1 << 6, "Milk"),
+    (1 << 7, "Soy"),
+    (1 << 8, "Sesame"),
+    (1 << 9, "Mustard"),
+    (1 << 10, "Celery"),
+    (1 << 11, "Sulphites"),
+    (1 << 12, "Lupin"),
+    (1 << 13, "Molluscs"),
+]
+
+
+def allergen_labels(mask):
+    return [label for bit, label in ALLERGEN_CHOICES if mask & bit]
+
+
 class FoodItem(models.Model):
     name = models.CharField(max_length=100)
     price = models.DecimalField(max_digits=8, decimal_places=2)
     category = models.CharField(max_length=100, default='General')
     img = models.URLField(max_length=500, blank=True, null=True)
+    allergens = models.PositiveIntegerField(default=0)  # ALLERGEN_CHOICES bits
 
     def __str__(self):
         return self.name
 
+    def allergen_labels(self):
+        return allergen_labels(self.allergens)
+
 
 
 class Order(models.Model):
@@ -24,6 +52,8 @@ class Order(models.Model):
     estimated_wait_time = models.IntegerField(default=15)  # in minutes
     status = models.CharField(max_length=20, default='pending')
     order_time = models.DateTimeField(auto_now_add=True)
+    # When staff completed it and it left its table
+    completed_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"Order #{self.id} - Table {self.table_number} - {self.customer_name}"
@@ -41,6 +71,8 @@ class OrderItem(models.Model):
     total_price = models.DecimalField(max_digits=8, decimal_places=2)
     category = models.CharField(max_length=100, default='General')
     notes = models.TextField(blank=True, null=True)
+    # Allergens in this dish that the order's stated allergies rule out
+    allergen_conflicts = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -54,6 +86,9 @@ class OrderItem(models.Model):
         self.total_price = self.quantity * self.unit_price
         super().save(*args, **kwargs)
 
+    def allergen_conflict_labels(self):
+        return allergen_labels(self.allergen_conflicts)
+
 class Feedback(models.Model):
     CATEGORY_CHOICES = [
         ("Food", "Food"),
@@ -76,12 +111,76 @@ class Feedback(models.Model):
     sentiment = models.CharField(max_length=10, choices=SENTIMENT_CHOICES, blank=True, null=True)
     confidence = models.FloatField(blank=True, null=True)
     emotion = models.CharField(max_length=20, blank=True, null=True)
+    model_version = models.CharField(max_length=16, blank=True, null=True)  # sentiment model that scored it
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"Feedback from {self.customer_name} - {self.category}"
 
 
+class FeedbackAspect(models.Model):
+    """
+    One aspect a feedback mentions and whether it was praised or criticised.
+    Small integer codes keep the table compact; there can be several rows per
+    feedback but at most one per aspect.
+    """
+    ASPECT_CHOICES = [
+        (1, "Taste"),
+        (2, "Temperature"),
+        (3, "Speed"),
+        (4, "Price"),
+        (5, "Hygiene"),
+        (6, "Staff"),
+    ]
+
+    POLARITY_CHOICES = [
+        (1, "Positive"),
+        (0, "Neutral"),
+        (-1, "Negative"),
+    ]
+
+    feedback = models.ForeignKey(Feedback, on_delete=models.CASCADE, related_name='aspects')
+    aspect = models.PositiveSmallIntegerField(choices=ASPECT_CHOICES)
+    polarity = models.SmallIntegerField(choices=POLARITY_CHOICES)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['feedback', 'aspect'], name='unique_feedback_aspect'),
+        ]
+        indexes = [
+            models.Index(fields=['aspect', 'polarity']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_aspect_display()} ({self.get_polarity_display()}) on Feedback #{self.feedback_id}"
+
+
+class ShadowScore(models.Model):
+    """
+    A candidate sentiment model's verdict on live feedback, next to the
+    production model's, for evaluating a model before promoting it
+    """
+    feedback = models.ForeignKey(Feedback, on_delete=models.CASCADE, related_name='shadow_scores')
+    production_version = models.CharField(max_length=16)
+    candidate_version = models.CharField(max_length=16)
+    production_sentiment = models.CharField(max_length=10)
+    candidate_sentiment = models.CharField(max_length=10)
+    production_confidence = models.FloatField()
+    candidate_confidence = models.FloatField()
+    production_ms = models.FloatField(blank=True, null=True)
+    candidate_ms = models.FloatField()
+    agreed = models.BooleanField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['candidate_version', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Shadow {self.candidate_version} on Feedback #{self.feedback_id}: {self.candidate_sentiment}"
+
+
 class DiscountVoucher(models.Model):
     """
     Model to track discount vouchers given for negative feedback
@@ -91,17 +190,50 @@ class DiscountVoucher(models.Model):
     voucher_code = models.CharField(max_length=20, unique=True)
     discount_percentage = models.IntegerField(default=10)
     is_used = models.BooleanField(default=False)
+    is_expired = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(blank=True, null=True)
     used_at = models.DateTimeField(blank=True, null=True)
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, blank=True, null=True, related_name='vouchers')
     
     class Meta:
         verbose_name = "Discount Voucher"
         verbose_name_plural = "Discount Vouchers"
+        indexes = [
+            # Only redeemable vouchers are scanned by the expiry job
+            models.Index(
+                fields=['expires_at'], name='voucher_redeemable_expiry',
+                condition=models.Q(is_used=False, is_expired=False),
+            ),
+        ]
     
     def __str__(self):
         return f"Voucher {self.voucher_code} for {self.customer_name} ({self.discount_percentage}% off)"
 
 
+class DishForecast(models.Model):
+    """
+    Portions of a dish expected in each local hour of one day, written nightly
+    by forecast_demand. One row per dish and day, hours packed into a list.
+    """
+    date = models.DateField()
+    item_name = models.CharField(max_length=200)
+    category = models.CharField(max_length=100, default='General')
+    hourly = models.JSONField()  # 24 expected quantities, hour 0 first
+    total = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Dish Forecast"
+        verbose_name_plural = "Dish Forecasts"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'item_name'], name='unique_dish_forecast'),
+        ]
+
+    def __str__(self):
+        return f"{self.item_name} on {self.date}: {self.total:.1f} expected"
+
+
 class Admin(models.Model):
     name = models.CharField(max_length=100)
     email = models.EmailField(unique=True)
@@ -137,6 +269,7 @@ class AllergyInfo(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='allergies')
     allergy_type = models.CharField(max_length=100)  # e.g., Nuts, Dairy
     notes = models.TextField(blank=True, null=True)
+    allergens = models.PositiveIntegerField(default=0)  # ALLERGEN_CHOICES bits recognised in allergy_type
 
     def __str__(self):
         return f"Allergy: {self.allergy_type} for Order #{self.order.id}"
@@ -0,0 +1,214 @@
+"""
+Rate limiting for the public submission endpoints
+Sliding-window counters in the shared cache, keyed by IP, session and table,
+with in-process token buckets that turn away floods without a cache round trip
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class Throttled(Exception):
+    def __init__(self, scope, kind, retry_after):
+        super().__init__(f"Too many {scope} requests from this {kind}")
+        self.scope = scope
+        self.kind = kind
+        self.retry_after = retry_after
+
+
+def throttled_response(error):
+    response = JsonResponse({'error': 'Too many requests, please try again shortly'}, status=429)
+    response['Retry-After'] = str(max(1, round(error.retry_after)))
+    return response
+
+
+def client_ip(request):
+    """
+    The client's address; with RATE_LIMIT_PROXY_COUNT proxies in front,
+    the entry they appended to X-Forwarded-For, which the client can't forge
+    """
+    proxies = settings.RATE_LIMIT_PROXY_COUNT
+    if proxies:
+        forwarded = [part.strip() for part in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if part.strip()]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR')
+
+
+def request_identities(request):
+    session = getattr(request, 'session', None)
+    return [
+        ('ip', client_ip(request)),
+        ('session', session.session_key if session is not None else None),
+    ]
+
+
+class RateLimiter:
+    """
+    Limits from RATE_LIMITS: {scope: {kind: (requests, seconds)}}.
+
+    Each process keeps a token bucket per key holding the full limit, so it
+    can only refuse a request the shared counters would refuse too, and
+    remembers keys the shared counters have blocked until the block lifts.
+    A client flooding one process is therefore turned away in memory; the
+    shared sliding-window counters (two cache counters per key, O(1) per
+    request) enforce the limit across processes. If the cache is down the
+    limiter fails open on the shared check.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, limits, max_local_keys):
+        self.limits = limits
+        self.max_local_keys = max_local_keys
+        self._buckets = OrderedDict()  # key -> [tokens, updated]
+        self._blocked = OrderedDict()  # key -> blocked until
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls(settings.RATE_LIMITS, settings.RATE_LIMIT_LOCAL_KEYS)
+        return cls._shared
+
+    @classmethod
+    def reset_shared(cls):
+        with cls._shared_lock:
+            cls._shared = None
+
+    def _keys(self, scope, identities):
+        limits = self.limits.get(scope, {})
+        return [
+            (kind, f'ratelimit:{scope}:{kind}:{ident}', *limits[kind])
+            for kind, ident in identities
+            if ident is not None and kind in limits
+        ]
+
+    def _remember(self, entries, key, value):
+        entries[key] = value
+        entries.move_to_end(key)
+        if len(entries) > self.max_local_keys:
+            entries.popitem(last=False)
+
+    def _check_local(self, scope, keys, now):
+        with self._lock:
+            for kind, key, limit, window in keys:
+                until = self._blocked.get(key)
+                if until is not None:
+                    if until > now:
+                        raise Throttled(scope, kind, until - now)
+                    del self._blocked[key]
+
+                tokens, updated = self._buckets.get(key, (limit, now))
+                tokens = min(limit, tokens + (now - updated) * limit / window)
+                if tokens < 1:
+                    self._remember(self._buckets, key, (tokens, now))
+                    raise Throttled(scope, kind, (1 - tokens) * window / limit)
+                self._remember(self._buckets, key, (tokens - 1, now))
+
+    def _count(self, key, window, slot):
+        current = f'{key}:{slot}'
+        try:
+            return cache.incr(current)
+        except ValueError:
+            # First request of this window; the counter outlives the next one,
+            # which weighs it in
+            if cache.add(current, 1, window * 2 + 1):
+                return 1
+            return cache.incr(current)
+
+    def _check_shared(self, scope, keys, now):
+        for kind, key, limit, window in keys:
+            slot, offset = divmod(now, window)
+            slot = int(slot)
+            try:
+                count = self._count(key, window, slot)
+                previous = cache.get(f'{key}:{slot - 1}', 0)
+            except Exception as e:
+                logger.warning(f"Rate limit counters unavailable, allowing request: {e}")
+                return
+            # The previous window's count, weighted by how much of it the
+            # sliding window still covers
+            weight = 1 - offset / window
+            if previous * weight + count <= limit:
+                continue
+
+            if count > limit:
+                retry_after = window - offset
+            else:
+                retry_after = (weight - (limit - count) / previous) * window
+            logger.warning(f"Throttling {scope} for {kind} {key.rsplit(':', 1)[-1]} for {retry_after:.0f}s")
+            with self._lock:
+                self._remember(self._blocked, key, now + retry_after)
+            raise Throttled(scope, kind, retry_after)
+
+    def check(self, scope, identities):
+        """
+        Count a request in `scope` from `identities` ([(kind, identifier)]);
+        raises Throttled when any of them is over its limit
+        """
+        keys = self._keys(scope, identities)
+        if not keys:
+            return
+        now = time.time()
+        self._check_local(scope, keys, now)
+        self._check_shared(scope, keys, now)
+
+    async def acheck(self, scope, identities):
+        keys = self._keys(scope, identities)
+        if not keys:
+            return
+        now = time.time()
+        self._check_local(scope, keys, now)
+        await sync_to_async(self._check_shared)(scope, keys, now)
+
+
+def check_rate(scope, kind, ident):
+    """
+    Count a request against one identity, e.g. a table number only known
+    once the body has been read
+    """
+    if settings.RATE_LIMIT_ENABLED:
+        RateLimiter.shared().check(scope, [(kind, ident)])
+
+
+def rate_limit(scope):
+    """
+    Refuse unsafe requests over the `scope` limits for the client's IP or
+    session with 429, before the view reads the body
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def wrapper(request, *args, **kwargs):
+                if settings.RATE_LIMIT_ENABLED and request.method not in SAFE_METHODS:
+                    try:
+                        await RateLimiter.shared().acheck(scope, request_identities(request))
+                    except Throttled as e:
+                        return throttled_response(e)
+                return await view_func(request, *args, **kwargs)
+        else:
+            @wraps(view_func)
+            def wrapper(request, *args, **kwargs):
+                if settings.RATE_LIMIT_ENABLED and request.method not in SAFE_METHODS:
+                    try:
+                        RateLimiter.shared().check(scope, request_identities(request))
+                    except Throttled as e:
+                        return throttled_response(e)
+                return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
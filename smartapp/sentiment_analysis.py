@@ -5,83 +5,271 @@ Uses trained model from Swiggy dataset for sentiment classification
 
 import os
 import re
+import json
+import time
 import pickle
+import hashlib
+import logging
+import threading
+from datetime import datetime, timezone
+from asgiref.sync import sync_to_async
 from django.conf import settings
 
+from .inference import InferenceExecutor
+
 try:
+    import sklearn
     from sklearn.feature_extraction.text import TfidfVectorizer
     from sklearn.linear_model import LogisticRegression
     SKLEARN_AVAILABLE = True
 except ImportError:
     SKLEARN_AVAILABLE = False
 
-class SentimentAnalyzer:
+logger = logging.getLogger(__name__)
+
+SCORES = {'positive': 1, 'negative': -1, 'neutral': 0}
+
+MODEL_FILE = 'sentiment_model.pkl'
+VECTORIZER_FILE = 'sentiment_vectorizer.pkl'
+# Written last on export, so it doubles as the "deploy finished" marker
+METADATA_FILE = 'sentiment_model.json'
+
+
+def model_dir():
+    return str(getattr(settings, 'SENTIMENT_MODEL_DIR', os.path.join(settings.BASE_DIR, 'smartapp')))
+
+
+def _digest(*blobs):
+    digest = hashlib.sha256()
+    for blob in blobs:
+        digest.update(hashlib.sha256(blob).digest())
+    return digest.hexdigest()
+
+
+def artifact_version(directory=None):
     """
-    ML-based sentiment analyzer trained on Swiggy dataset
-    Classifies feedback into: positive, negative, neutral
+    Version of the artifacts on disk: a hash of the model and vectorizer bytes
     """
+    directory = directory or model_dir()
+    blobs = []
+    for name in (MODEL_FILE, VECTORIZER_FILE):
+        with open(os.path.join(directory, name), 'rb') as f:
+            blobs.append(f.read())
+    return _digest(*blobs)[:16]
 
-    _model = None
-    _vectorizer = None
-    _model_loaded = False
+
+def artifact_stamp(directory=None):
+    """
+    (mtime, size) of every artifact file; three stat calls, cheap enough to
+    poll while serving requests
+    """
+    directory = directory or model_dir()
+    stamp = []
+    for name in (MODEL_FILE, VECTORIZER_FILE, METADATA_FILE):
+        try:
+            st = os.stat(os.path.join(directory, name))
+            stamp.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+def save_artifacts(model, vectorizer, directory, **metadata):
+    """
+    Write a trained model so running workers can pick it up.
+
+    Each pickle is replaced atomically and the metadata file goes last with
+    the hash of both, so a worker that sees a half-finished deploy (metadata
+    not matching the pickles) keeps its current model until the metadata lands.
+    """
+    blobs = [pickle.dumps(model), pickle.dumps(vectorizer)]
+    for name, blob in zip((MODEL_FILE, VECTORIZER_FILE), blobs):
+        _atomic_write(os.path.join(directory, name), blob)
+
+    sha256 = _digest(*blobs)
+    metadata.update({
+        'version': sha256[:16],
+        'sha256': sha256,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'sklearn_version': sklearn.__version__ if SKLEARN_AVAILABLE else None,
+        'classes': [str(c) for c in model.classes_],
+    })
+    _atomic_write(os.path.join(directory, METADATA_FILE), json.dumps(metadata, indent=2).encode('utf-8'))
+    return metadata
+
+
+def _atomic_write(path, data):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class SentimentModel:
+    """
+    One loaded model artifact: classifier, vectorizer, version and metadata
+    """
+
+    def __init__(self, model, vectorizer, version, metadata=None):
+        self.model = model
+        self.vectorizer = vectorizer
+        self.version = version
+        self.metadata = metadata or {}
 
     @classmethod
-    def _load_model(cls):
-        if cls._model_loaded:
-            return
-        
+    def load(cls, directory=None):
         if not SKLEARN_AVAILABLE:
             raise RuntimeError("scikit-learn not installed")
-        
-        try:
-            model_path = os.path.join(settings.BASE_DIR, 'smartapp', 'sentiment_model.pkl')
-            vectorizer_path = os.path.join(settings.BASE_DIR, 'smartapp', 'sentiment_vectorizer.pkl')
 
-            with open(model_path, 'rb') as f:
-                cls._model = pickle.load(f)
-            with open(vectorizer_path, 'rb') as f:
-                cls._vectorizer = pickle.load(f)
+        directory = directory or model_dir()
+        try:
+            with open(os.path.join(directory, MODEL_FILE), 'rb') as f:
+                model_bytes = f.read()
+            with open(os.path.join(directory, VECTORIZER_FILE), 'rb') as f:
+                vectorizer_bytes = f.read()
+        except FileNotFoundError:
+            raise RuntimeError(f"Model not found. Run: python smartapp/export_model.py")
 
-            cls._model_loaded = True
-            print(f"Model loaded successfully!")
-            print(f"Classes: {cls._model.classes_}")
+        sha256 = _digest(model_bytes, vectorizer_bytes)
+        metadata = {}
+        metadata_path = os.path.join(directory, METADATA_FILE)
+        if os.path.exists(metadata_path):
+            with open(metadata_path) as f:
+                metadata = json.load(f)
+            if metadata.get('sha256') != sha256:
+                raise RuntimeError("Model files don't match sentiment_model.json (deploy in progress?)")
 
-        except FileNotFoundError as e:
-            raise RuntimeError(f"Model not found. Run: python smartapp/export_model.py")
+        try:
+            return cls(pickle.loads(model_bytes), pickle.loads(vectorizer_bytes), sha256[:16], metadata)
         except Exception as e:
             raise RuntimeError(f"Error loading model: {e}")
 
+    def analyze_batch(self, texts):
+        try:
+            cleaned = [re.sub(r'[^\w\s]', '', (text or '').lower().strip()) for text in texts]
+            texts_tfidf = self.vectorizer.transform(cleaned)
+            sentiments = self.model.predict(texts_tfidf)
+            probas = self.model.predict_proba(texts_tfidf)
+        except Exception as e:
+            raise RuntimeError(f"Sentiment analysis failed: {str(e)}")
+
+        results = []
+        for text, sentiment, proba in zip(texts, sentiments, probas):
+            if not text:
+                results.append({'sentiment': 'neutral', 'score': 0, 'confidence': 0, 'model_version': self.version})
+                continue
+            results.append({
+                'sentiment': str(sentiment),
+                'score': SCORES.get(sentiment, 0),
+                'confidence': round(float(max(proba) * 100), 2),
+                'model_version': self.version,
+            })
+        return results
+
+
+class SentimentAnalyzer:
+    """
+    ML-based sentiment analyzer trained on Swiggy dataset
+    Classifies feedback into: positive, negative, neutral
+
+    The active SentimentModel is a single class-level reference. Every
+    SENTIMENT_MODEL_POLL_SECONDS a request stats the artifact files; when they
+    have changed, a background thread loads the new model and then swaps the
+    reference, so requests never wait on a reload and an old model lives only
+    as long as the requests still using it.
+    """
+
+    _active = None
+    _stamp = None
+    _next_check = 0.0
+    _load_lock = threading.Lock()
+    _swap_lock = threading.Lock()
+
+    @classmethod
+    def _load_model(cls):
+        """
+        The active model, loading it on first use
+        """
+        active = cls._active
+        if active is None:
+            with cls._load_lock:
+                if cls._active is None:
+                    stamp = artifact_stamp()
+                    cls._active = SentimentModel.load()
+                    cls._stamp = stamp
+                    cls._next_check = time.monotonic() + settings.SENTIMENT_MODEL_POLL_SECONDS
+                    logger.info(f"Sentiment model {cls._active.version} loaded, classes: {cls._active.model.classes_}")
+            return cls._active
+
+        cls._check_for_update()
+        return active
+
+    @classmethod
+    def _check_for_update(cls):
+        now = time.monotonic()
+        if now < cls._next_check:
+            return
+        cls._next_check = now + settings.SENTIMENT_MODEL_POLL_SECONDS
+        stamp = artifact_stamp()
+        if stamp == cls._stamp:
+            return
+        # One reload at a time keeps at most two models resident
+        if cls._swap_lock.acquire(blocking=False):
+            threading.Thread(target=cls._swap, args=(stamp,), daemon=True).start()
+
+    @classmethod
+    def _swap(cls, stamp):
+        try:
+            model = SentimentModel.load()
+            previous = cls._active
+            cls._active = model
+            cls._stamp = stamp
+            logger.info(f"Sentiment model swapped: {previous.version if previous else None} -> {model.version}")
+        except RuntimeError as e:
+            # Keep serving the current model until the files change again
+            cls._stamp = stamp
+            logger.warning(f"Sentiment model reload skipped: {e}")
+        finally:
+            cls._swap_lock.release()
+
+    @classmethod
+    def model_version(cls):
+        return cls._load_model().version
+
     @classmethod
     def analyze_sentiment(cls, text):
         if not text:
-            return {'sentiment': 'neutral', 'score': 0, 'confidence': 0}
+            return {'sentiment': 'neutral', 'score': 0, 'confidence': 0, 'model_version': None}
 
-        cls._load_model()
+        started = time.perf_counter()
+        if settings.SENTIMENT_EXECUTOR == 'process':
+            result = InferenceExecutor.shared().analyze(text)
+        else:
+            result = cls._load_model().analyze_batch([text])[0]
+        result['latency_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        return result
 
-        try:
-            text = text.lower().strip()
-            text = re.sub(r'[^\w\s]', '', text)
-
-            text_tfidf = cls._vectorizer.transform([text])
-            sentiment = cls._model.predict(text_tfidf)[0]
-            proba = cls._model.predict_proba(text_tfidf)[0]
-            confidence = float(max(proba) * 100)
-
-            if sentiment == 'positive':
-                score = 1
-            elif sentiment == 'negative':
-                score = -1
-            else:
-                score = 0
-
-            return {
-                'sentiment': sentiment,
-                'score': score,
-                'confidence': round(confidence, 2)
-            }
+    @classmethod
+    async def analyze_sentiment_async(cls, text):
+        """
+        analyze_sentiment for async views; never blocks the event loop
+        """
+        if not text:
+            return {'sentiment': 'neutral', 'score': 0, 'confidence': 0, 'model_version': None}
 
-        except Exception as e:
-            raise RuntimeError(f"Sentiment analysis failed: {str(e)}")
+        if settings.SENTIMENT_EXECUTOR != 'process':
+            return await sync_to_async(cls.analyze_sentiment, thread_sensitive=False)(text)
+        started = time.perf_counter()
+        result = await InferenceExecutor.shared().analyze_async(text)
+        result['latency_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        return result
+
+    @classmethod
+    def analyze_batch(cls, texts):
+        """
+        analyze_sentiment for many texts with a single vectorizer and model call
+        """
+        return cls._load_model().analyze_batch(texts)
 
     @classmethod
     def get_sentiment_description(cls, sentiment):
@@ -0,0 +1,155 @@
+"""
+Shadow scoring for candidate sentiment models
+A candidate model scores the same feedback as production, off the request
+path, and each pair of verdicts is stored as a ShadowScore for the
+shadow_report command
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .models import ShadowScore
+from .sentiment_analysis import SentimentModel
+
+logger = logging.getLogger(__name__)
+
+# Scores are buffered and written in bulk, at most every FLUSH_SECONDS, so
+# shadow writes rarely contend with the requests' own writes
+MAX_BATCH = 50
+FLUSH_SECONDS = 5
+# A worker waits this long after picking up feedback before scoring it, so
+# the request that queued it has finished and isn't competing for the GIL
+LINGER_SECONDS = 0.1
+
+class ShadowScorer:
+    """
+    Bounded queue drained by a few daemon threads.
+
+    submit() only does a put_nowait, so a request never blocks on the
+    candidate: when the queue is full the item is dropped and counted. The
+    candidate model is loaded by the first worker, not by a request. Scores
+    still buffered when the process exits are lost, which is acceptable for
+    an evaluation sample.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, model_dir, workers=1, queue_size=1000):
+        self.model_dir = model_dir
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._run, name=f'shadow-scorer-{i}', daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    @classmethod
+    def shared(cls):
+        """
+        The process-wide scorer, or None when no candidate is configured
+        """
+        if not settings.SENTIMENT_SHADOW_MODEL_DIR:
+            return None
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls(
+                        settings.SENTIMENT_SHADOW_MODEL_DIR,
+                        settings.SENTIMENT_SHADOW_WORKERS,
+                        settings.SENTIMENT_SHADOW_QUEUE_SIZE,
+                    )
+        return cls._shared
+
+    @classmethod
+    def reset_shared(cls):
+        with cls._shared_lock:
+            cls._shared = None
+
+    def _count(self, event, n=1):
+        with self._stats_lock:
+            self.stats[event] += n
+
+    def submit(self, feedback, production):
+        """
+        Queue `feedback` for the candidate; `production` is the result
+        SentimentAnalyzer.analyze_sentiment returned for it
+        """
+        try:
+            self.queue.put_nowait((feedback.id, feedback.feedback_text, production))
+            self._count('queued')
+        except queue.Full:
+            self._count('dropped')
+
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = SentimentModel.load(self.model_dir)
+                    logger.info(f"Shadow scoring with candidate model {self._model.version}")
+        return self._model
+
+    def _run(self):
+        pending = []
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self.queue.get(timeout=FLUSH_SECONDS)
+                time.sleep(LINGER_SECONDS)
+                pending.append(self._score(item))
+            except queue.Empty:
+                pass
+            except Exception as e:
+                self._count('failed')
+                logger.warning(f"Shadow scoring failed: {e}")
+
+            if pending and (len(pending) >= MAX_BATCH or time.monotonic() - last_flush >= FLUSH_SECONDS):
+                try:
+                    close_old_connections()
+                    ShadowScore.objects.bulk_create(pending)
+                    self._count('scored', len(pending))
+                except Exception as e:
+                    self._count('failed', len(pending))
+                    logger.warning(f"Could not save {len(pending)} shadow scores: {e}")
+                pending = []
+                last_flush = time.monotonic()
+
+    def _score(self, item):
+        feedback_id, text, production = item
+        candidate = self.model()
+        # One text at a time, the way production scores, so latencies compare
+        started = time.perf_counter()
+        result = candidate.analyze_batch([text])[0]
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        return ShadowScore(
+            feedback_id=feedback_id,
+            production_version=production['model_version'],
+            candidate_version=candidate.version,
+            production_sentiment=production['sentiment'],
+            candidate_sentiment=result['sentiment'],
+            production_confidence=production['confidence'],
+            candidate_confidence=result['confidence'],
+            production_ms=production.get('latency_ms'),
+            candidate_ms=round(elapsed_ms, 3),
+            agreed=production['sentiment'] == result['sentiment'],
+        )
+
+def shadow_score(feedback, production):
+    """
+    Hand freshly saved feedback to the shadow scorer once its row is
+    committed; a no-op unless a candidate model is configured
+    """
+    scorer = ShadowScorer.shared()
+    if scorer is None or not production or not production.get('model_version'):
+        return
+    transaction.on_commit(lambda: scorer.submit(feedback, production))
@@ -0,0 +1,57 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import FoodItem, Feedback, DiscountVoucher, Order, OrderItem, KDS
+from .caching import bump_menu_version, bump_feedback_rows_version, bump_voucher_version, bump_order_version
+from .menu_images import cache_after_commit
+from .feedback_search import FeedbackSearchIndex, uses_postgres_search
+
+
+@receiver(post_save, sender=FoodItem)
+@receiver(post_delete, sender=FoodItem)
+def food_item_changed(sender, **kwargs):
+    # Invalidate every cached menu fragment keyed by the old version
+    bump_menu_version()
+
+
+@receiver(post_save, sender=FoodItem)
+def fetch_food_item_image(sender, instance, **kwargs):
+    cache_after_commit([instance.img])
+
+
+@receiver(post_save, sender=Feedback)
+def index_feedback(sender, instance, **kwargs):
+    # Sentiment and category are filterable, so re-index on every save; on
+    # commit, so a rolled back row never shows up in searches. PostgreSQL
+    # searches the table itself.
+    if not uses_postgres_search():
+        row = (instance.id, instance.customer_name, instance.feedback_text, instance.sentiment, instance.category, instance.created_at)
+        transaction.on_commit(lambda: FeedbackSearchIndex.shared().add(*row))
+    # After commit, so a listing read in between can't pair old rows with the new ETag
+    transaction.on_commit(bump_feedback_rows_version)
+
+
+@receiver(post_delete, sender=Feedback)
+def unindex_feedback(sender, instance, **kwargs):
+    if not uses_postgres_search():
+        feedback_id = instance.id
+        transaction.on_commit(lambda: FeedbackSearchIndex.shared().remove(feedback_id))
+    transaction.on_commit(bump_feedback_rows_version)
+
+
+@receiver(post_save, sender=DiscountVoucher)
+def voucher_issued(sender, instance, created, **kwargs):
+    # Tells every process's VoucherFilter to load the new code
+    if created:
+        transaction.on_commit(bump_voucher_version)
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+@receiver(post_save, sender=KDS)
+def order_changed(sender, **kwargs):
+    # Invalidates cached sales analytics and tells other workers' kitchen
+    # queues to reload; bulk writes bump the version themselves
+    transaction.on_commit(bump_order_version)
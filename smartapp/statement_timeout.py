@@ -0,0 +1,31 @@
+"""
+Statement timeout for web requests
+DB_STATEMENT_TIMEOUT_MS caps every statement a web worker runs on PostgreSQL,
+so one runaway query can't hold a connection; migrations and management
+commands, which may legitimately run for minutes, never load this middleware
+"""
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+
+
+def set_statement_timeout(sender, connection, **kwargs):
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f'SET statement_timeout = {int(settings.DB_STATEMENT_TIMEOUT_MS)}')
+
+
+class StatementTimeoutMiddleware:
+    """
+    Applies DB_STATEMENT_TIMEOUT_MS to each database connection the web
+    worker opens. Only the request handler loads middleware, so this is what
+    tells a web worker from a management command; once the signal is
+    connected it drops out of the request path.
+    """
+
+    def __init__(self, get_response):
+        if settings.DB_STATEMENT_TIMEOUT_MS:
+            # Once per connection, including each checkout from the pool
+            connection_created.connect(set_statement_timeout, dispatch_uid='statement_timeout')
+        raise MiddlewareNotUsed
@@ -0,0 +1,159 @@
+"""
+Responsive image variants for static assets
+Generates resized AVIF/WebP/JPEG copies of source images and records them in a
+manifest that the {% responsive_img %} tag reads to build srcset attributes
+"""
+
+import hashlib
+import json
+import os
+from django.conf import settings
+
+try:
+    from PIL import Image, features
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+MANIFEST_NAME = 'variants.json'
+
+# Encoder settings are fixed so the same source always produces the same bytes
+ENCODERS = {
+    'avif': ('AVIF', {'quality': 55, 'speed': 6}),
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+EXTENSIONS = {'avif': 'avif', 'webp': 'webp', 'jpeg': 'jpg'}
+
+_manifest = None
+_manifest_mtime = None
+
+
+def available_formats():
+    if not PIL_AVAILABLE:
+        return []
+    formats = []
+    for fmt in settings.STATIC_IMAGE_FORMATS:
+        if fmt == 'jpeg' or features.check(fmt):
+            formats.append(fmt)
+    return formats
+
+
+def manifest_path():
+    return os.path.join(settings.STATIC_VARIANTS_DIR, MANIFEST_NAME)
+
+
+def load_manifest():
+    """
+    Variants manifest, re-read only when the build has rewritten it
+    """
+    global _manifest, _manifest_mtime
+    path = manifest_path()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    if mtime != _manifest_mtime:
+        with open(path) as f:
+            _manifest = json.load(f)
+        _manifest_mtime = mtime
+    return _manifest
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def iter_source_images():
+    """
+    (static name, absolute path) for every source image, in a stable order
+    """
+    for root in settings.STATIC_IMAGE_SOURCES:
+        root = str(root)
+        prefix = '' if root in [str(d) for d in settings.STATICFILES_DIRS] else os.path.basename(root) + '/'
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    path = os.path.join(dirpath, filename)
+                    name = prefix + os.path.relpath(path, root).replace(os.sep, '/')
+                    yield name, path
+
+
+def build_variants(force=False, log=None):
+    """
+    Generate missing or outdated variants and rewrite the manifest.
+    Returns (manifest, source_bytes, variant_bytes) where the byte counts
+    compare each source with its largest variant in the smallest format.
+    """
+    if not PIL_AVAILABLE:
+        raise RuntimeError("Pillow not installed")
+
+    formats = available_formats()
+    widths = sorted(settings.STATIC_IMAGE_WIDTHS)
+    out_dir = str(settings.STATIC_VARIANTS_DIR)
+    previous = {} if force else load_manifest()
+    manifest = {}
+    source_bytes = 0
+    variant_bytes = 0
+
+    for name, path in iter_source_images():
+        digest = _file_hash(path)
+        entry = previous.get(name)
+        up_to_date = (
+            entry is not None
+            and entry['hash'] == digest
+            and sorted(entry['variants']) == sorted(formats)
+            and all(os.path.exists(os.path.join(out_dir, v)) for vs in entry['variants'].values() for _, v in vs)
+        )
+        if not up_to_date:
+            entry = _render_variants(name, path, digest, formats, widths, out_dir)
+            if log:
+                log(f'Built variants for {name}')
+        manifest[name] = entry
+
+        source_bytes += os.path.getsize(path)
+        variant_bytes += min(
+            os.path.getsize(os.path.join(out_dir, variants[-1][1]))
+            for variants in entry['variants'].values()
+        )
+
+    os.makedirs(out_dir, exist_ok=True)
+    with open(manifest_path(), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest, source_bytes, variant_bytes
+
+
+def _render_variants(name, path, digest, formats, widths, out_dir):
+    stem, _ = os.path.splitext(name)
+    with Image.open(path) as source:
+        source.load()
+        width, height = source.size
+        has_alpha = source.mode in ('RGBA', 'LA') or 'transparency' in source.info
+        image = source.convert('RGBA' if has_alpha else 'RGB')
+
+    targets = sorted({min(w, width) for w in widths})
+    entry = {'hash': digest, 'width': width, 'height': height, 'variants': {}}
+    for fmt in formats:
+        pil_format, params = ENCODERS[fmt]
+        entry['variants'][fmt] = []
+        for target in targets:
+            resized = image if target == width else image.resize(
+                (target, round(height * target / width)), Image.LANCZOS
+            )
+            if fmt == 'jpeg' and resized.mode == 'RGBA':
+                flattened = Image.new('RGB', resized.size, (255, 255, 255))
+                flattened.paste(resized, mask=resized.getchannel('A'))
+                resized = flattened
+            variant = f'{stem}-{target}w.{EXTENSIONS[fmt]}'
+            variant_path = os.path.join(out_dir, variant)
+            os.makedirs(os.path.dirname(variant_path), exist_ok=True)
+            resized.save(variant_path, pil_format, **params)
+            entry['variants'][fmt].append([target, variant])
+    return entry
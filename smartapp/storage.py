@@ -0,0 +1,21 @@
+"""
+Static file storage with content-hashed filenames
+"""
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, StaticFilesStorage
+
+
+class HashedStaticStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage that serves a missing file under its plain name
+    instead of failing the whole page, e.g. an optional video not shipped with
+    every deployment.
+    """
+
+    manifest_strict = False
+
+    def url(self, name, force=False):
+        try:
+            return super().url(name, force)
+        except ValueError:
+            return StaticFilesStorage.url(self, name)
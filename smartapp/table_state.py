@@ -0,0 +1,260 @@
+"""
+Live table occupancy and turnover
+Per-table state in fixed-size arrays indexed by table number, updated from the
+order and KDS write paths, so the floor view never has to query orders
+"""
+
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Order
+from .wait_time import QUEUED_STATUSES
+from .caching import order_version, order_state_stale
+
+logger = logging.getLogger(__name__)
+
+# Orders still at the table: placed and not yet completed
+OPEN_STATUSES = QUEUED_STATUSES + ('ready',)
+
+
+class TableTracker:
+    """
+    Which tables are seated, since when, and how much food the kitchen still
+    owes them.
+
+    Slot n of each array is table n, for tables 1..TABLE_COUNT. A seating
+    starts with the first order at a free table and ends when its last open
+    order is completed; an order's portions are pending until the kitchen
+    marks it ready. Updates touch one table's slot and reads are one pass
+    over the arrays, whatever the number of orders.
+
+    State lives in the process; each worker rebuilds it from the database on
+    first use and, like the kitchen scheduler, again when another process has
+    changed orders (see caching.order_state_stale).
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, tables):
+        self.tables = tables
+        size = tables + 1
+        self._lock = threading.Lock()
+        # order_id -> [order_time, pending portions], per table
+        self.open_orders = [{} for _ in range(size)]
+        self.seated_at = [None] * size
+        self.pending = [0] * size
+        self.waiting_since = [None] * size
+        self.last_activity = [None] * size
+        # Seatings started today and minutes spent by those that have ended
+        self.seatings = [0] * size
+        self.seated_minutes = [0.0] * size
+        self.day = None
+        # order_id -> table, for KDS updates that only know the order
+        self.order_table = {}
+        self.version = None
+        self.loaded_at = None
+
+    @classmethod
+    def shared(cls):
+        """
+        Process-wide tracker, loaded from the database on first use and again
+        after other processes' order writes
+        """
+        # Read before loading, so a write during the load forces another
+        version = order_version()
+        tracker = cls._shared
+        if tracker is None or order_state_stale(tracker, version):
+            with cls._shared_lock:
+                tracker = cls._shared
+                if tracker is None or order_state_stale(tracker, version):
+                    tracker = cls(settings.TABLE_COUNT)
+                    tracker.load_from_db()
+                    tracker.version = version
+                    tracker.loaded_at = time.monotonic()
+                    cls._shared = tracker
+        return tracker
+
+    @classmethod
+    def reset_shared(cls):
+        with cls._shared_lock:
+            cls._shared = None
+
+    # Updates
+
+    def _roll_day(self, now):
+        today = timezone.localdate(now)
+        # Forward only, so replaying history doesn't reset today's counts
+        if self.day is None or today > self.day:
+            self.day = today
+            self.seatings = [0] * len(self.seatings)
+            self.seated_minutes = [0.0] * len(self.seated_minutes)
+
+    def _waiting_since(self, table):
+        pending = [order_time for order_time, portions in self.open_orders[table].values() if portions]
+        return min(pending) if pending else None
+
+    def order_placed(self, order_id, table, order_time, portions):
+        if not 1 <= table <= self.tables:
+            logger.warning(f"Order #{order_id} is for table {table}, outside 1..{self.tables}; not tracked")
+            return
+        with self._lock:
+            if order_id in self.order_table:
+                return
+            self._roll_day(order_time)
+            if not self.open_orders[table]:
+                self.seated_at[table] = order_time
+                self.seatings[table] += 1
+            self.open_orders[table][order_id] = [order_time, portions]
+            self.order_table[order_id] = table
+            self.pending[table] += portions
+            if portions and (self.waiting_since[table] is None or order_time < self.waiting_since[table]):
+                self.waiting_since[table] = order_time
+            self.last_activity[table] = max(order_time, self.last_activity[table] or order_time)
+
+    def touch(self, order_id, when=None):
+        """
+        Note staff or kitchen activity on an order's table
+        """
+        with self._lock:
+            table = self.order_table.get(order_id)
+            if table is not None:
+                self.last_activity[table] = when or timezone.now()
+
+    def order_ready(self, order_id, when=None):
+        with self._lock:
+            table = self.order_table.get(order_id)
+            if table is None:
+                return
+            entry = self.open_orders[table][order_id]
+            self.pending[table] -= entry[1]
+            entry[1] = 0
+            self.waiting_since[table] = self._waiting_since(table)
+            self.last_activity[table] = when or timezone.now()
+
+    def order_closed(self, order_id, when=None):
+        when = when or timezone.now()
+        with self._lock:
+            table = self.order_table.pop(order_id, None)
+            if table is None:
+                return
+            _, portions = self.open_orders[table].pop(order_id)
+            self.pending[table] -= portions
+            self.waiting_since[table] = self._waiting_since(table)
+            self.last_activity[table] = when
+            if not self.open_orders[table]:
+                self._roll_day(when)
+                if timezone.localdate(self.seated_at[table]) == self.day:
+                    self.seated_minutes[table] += (when - self.seated_at[table]).total_seconds() / 60
+                self.seated_at[table] = None
+
+    # Reads
+
+    def floor(self, now=None):
+        """
+        Every table's state, table 1 first
+        """
+        now = now or timezone.now()
+        with self._lock:
+            self._roll_day(now)
+            tables = []
+            for table in range(1, self.tables + 1):
+                seated_at = self.seated_at[table]
+                waiting_since = self.waiting_since[table]
+                if seated_at is None:
+                    state = 'free'
+                elif waiting_since is not None:
+                    state = 'waiting'
+                else:
+                    state = 'served'
+                tables.append({
+                    'table': table,
+                    'state': state,
+                    'open_orders': len(self.open_orders[table]),
+                    'pending_items': self.pending[table],
+                    'seated_at': seated_at,
+                    'seated_minutes': _minutes(now, seated_at),
+                    'waiting_minutes': _minutes(now, waiting_since),
+                    'last_activity': self.last_activity[table],
+                    'idle_minutes': _minutes(now, self.last_activity[table]),
+                    'seatings_today': self.seatings[table],
+                })
+        return tables
+
+    def waiting_longest(self, limit=None, now=None):
+        """
+        (table, minutes waiting) for tables with food still to come, longest
+        wait first; one pass over the tables
+        """
+        now = now or timezone.now()
+        with self._lock:
+            waiting = [(since, table) for table, since in enumerate(self.waiting_since) if since is not None]
+        ranked = heapq.nsmallest(limit, waiting) if limit else sorted(waiting)
+        return [(table, _minutes(now, since)) for since, table in ranked]
+
+    def turnover(self, now=None):
+        """
+        Today's seatings and the average length of those that have ended
+        """
+        now = now or timezone.now()
+        with self._lock:
+            self._roll_day(now)
+            seatings = sum(self.seatings)
+            ended = seatings - sum(1 for seated_at in self.seated_at if seated_at and timezone.localdate(seated_at) == self.day)
+            minutes = sum(self.seated_minutes)
+        return {
+            'seatings': seatings,
+            'per_table': round(seatings / self.tables, 2),
+            'average_minutes': round(minutes / ended) if ended > 0 else None,
+        }
+
+    def load_from_db(self):
+        """
+        Replay today's orders and those still open. Open orders older than
+        TABLE_OPEN_ORDER_HOURS were never closed and are left out; completed
+        ones close when staff completed them, or at their KDS ready time for
+        orders completed before that was recorded.
+        """
+        now = timezone.now()
+        stale = now - timedelta(hours=settings.TABLE_OPEN_ORDER_HOURS)
+        midnight = timezone.make_aware(datetime.combine(timezone.localdate(now), datetime.min.time()))
+        orders = (
+            Order.objects.filter(order_time__gte=min(midnight, stale))
+            .annotate(portions=Sum('items__quantity'), closed_at=Coalesce('completed_at', 'kds__ready_time'))
+            .values_list('id', 'table_number', 'order_time', 'status', 'portions', 'closed_at')
+        )
+        events = []
+        for order_id, table, order_time, status, portions, closed_at in orders:
+            if status in OPEN_STATUSES:
+                if order_time >= stale:
+                    events.append((order_time, 1, order_id, table, (portions or 1) if status in QUEUED_STATUSES else 0))
+            else:
+                events.append((order_time, 1, order_id, table, 0))
+                events.append((max(closed_at or order_time, order_time), 0, order_id, table, 0))
+        # An order placed and closed in the same instant opens before it closes
+        events.sort(key=lambda e: (e[0], -e[1]))
+        for when, placed, order_id, table, portions in events:
+            if placed:
+                self.order_placed(order_id, table, when, portions)
+            else:
+                self.order_closed(order_id, when)
+
+def open_orders(table, now=None):
+    """
+    Orders still open at `table`, read from the database rather than the
+    tracker, for writes that must not miss any
+    """
+    stale = (now or timezone.now()) - timedelta(hours=settings.TABLE_OPEN_ORDER_HOURS)
+    return Order.objects.filter(table_number=table, status__in=OPEN_STATUSES, order_time__gte=stale)
+
+
+def _minutes(now, since):
+    return int((now - since).total_seconds() // 60) if since else None
+
@@ -0,0 +1,12 @@
+from django import template
+from smartapp.menu_images import thumb_url
+
+register = template.Library()
+
+
+@register.filter
+def menu_thumb(url, width):
+    """
+    Local thumbnail of a FoodItem image, or the original URL until it is cached
+    """
+    return thumb_url(url, int(width)) or url or ''
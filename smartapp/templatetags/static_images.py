@@ -0,0 +1,36 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+from smartapp.static_images import load_manifest, MIME_TYPES
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_img(name, alt='', sizes='100vw', css_class='', loading='lazy'):
+    """
+    <picture> with AVIF/WebP/JPEG srcsets for a static image built by
+    `manage.py build_static`; falls back to a plain <img> before the first build
+    """
+    entry = load_manifest().get(name)
+    if entry is None:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="{}" decoding="async">',
+            static(name), alt, css_class, loading,
+        )
+
+    def srcset(fmt):
+        return ', '.join(f'{static(path)} {width}w' for width, path in entry['variants'][fmt])
+
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        ((MIME_TYPES[fmt], srcset(fmt), sizes) for fmt in entry['variants'] if fmt != 'jpeg'),
+    )
+    fallback = entry['variants'].get('jpeg')
+    img_src = static(fallback[-1][1]) if fallback else static(name)
+    img_srcset = srcset('jpeg') if fallback else ''
+    return format_html(
+        '<picture style="display: contents">{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" '
+        'alt="{}" class="{}" loading="{}" decoding="async"></picture>',
+        sources, img_src, img_srcset, sizes, entry['width'], entry['height'], alt, css_class, loading,
+    )
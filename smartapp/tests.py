@@ -1,3 +1,255 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from datetime import timedelta
+from functools import partial
+from unittest import mock
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from . import db_routers, views
+from .db_routers import STICKY_COOKIE, ReplicaStickinessMiddleware, reading_from_replica
+from .models import DiscountVoucher, Feedback, FoodItem, Order
+from .menu_import import import_menu
+from .menu_images import PIL_AVAILABLE, cache_image, fetch_bytes, image_dir, thumb_name, thumb_url
+from .vouchers import VoucherFilter, claim_voucher, expire_vouchers, issue_voucher
+
+if PIL_AVAILABLE:
+    from PIL import Image
+
+
+class _ImageHostHandler(SimpleHTTPRequestHandler):
+    """
+    Serves the test images from a directory and counts requests per path
+    """
+
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError(f"Timed out after {timeout}s")
+        time.sleep(0.05)
+
+
+@unittest.skipUnless(PIL_AVAILABLE, "Pillow not installed")
+class MenuImageCacheTests(TestCase):
+    """
+    Menu images fetched from a local http.server standing in for the remote
+    image hosts
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.served = tempfile.mkdtemp()
+        for name, colour in (('momo.jpg', (200, 40, 40)), ('thukpa.jpg', (40, 40, 200))):
+            Image.new('RGB', (800, 600), colour).save(os.path.join(cls.served, name), 'JPEG')
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), partial(_ImageHostHandler, directory=cls.served))
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.host = f'http://127.0.0.1:{cls.server.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        shutil.rmtree(cls.served)
+        super().tearDownClass()
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        overrides = override_settings(MEDIA_ROOT=media, MENU_IMAGE_FETCH_ON_SAVE=False)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        _ImageHostHandler.requests.clear()
+
+    def url(self, name):
+        return f'{self.host}/{name}'
+
+    def test_fetches_once_and_writes_every_thumbnail(self):
+        url = self.url('momo.jpg')
+        self.assertIsNone(thumb_url(url, 200))
+
+        self.assertTrue(cache_image(url))
+        for width, height in [(200, 140), (400, 280)]:
+            with Image.open(os.path.join(image_dir(), thumb_name(url, width))) as thumb:
+                self.assertEqual(thumb.format, 'WEBP')
+                self.assertEqual(thumb.size, (width, height))
+        self.assertEqual(thumb_url(url, 200), f'/menu-images/{thumb_name(url, 200)}')
+
+        # Everything is cached now, so neither the host nor Pillow is needed again
+        self.assertFalse(cache_image(url))
+        self.assertEqual(_ImageHostHandler.requests, ['/momo.jpg'])
+
+    def test_changed_url_is_fetched_again(self):
+        with override_settings(MENU_IMAGE_FETCH_ON_SAVE=True):
+            with self.captureOnCommitCallbacks(execute=True):
+                item = FoodItem.objects.create(name='Momo', price=250, img=self.url('momo.jpg'))
+            _wait_for(lambda: thumb_url(item.img, 400))
+
+            with self.captureOnCommitCallbacks(execute=True):
+                item.img = self.url('thukpa.jpg')
+                item.save()
+            _wait_for(lambda: thumb_url(item.img, 400))
+
+        self.assertNotEqual(thumb_name(self.url('momo.jpg'), 200), thumb_name(item.img, 200))
+        self.assertEqual(_ImageHostHandler.requests, ['/momo.jpg', '/thukpa.jpg'])
+        with Image.open(os.path.join(image_dir(), thumb_name(item.img, 200))) as thumb:
+            red, green, blue = thumb.convert('RGB').getpixel((100, 70))
+        self.assertGreater(blue, red)
+
+    def test_import_caches_new_and_changed_images(self):
+        FoodItem.objects.bulk_create([
+            FoodItem(name='Momo', price=250, img=self.url('momo.jpg')),
+            FoodItem(name='Thukpa', price=300, img=self.url('thukpa.jpg')),
+        ])
+        rows = [
+            {'name': 'Momo', 'price': 250, 'img': self.url('thukpa.jpg')},
+            {'name': 'Thukpa', 'price': 320, 'img': self.url('thukpa.jpg')},
+            {'name': 'Sel Roti', 'price': 90, 'img': self.url('momo.jpg')},
+        ]
+
+        with override_settings(MENU_IMAGE_FETCH_ON_SAVE=True):
+            with self.captureOnCommitCallbacks(execute=True):
+                stats = import_menu(rows)
+            _wait_for(lambda: thumb_url(self.url('momo.jpg'), 400) and thumb_url(self.url('thukpa.jpg'), 400))
+
+        self.assertEqual(stats, {'created': 1, 'updated': 2, 'deleted': 0, 'unchanged': 0})
+        # Thukpa only changed price, so its image isn't queued a second time
+        self.assertCountEqual(_ImageHostHandler.requests, ['/momo.jpg', '/thukpa.jpg'])
+
+    def test_menu_image_is_served_as_immutable(self):
+        url = self.url('momo.jpg')
+        cache_image(url)
+
+        response = self.client.get(thumb_url(url, 200))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(Image.open(io.BytesIO(b''.join(response.streaming_content))).size, (200, 140))
+
+    def test_only_http_urls_are_fetched(self):
+        with self.assertRaises(ValueError):
+            fetch_bytes('file:///etc/passwd')
+
+
+class VoucherTests(TestCase):
+    """
+    Claiming, order placement and expiry of discount vouchers
+    """
+
+    def setUp(self):
+        # The filter is process-wide; start each test from the database
+        VoucherFilter.reset_shared()
+        self.addCleanup(VoucherFilter.reset_shared)
+        feedback = Feedback.objects.create(customer_name='Asha', category='Food', rating=1, feedback_text='Cold momo')
+        self.voucher = issue_voucher(feedback, 'Asha')
+
+    def test_second_claim_is_refused(self):
+        self.assertEqual(claim_voucher(self.voucher.voucher_code.lower()), (self.voucher.voucher_code, 10))
+        with self.assertRaisesMessage(ValueError, 'already been used'):
+            claim_voucher(self.voucher.voucher_code)
+
+    def test_failed_order_leaves_voucher_unspent(self):
+        cart = [{'name': 'Momo', 'price': 250, 'quantity': 2}]
+        with mock.patch.object(views, 'attach_voucher', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                views._place_order(self.voucher.voucher_code, cart, [0], '', [], table_number=4, customer_name='Asha')
+
+        self.voucher.refresh_from_db()
+        self.assertFalse(self.voucher.is_used)
+        self.assertFalse(Order.objects.exists())
+
+        order, voucher = views._place_order(self.voucher.voucher_code, cart, [0], '', [], table_number=4, customer_name='Asha')
+        self.assertEqual(order.total_amount, 450)
+        self.assertEqual(order.vouchers.get().voucher_code, voucher[0])
+
+    def test_expiry_leaves_used_vouchers_alone(self):
+        feedback = Feedback.objects.create(customer_name='Bikash', category='Service', rating=1, feedback_text='Slow')
+        unused = issue_voucher(feedback, 'Bikash')
+        claim_voucher(self.voucher.voucher_code)
+
+        later = timezone.now() + timedelta(days=settings.VOUCHER_VALID_DAYS + 1)
+        self.assertEqual(expire_vouchers(now=later, batch_size=1), 1)
+
+        used = DiscountVoucher.objects.get(pk=self.voucher.pk)
+        self.assertTrue(used.is_used)
+        self.assertFalse(used.is_expired)
+        self.assertTrue(DiscountVoucher.objects.get(pk=unused.pk).is_expired)
+        with self.assertRaisesMessage(ValueError, 'expired'):
+            claim_voucher(unused.voucher_code)
+
+
+@unittest.skipUnless('replica' in settings.DATABASES, "needs a 'replica' database, e.g. DB_SQLITE_REPLICA")
+class ReplicaRoutingTests(TestCase):
+    """
+    ReplicaRouter and ReplicaStickinessMiddleware against two separate
+    databases, with rows written to one side only to see where reads went
+    """
+
+    # Only named when configured; the runner sets up every alias a test
+    # names, skipped or not
+    databases = {'default', 'replica'} if 'replica' in settings.DATABASES else {'default'}
+
+    def setUp(self):
+        # The write flag is reset per request by the middleware; outside it,
+        # a write in one test would pin the reads of the next
+        self.addCleanup(db_routers._wrote.reset, db_routers._wrote.set(False))
+        FoodItem.objects.using('default').create(name='On primary', price=100)
+        FoodItem.objects.using('replica').create(name='On replica', price=100)
+
+    def names(self):
+        return set(FoodItem.objects.values_list('name', flat=True))
+
+    def test_replica_reads_only_inside_read_from_replica(self):
+        self.assertEqual(self.names(), {'On primary'})
+        with reading_from_replica():
+            self.assertEqual(self.names(), {'On replica'})
+
+    def test_writes_go_to_primary_and_pin_later_reads(self):
+        with reading_from_replica():
+            FoodItem.objects.create(name='New', price=100)
+            self.assertEqual(self.names(), {'On primary', 'New'})
+        self.assertFalse(FoodItem.objects.using('replica').filter(name='New').exists())
+
+    def test_sticky_cookie_keeps_a_writer_on_primary(self):
+        def write(request):
+            FoodItem.objects.create(name='Ordered', price=100)
+            return HttpResponse()
+
+        def read(request):
+            with reading_from_replica():
+                return HttpResponse(','.join(sorted(self.names())))
+
+        factory = RequestFactory()
+        response = ReplicaStickinessMiddleware(write)(factory.post('/'))
+        cookie = response.cookies[STICKY_COOKIE].value
+
+        pinned = factory.get('/')
+        pinned.COOKIES[STICKY_COOKIE] = cookie
+        self.assertEqual(ReplicaStickinessMiddleware(read)(pinned).content, b'On primary,Ordered')
+
+        for cookies in ({}, {STICKY_COOKIE: 'forged'}):
+            request = factory.get('/')
+            request.COOKIES.update(cookies)
+            response = ReplicaStickinessMiddleware(read)(request)
+            self.assertEqual(response.content, b'On replica')
+            self.assertNotIn(STICKY_COOKIE, response.cookies)
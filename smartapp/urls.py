@@ -1,17 +1,32 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Under an ASGI server the write-heavy endpoints run as async views
+if settings.ASYNC_VIEWS:
+    submit_order = views.submit_order_async
+    submit_feedback = views.submit_feedback_async
+    get_feedback_data = views.get_feedback_data_async
+else:
+    submit_order = views.submit_order
+    submit_feedback = views.submit_feedback
+    get_feedback_data = views.get_feedback_data
+
 urlpatterns = [
     path('', views.home, name='home'),
     path('home.html', views.home, name='home_html'), 
     path('menus/', views.menus, name='menus'),
     path('order/', views.order, name='order'),
+    path('menu-images/<str:name>', views.menu_image, name='menu_image'),
     path('feedback/', views.feedback_page, name='feedback'),
     path('contact/', views.contact, name='contact'),
-    path('submit_order/', views.submit_order, name='submit_order'),
-    path('submit_feedback/', views.submit_feedback, name='submit_feedback'),
+    path('health/', views.health, name='health'),
+    path('submit_order/', submit_order, name='submit_order'),
+    path('submit_feedback/', submit_feedback, name='submit_feedback'),
     path('view_feedback/', views.view_feedback, name='view_feedback'),
-    path('api/feedback/', views.get_feedback_data, name='get_feedback_data'),
+    path('api/feedback/', get_feedback_data, name='get_feedback_data'),
+    path('api/orders/', views.get_order_data, name='get_order_data'),
+    path('api/menu/search/', views.menu_search, name='menu_search'),
     path('order_form/', views.order_form, name='order_form'),
     path('feedback_form/', views.feedback_form, name='feedback_form'),
     path('order_success/', views.order_success, name='order_success'),
@@ -22,6 +37,14 @@ urlpatterns = [
     path('custom-admin/orders/', views.admin_orders, name='admin_orders'),
     path('custom-admin/orders/<int:order_id>/', views.admin_order_detail, name='admin_order_detail'),
     path('custom-admin/kds/', views.admin_kds, name='admin_kds'),
+    path('custom-admin/kds/queue/', views.admin_kds_queue, name='admin_kds_queue'),
+    path('custom-admin/kds/forecast/', views.admin_kds_forecast, name='admin_kds_forecast'),
+    path('custom-admin/floor/', views.admin_floor, name='admin_floor'),
+    path('custom-admin/floor/data/', views.admin_floor_data, name='admin_floor_data'),
     path('custom-admin/feedback/', views.admin_feedback, name='admin_feedback'),
+    path('custom-admin/analytics/', views.admin_analytics, name='admin_analytics'),
+    path('custom-admin/analytics/data/', views.admin_analytics_data, name='admin_analytics_data'),
+    path('custom-admin/export/<str:name>/', views.admin_export, name='admin_export'),
+    path('custom-admin/cache-stats/', views.admin_cache_stats, name='admin_cache_stats'),
     path('custom-admin/logout/', views.admin_logout, name='admin_logout'),
 ]
@@ -1,36 +1,142 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse
+from django.http import JsonResponse, FileResponse, StreamingHttpResponse
+from django.views.static import serve
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from django.core import serializers
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connection, transaction, DatabaseError
 from django.db.models import Count, Q
 import json
-import uuid
-from .models import Order, OrderItem, FoodItem, Feedback, DiscountVoucher, Admin, KDS, AllergyInfo
+import tempfile
+from asgiref.sync import sync_to_async
+from datetime import datetime, time, timedelta
+from .models import Order, OrderItem, FoodItem, Feedback, FeedbackAspect, Admin, KDS, AllergyInfo, DishForecast, allergen_labels
 from .sentiment_analysis import SentimentAnalyzer
+from .aspect_analysis import AspectExtractor, aspect_rows
+from .shadow_scoring import shadow_score
+from .wait_time import WaitTimeEstimator, cart_items, record_kitchen_ready
+from .kitchen_scheduler import KitchenScheduler
+from .table_state import TableTracker, open_orders
+from .db_routers import read_from_replica
+from .caching import (
+    cached_page, menu_version, menu_fragment_cached, cache_stats,
+    order_page_etag, menu_etag, feedback_listing_etag,
+)
+from .menu_images import image_dir
+from .menu_search import MenuSearchIndex
+from .feedback_search import search_feedback
+from .vouchers import issue_voucher, claim_voucher, attach_voucher
+from .allergens import check_cart
+from .rate_limit import Throttled, check_rate, rate_limit, throttled_response
+from .serialization import FastJsonResponse, Listing, listing_options
+from . import exports
+from .analytics import sales_report
 import logging
 
 # Configure logging for debugging
 logger = logging.getLogger(__name__)
 
+# Most results admin_feedback shows for a search
+FEEDBACK_SEARCH_LIMIT = 500
+# Tables listed under "waiting longest" on the floor view
+FLOOR_LONGEST_WAITS = 5
+
+FEEDBACK_LISTING = Listing(Feedback, [
+    ('id', 'id', None),
+    ('customer_name', 'customer_name', None),
+    ('feedback_category', 'category', 'label'),
+    ('rating', 'rating', None),
+    ('feedback_text', 'feedback_text', None),
+    ('sentiment', 'sentiment', 'label'),
+    ('created_at', 'created_at', 'datetime'),
+])
+
+ORDER_LISTING = Listing(Order, [
+    ('id', 'id', None),
+    ('table_number', 'table_number', None),
+    ('customer_name', 'customer_name', None),
+    ('ordered_by', 'ordered_by', None),
+    ('food_item', 'food_item', None),
+    ('total_amount', 'total_amount', 'decimal'),
+    ('estimated_wait_time', 'estimated_wait_time', None),
+    ('status', 'status', None),
+    ('order_time', 'order_time', 'datetime'),
+])
+
+@cached_page
 def home(request):
     logger.info(f"Home view accessed via URL: {request.path}")
     return render(request, 'home.html')
 
+@cached_page
 def menus(request):
     return render(request, 'menus.html')
 
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=order_page_etag)
 def order(request):
+    # Querysets are lazy: when the menu fragments are cached they never hit the DB
+    version = menu_version()
+    menu_fragment_cached('menu_grid', version)
     food_items = FoodItem.objects.all()
     categories = FoodItem.objects.values_list('category', flat=True).distinct()
-    return render(request, 'order.html', {'food_items': food_items, 'categories': categories})
+    return render(request, 'order.html', {
+        'food_items': food_items,
+        'categories': categories,
+        'menu_version': version,
+    })
+
+@cache_control(no_cache=True)
+@condition(etag_func=menu_etag)
+def menu_search(request):
+    """
+    API endpoint for menu typeahead: prefix and typo-tolerant search over
+    dish names and categories
+    """
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(int(request.GET.get('limit', 10)), 50)
+    except ValueError:
+        limit = 10
+
+    results = MenuSearchIndex.current().search(query, limit=limit)
+    return JsonResponse({
+        'query': query,
+        'results': [
+            {
+                'id': item['id'],
+                'name': item['name'],
+                'category': item['category'],
+                'price': float(item['price']),
+                'img': item['img'],
+            }
+            for item in results
+        ],
+    })
+
+def menu_image(request, name):
+    """
+    Serve a cached menu thumbnail. Names are derived from the source URL, so a
+    given name never changes content and browsers may keep it for a year.
+    """
+    response = serve(request, name, document_root=image_dir())
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
 
+@cached_page
 def feedback_page(request):
     return render(request, 'feedback.html')
 
+@read_from_replica
 def view_feedback(request):
     """
     Display all feedback entries in a table format
@@ -38,7 +144,36 @@ def view_feedback(request):
     feedback_list = Feedback.objects.all().order_by('-created_at')
     return render(request, 'view_feedback.html', {'feedback_list': feedback_list})
 
+def _json_body(request):
+    """
+    Decode a JSON request body straight from the request stream, so the raw
+    bytes aren't also kept around as request.body
+    """
+    length = int(request.META.get('CONTENT_LENGTH') or 0)
+    limit = settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+    if limit is not None and length > limit:
+        raise RequestDataTooBig('Request body exceeded settings.DATA_UPLOAD_MAX_MEMORY_SIZE.')
+    return json.load(request)
+
+def _feedback_reply(customer_name, sentiment, voucher_code=None):
+    response_data = {
+        'message': 'Feedback submitted successfully',
+        'customer': customer_name,
+        'sentiment': sentiment or 'unknown'
+    }
+    if voucher_code:
+        response_data.update({
+            'popup_message': "We're sorry your order experience wasn't great 😞 — You've earned a 10% discount voucher for your next visit!",
+            'voucher_code': voucher_code,
+            'discount_percentage': 10
+        })
+    else:
+        # Positive, Neutral, or Unknown sentiment
+        response_data['popup_message'] = "Thank you for your feedback 💬!"
+    return response_data
+
 @csrf_exempt
+@rate_limit('submit_feedback')
 def submit_feedback(request):
     if request.method == 'POST':
         try:
@@ -56,12 +191,17 @@ def submit_feedback(request):
                 sentiment_result = SentimentAnalyzer.analyze_sentiment(feedback_text)
                 sentiment = sentiment_result['sentiment']
                 confidence = sentiment_result['confidence']
+                model_version = sentiment_result['model_version']
                 logger.info(f"Sentiment analysis result: {sentiment} ({confidence}% confidence)")
             except RuntimeError as e:
                 # Model not available - log warning and continue without sentiment
                 logger.warning(f"Sentiment analysis unavailable: {e}")
+                sentiment_result = None
                 sentiment = None
                 confidence = None
+                model_version = None
+
+            aspects = AspectExtractor.extract(feedback_text)
             
             # Create feedback entry with sentiment (or without if model unavailable)
             feedback_entry = Feedback.objects.create(
@@ -70,44 +210,22 @@ def submit_feedback(request):
                 rating=int(rating),
                 feedback_text=feedback_text,
                 sentiment=sentiment,
-                confidence=confidence
+                confidence=confidence,
+                emotion=AspectExtractor.emotion_for(aspects, sentiment),
+                model_version=model_version
             )
+            FeedbackAspect.objects.bulk_create(aspect_rows(feedback_entry, aspects))
+            shadow_score(feedback_entry, sentiment_result)
             
             logger.info(f"Feedback created: {feedback_entry} with sentiment: {sentiment}")
             
-            # Handle sentiment-based responses
-            response_data = {
-                'message': 'Feedback submitted successfully',
-                'customer': customer_name,
-                'sentiment': sentiment or 'unknown'
-            }
-            
             # If sentiment is negative, create discount voucher and add special message
+            voucher_code = None
             if sentiment == 'negative':
-                # Generate unique voucher code
-                voucher_code = f"SORRY{str(uuid.uuid4())[:6].upper()}"
-                
-                # Create discount voucher
-                discount_voucher = DiscountVoucher.objects.create(
-                    customer_name=customer_name,
-                    feedback=feedback_entry,
-                    voucher_code=voucher_code,
-                    discount_percentage=10
-                )
-                
-                response_data.update({
-                    'popup_message': "We're sorry your order experience wasn't great 😞 — You've earned a 10% discount voucher for your next visit!",
-                    'voucher_code': voucher_code,
-                    'discount_percentage': 10
-                })
-                
+                voucher_code = issue_voucher(feedback_entry, customer_name).voucher_code
                 logger.info(f"Created discount voucher {voucher_code} for negative feedback from {customer_name}")
-                
-            else:
-                # Positive, Neutral, or Unknown sentiment
-                response_data['popup_message'] = "Thank you for your feedback 💬!"
             
-            return JsonResponse(response_data)
+            return FastJsonResponse(_feedback_reply(customer_name, sentiment, voucher_code))
             
         except Exception as e:
             logger.error(f"Error processing feedback: {e}")
@@ -116,27 +234,93 @@ def submit_feedback(request):
         return JsonResponse({'error': 'Invalid request method'}, status=405)
 
 @csrf_exempt
+@rate_limit('submit_feedback')
+async def submit_feedback_async(request):
+    """
+    submit_feedback for ASGI: database writes go through the async ORM and
+    sentiment scoring through the non-blocking executor, so a waiting
+    request holds no thread
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method'}, status=405)
+    try:
+        data = _json_body(request)
+    except RequestDataTooBig as e:
+        return JsonResponse({'error': str(e)}, status=413)
+    except ValueError as e:
+        return JsonResponse({'error': f'Invalid JSON: {e}'}, status=400)
+
+    try:
+        customer_name = data.get('customer_name')
+        feedback_category = data.get('feedback_category')
+        rating = data.get('rating')
+        feedback_text = data.get('feedback_text')
+
+        if not all([customer_name, feedback_category, rating, feedback_text]):
+            return JsonResponse({'error': 'All fields are required'}, status=400)
+
+        try:
+            sentiment_result = await SentimentAnalyzer.analyze_sentiment_async(feedback_text)
+            sentiment = sentiment_result['sentiment']
+            confidence = sentiment_result['confidence']
+            model_version = sentiment_result['model_version']
+            logger.info(f"Sentiment analysis result: {sentiment} ({confidence}% confidence)")
+        except RuntimeError as e:
+            logger.warning(f"Sentiment analysis unavailable: {e}")
+            sentiment_result = None
+            sentiment = None
+            confidence = None
+            model_version = None
+
+        aspects = AspectExtractor.extract(feedback_text)
+
+        feedback_entry = await Feedback.objects.acreate(
+            customer_name=customer_name,
+            category=feedback_category,
+            rating=int(rating),
+            feedback_text=feedback_text,
+            sentiment=sentiment,
+            confidence=confidence,
+            emotion=AspectExtractor.emotion_for(aspects, sentiment),
+            model_version=model_version
+        )
+        await FeedbackAspect.objects.abulk_create(aspect_rows(feedback_entry, aspects))
+        await sync_to_async(shadow_score)(feedback_entry, sentiment_result)
+
+        logger.info(f"Feedback created: {feedback_entry} with sentiment: {sentiment}")
+
+        voucher_code = None
+        if sentiment == 'negative':
+            voucher = await sync_to_async(issue_voucher)(feedback_entry, customer_name)
+            voucher_code = voucher.voucher_code
+            logger.info(f"Created discount voucher {voucher_code} for negative feedback from {customer_name}")
+
+        return FastJsonResponse(_feedback_reply(customer_name, sentiment, voucher_code))
+
+    except Exception as e:
+        logger.error(f"Error processing feedback: {e}")
+        return JsonResponse({'error': f'Error processing feedback: {str(e)}'}, status=500)
+
+@csrf_exempt
+@read_from_replica
+@cache_control(no_cache=True)
+@condition(etag_func=feedback_listing_etag)
 def get_feedback_data(request):
     """
-    API endpoint to get all feedback data for display
+    API endpoint to get all feedback data for display.
+    ?fields=id,rating,... limits the columns; ?format=compact sends a
+    'fields' list and one value list per row instead of objects.
     """
     if request.method == 'GET':
         try:
-            feedback_list = Feedback.objects.all().order_by('-created_at')
-            feedback_data = []
-
-            for fb in feedback_list:
-                feedback_data.append({
-                    'id': fb.id,
-                    'customer_name': fb.customer_name,
-                    'feedback_category': fb.get_category_display(),
-                    'rating': fb.rating,
-                    'feedback_text': fb.feedback_text,
-                    'sentiment': fb.get_sentiment_display(),
-                    'created_at': fb.created_at.strftime('%Y-%m-%d %H:%M:%S')
-                })
-            
-            return JsonResponse({'feedback': feedback_data})
+            fields, compact = listing_options(request)
+            columns = FEEDBACK_LISTING.project(fields)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        try:
+            rows = list(FEEDBACK_LISTING.values(Feedback.objects.order_by('-created_at'), columns))
+            return FastJsonResponse(FEEDBACK_LISTING.payload('feedback', rows, columns, compact))
             
         except Exception as e:
             logger.error(f"Error retrieving feedback data: {e}")
@@ -144,9 +328,68 @@ def get_feedback_data(request):
     else:
         return JsonResponse({'error': 'Invalid request method'}, status=405)
 
+@csrf_exempt
+@read_from_replica
+@cache_control(no_cache=True)
+@condition(etag_func=feedback_listing_etag)
+async def get_feedback_data_async(request):
+    """
+    get_feedback_data for ASGI, reading through async iteration
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Invalid request method'}, status=405)
+    try:
+        fields, compact = listing_options(request)
+        columns = FEEDBACK_LISTING.project(fields)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    try:
+        queryset = FEEDBACK_LISTING.values(Feedback.objects.order_by('-created_at'), columns)
+        rows = [row async for row in queryset]
+        return FastJsonResponse(FEEDBACK_LISTING.payload('feedback', rows, columns, compact))
+    except Exception as e:
+        logger.error(f"Error retrieving feedback data: {e}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+@read_from_replica
+def get_order_data(request):
+    """
+    API endpoint listing orders, newest first, optionally ?status=pending.
+    Takes the same ?fields= and ?format=compact options as the feedback API.
+    """
+    try:
+        fields, compact = listing_options(request)
+        columns = ORDER_LISTING.project(fields)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    orders = Order.objects.order_by('-order_time')
+    status = request.GET.get('status')
+    if status:
+        orders = orders.filter(status=status)
+    rows = list(ORDER_LISTING.values(orders, columns))
+    return FastJsonResponse(ORDER_LISTING.payload('orders', rows, columns, compact))
+
+@cached_page
 def contact(request):
     return render(request, 'contact.html')
 
+def health(request):
+    """
+    Liveness check for load balancers: confirms the database answers
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    except DatabaseError as e:
+        logger.error(f"Database health check failed: {e}")
+        return JsonResponse({'status': 'error', 'database': 'unavailable'}, status=503)
+    return JsonResponse({'status': 'ok', 'database': 'ok'})
+
 def order_history(request):
     """
     Display all order history entries in a table format
@@ -154,7 +397,114 @@ def order_history(request):
     orders = Order.objects.all().order_by('-created_at')
     return render(request, 'order_history.html', {'orders': orders})
 
+def _cart_total(cart):
+    total_amount = 0
+    for item in cart:
+        quantity = item.get('quantity', 1)
+        price = item.get('price', 0)
+        total_amount += quantity * price
+    return total_amount
+
+def _cart_summary(cart):
+    # Set food_item to a summary of items, e.g., first item or comma-separated
+    food_item_summary = ', '.join([f"{item['name']} x{item['quantity']}" for item in cart[:3]])  # First 3 items
+    if len(cart) > 3:
+        food_item_summary += f" +{len(cart)-3} more"
+    return food_item_summary
+
+def _order_item(order, item, allergen_conflicts=0):
+    quantity = item.get('quantity', 1)
+    unit_price = item.get('price', 0)
+    # Set here as well as in save(), which bulk_create doesn't call
+    return OrderItem(
+        order=order,
+        item_name=item.get('name'),
+        quantity=quantity,
+        unit_price=unit_price,
+        total_price=quantity * unit_price,
+        category=item.get('category', 'General'),
+        allergen_conflicts=allergen_conflicts,
+    )
+
+def _discounted(amount, discount_percentage):
+    return round(amount * (100 - discount_percentage) / 100, 2)
+
+def _cart_error(cart):
+    """
+    Why `cart` can't be ordered, or None; checked before a voucher is claimed
+    """
+    if not isinstance(cart, list):
+        return 'Cart must be a list of items'
+    for item in cart:
+        if not isinstance(item, dict) or not item.get('name'):
+            return 'Every cart item needs a name'
+        quantity = item.get('quantity', 1)
+        if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity < 1:
+            return f"Invalid quantity for {item['name']}"
+        price = item.get('price', 0)
+        if isinstance(price, bool) or not isinstance(price, (int, float)) or price < 0:
+            return f"Invalid price for {item['name']}"
+    return None
+
+def _place_order(voucher_code, cart, conflicts, allergy, allergens, **fields):
+    """
+    Claim the voucher, if any, and write the order, its items and allergy info
+    in one transaction, so a failure anywhere leaves the voucher unspent.
+    Returns (order, (code, discount) or None); ValueError, with a message for
+    the customer, when the voucher can't be redeemed.
+    """
+    subtotal = _cart_total(cart)
+    with transaction.atomic():
+        # Claiming is what stops two orders using the voucher; its row stays
+        # locked until the order commits
+        voucher = claim_voucher(voucher_code) if voucher_code else None
+        order = Order.objects.create(
+            total_amount=_discounted(subtotal, voucher[1] if voucher else 0),
+            status='pending',
+            **fields,
+        )
+        # The order's post_save bumps the order version for these too
+        OrderItem.objects.bulk_create([_order_item(order, item, conflict) for item, conflict in zip(cart, conflicts)])
+        if allergy:
+            AllergyInfo.objects.create(order=order, allergy_type=allergy, allergens=allergens)
+        if voucher:
+            attach_voucher(voucher[0], order)
+    return order, voucher
+
+def _order_reply(order, name, ordered_by, table, cart, total_amount, estimated_wait, voucher=None, conflicts=()):
+    reply = {
+        'message': 'Order placed successfully',
+        'order_id': order.id,
+        'customer': name,
+        'ordered_by': ordered_by,
+        'table': table,
+        'total_amount': float(total_amount),
+        'estimated_wait_time': estimated_wait,
+        'items_count': len(cart)
+    }
+    if voucher:
+        code, discount = voucher
+        reply.update({
+            'voucher_code': code,
+            'discount_percentage': discount,
+            'subtotal': float(_cart_total(cart)),
+        })
+    flagged = [
+        {'item': item.get('name'), 'allergens': allergen_labels(conflict)}
+        for item, conflict in zip(cart, conflicts) if conflict
+    ]
+    if flagged:
+        reply['allergen_warnings'] = flagged
+    return reply
+
+
+def _log_allergen_conflicts(order, allergy, cart, conflicts):
+    flagged = [f"{item.get('name')} ({', '.join(allergen_labels(conflict))})" for item, conflict in zip(cart, conflicts) if conflict]
+    if flagged:
+        logger.warning(f"Order #{order.id}: allergy '{allergy}' conflicts with {'; '.join(flagged)}")
+
 @csrf_exempt
+@rate_limit('submit_order')
 def submit_order(request):
     if request.method == 'POST':
         try:
@@ -171,66 +521,44 @@ def submit_order(request):
                 logger.error("Invalid data received: missing name, table, or cart")
                 return JsonResponse({'error': 'Invalid data'}, status=400)
             
-            # Calculate total amount and estimated wait time
-            total_amount = 0
-            item_count = 0
-            for item in cart:
-                quantity = item.get('quantity', 1)
-                price = item.get('price', 0)
-                total_amount += quantity * price
-                item_count += quantity
-            
-            # Calculate estimated wait time (15-25 minutes base + 2 minutes per item)
-            estimated_wait = 15 + (item_count * 2)
-            if estimated_wait > 45:
-                estimated_wait = 45  # Cap at 45 minutes
-            
-            # Create the main order
-            # Set food_item to a summary of items, e.g., first item or comma-separated
-            food_item_summary = ', '.join([f"{item['name']} x{item['quantity']}" for item in cart[:3]])  # First 3 items
-            if len(cart) > 3:
-                food_item_summary += f" +{len(cart)-3} more"
-            order = Order.objects.create(
-                table_number=int(table),
-                customer_name=name,
-                food_item=food_item_summary,
-                ordered_by=ordered_by,
-                total_amount=total_amount,
-                estimated_wait_time=estimated_wait,
-                status='pending'
-            )
-            
-            # Create individual order items
-            for item in cart:
-                item_name = item.get('name')
-                quantity = item.get('quantity', 1)
-                unit_price = item.get('price', 0)
-                category = item.get('category', 'General')
-
-                OrderItem.objects.create(
-                    order=order,
-                    item_name=item_name,
-                    quantity=quantity,
-                    unit_price=unit_price,
-                    category=category
+            try:
+                check_rate('submit_order', 'table', str(table).strip())
+            except Throttled as e:
+                return throttled_response(e)
+
+            cart_error = _cart_error(cart)
+            if cart_error:
+                return JsonResponse({'error': cart_error}, status=400)
+
+            # Flag dishes containing what the customer is allergic to, for the kitchen
+            allergens, conflicts = check_cart(allergy, cart)
+
+            # Estimate wait time from learned prep times and current kitchen load
+            estimator = WaitTimeEstimator.shared()
+            items = cart_items(cart, conflicts)
+            estimated_wait = estimator.estimate(items)
+
+            try:
+                order, voucher = _place_order(
+                    data.get('voucher_code'), cart, conflicts, allergy, allergens,
+                    table_number=int(table),
+                    customer_name=name,
+                    food_item=_cart_summary(cart),
+                    ordered_by=ordered_by,
+                    estimated_wait_time=estimated_wait,
                 )
-            
-            # Save allergy info if provided
-            if allergy:
-                AllergyInfo.objects.create(order=order, allergy_type=allergy)
+            except ValueError as e:
+                return JsonResponse({'error': str(e)}, status=400)
+            total_amount = order.total_amount
+
+            estimator.order_queued(order.id, items)
+            KitchenScheduler.shared().order_added(order, items)
+            TableTracker.shared().order_placed(order.id, order.table_number, order.order_time, sum(i['quantity'] for i in items))
 
             logger.info(f"Order created: {order} with {len(cart)} items")
+            _log_allergen_conflicts(order, allergy, cart, conflicts)
 
-            return JsonResponse({
-                'message': 'Order placed successfully',
-                'order_id': order.id,
-                'customer': name,
-                'ordered_by': ordered_by,
-                'table': table,
-                'total_amount': float(total_amount),
-                'estimated_wait_time': estimated_wait,
-                'items_count': len(cart)
-            })
+            return FastJsonResponse(_order_reply(order, name, ordered_by, table, cart, total_amount, estimated_wait, voucher, conflicts))
             
         except Exception as e:
             logger.error(f"Error processing order: {e}")
@@ -238,6 +566,81 @@ def submit_order(request):
     else:
         return JsonResponse({'error': 'Invalid request method'}, status=405)
 
+@csrf_exempt
+@rate_limit('submit_order')
+async def submit_order_async(request):
+    """
+    submit_order for ASGI; everything but the order's own writes runs on the
+    event loop
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method'}, status=405)
+    try:
+        data = _json_body(request)
+    except RequestDataTooBig as e:
+        return JsonResponse({'error': str(e)}, status=413)
+    except ValueError as e:
+        return JsonResponse({'error': f'Invalid JSON: {e}'}, status=400)
+
+    try:
+        name = data.get('name')
+        ordered_by = data.get('ordered_by', name)
+        table = data.get('table')
+        cart = data.get('cart', [])
+        allergy = data.get('allergy', '').strip()
+
+        logger.info(f"Received order: name={name}, ordered_by={ordered_by}, table={table}, cart={cart}")
+
+        if not name or not table or not cart:
+            logger.error("Invalid data received: missing name, table, or cart")
+            return JsonResponse({'error': 'Invalid data'}, status=400)
+
+        try:
+            await sync_to_async(check_rate)('submit_order', 'table', str(table).strip())
+        except Throttled as e:
+            return throttled_response(e)
+
+        cart_error = _cart_error(cart)
+        if cart_error:
+            return JsonResponse({'error': cart_error}, status=400)
+
+        # check_cart reads the menu when it has changed
+        allergens, conflicts = await sync_to_async(check_cart)(allergy, cart)
+
+        # shared() reads the database the first time it is called
+        estimator = await sync_to_async(WaitTimeEstimator.shared)()
+        scheduler = await sync_to_async(KitchenScheduler.shared)()
+        tables = await sync_to_async(TableTracker.shared)()
+        items = cart_items(cart, conflicts)
+        estimated_wait = estimator.estimate(items)
+
+        try:
+            # The async ORM can't hold a transaction open, so the writes run in a thread
+            order, voucher = await sync_to_async(_place_order)(
+                data.get('voucher_code'), cart, conflicts, allergy, allergens,
+                table_number=int(table),
+                customer_name=name,
+                food_item=_cart_summary(cart),
+                ordered_by=ordered_by,
+                estimated_wait_time=estimated_wait,
+            )
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        total_amount = order.total_amount
+
+        estimator.order_queued(order.id, items)
+        scheduler.order_added(order, items)
+        tables.order_placed(order.id, order.table_number, order.order_time, sum(i['quantity'] for i in items))
+
+        logger.info(f"Order created: {order} with {len(cart)} items")
+        _log_allergen_conflicts(order, allergy, cart, conflicts)
+
+        return FastJsonResponse(_order_reply(order, name, ordered_by, table, cart, total_amount, estimated_wait, voucher, conflicts))
+
+    except Exception as e:
+        logger.error(f"Error processing order: {e}")
+        return JsonResponse({'error': f'Error processing order: {str(e)}'}, status=500)
+
 # New views for simple forms
 def order_form(request):
     if request.method == 'POST':
@@ -246,15 +649,17 @@ def order_form(request):
         food_item = request.POST.get('food_item')
         
         if customer_name and table_number and food_item:
-            Order.objects.create(
+            order = Order.objects.create(
                 customer_name=customer_name,
                 table_number=int(table_number),
                 food_item=food_item
             )
+            TableTracker.shared().order_placed(order.id, order.table_number, order.order_time, 1)
             return redirect('order_success')
     
     return render(request, 'order_form.html')
 
+@rate_limit('submit_feedback')
 def feedback_form(request):
     if request.method == 'POST':
         customer_name = request.POST.get('customer_name')
@@ -268,12 +673,17 @@ def feedback_form(request):
                 sentiment_result = SentimentAnalyzer.analyze_sentiment(feedback_text)
                 sentiment = sentiment_result['sentiment']
                 confidence = sentiment_result['confidence']
+                model_version = sentiment_result['model_version']
                 logger.info(f"Sentiment analysis result: {sentiment} ({confidence}% confidence)")
             except RuntimeError as e:
                 # Model not available - log warning and continue without sentiment
                 logger.warning(f"Sentiment analysis unavailable: {e}")
+                sentiment_result = None
                 sentiment = None
                 confidence = None
+                model_version = None
+
+            aspects = AspectExtractor.extract(feedback_text)
 
             # Create feedback entry
             feedback_entry = Feedback.objects.create(
@@ -282,18 +692,16 @@ def feedback_form(request):
                 rating=int(rating),
                 feedback_text=feedback_text,
                 sentiment=sentiment,
-                confidence=confidence
+                confidence=confidence,
+                emotion=AspectExtractor.emotion_for(aspects, sentiment),
+                model_version=model_version
             )
+            FeedbackAspect.objects.bulk_create(aspect_rows(feedback_entry, aspects))
+            shadow_score(feedback_entry, sentiment_result)
             
             # Handle negative sentiment - create discount voucher
             if sentiment == 'negative':
-                voucher_code = f"SORRY{str(uuid.uuid4())[:6].upper()}"
-                DiscountVoucher.objects.create(
-                    customer_name=customer_name,
-                    feedback=feedback_entry,
-                    voucher_code=voucher_code,
-                    discount_percentage=10
-                )
+                voucher_code = issue_voucher(feedback_entry, customer_name).voucher_code
                 # Store voucher info in session for display on success page
                 request.session['voucher_code'] = voucher_code
                 request.session['is_negative_feedback'] = True
@@ -401,6 +809,26 @@ def admin_orders(request):
     return render(request, 'admin_orders.html', {'orders_with_pending': orders_with_pending})
 
 
+def _complete_order(order):
+    """
+    Close an order: the kitchen is done with it and it leaves its table
+    """
+    now = timezone.now()
+    order.status = 'completed'
+    order.completed_at = now
+    order.save()
+    kds, created = KDS.objects.get_or_create(order=order)
+    # Usually the KDS marked it ready already; that time, not this one, ends
+    # its prep and it has been learned from
+    if kds.kitchen_status != 'Ready' or not kds.ready_time:
+        kds.kitchen_status = 'Ready'
+        kds.ready_time = now
+        kds.save()
+        record_kitchen_ready(kds)
+    KitchenScheduler.shared().order_done(order.id)
+    TableTracker.shared().order_closed(order.id, now)
+
+
 @login_required
 @user_passes_test(lambda u: u.is_staff)
 def admin_order_detail(request, order_id):
@@ -418,13 +846,9 @@ def admin_order_detail(request, order_id):
             order.status = 'preparing'
             order.save()
             KDS.objects.get_or_create(order=order, defaults={'kitchen_status': 'Preparing'})
+            TableTracker.shared().touch(order.id)
         elif action == 'mark_completed':
-            order.status = 'completed'
-            order.save()
-            kds, created = KDS.objects.get_or_create(order=order)
-            kds.kitchen_status = 'Ready'
-            kds.ready_time = timezone.now()
-            kds.save()
+            _complete_order(order)
         return redirect('admin_order_detail', order_id=order_id)
 
     return render(request, 'admin_order_detail.html', {
@@ -463,19 +887,120 @@ def admin_kds(request):
             kds.kitchen_status = 'Preparing'
             kds.start_time = timezone.now()
             kds.save()
-        elif action == 'mark_ready':
+            KitchenScheduler.shared().order_started(order.id)
+            TableTracker.shared().touch(order.id, kds.start_time)
+        elif action == 'mark_ready' and kds.kitchen_status != 'Ready':
             kds.kitchen_status = 'Ready'
             kds.ready_time = timezone.now()
             kds.save()
             order.status = 'ready'
             order.save()
+            record_kitchen_ready(kds)
+            KitchenScheduler.shared().order_done(order.id)
+            TableTracker.shared().order_ready(order.id, kds.ready_time)
         return redirect('admin_kds')
 
-    return render(request, 'admin_kds.html', {'kds_with_time': kds_with_time})
+    return render(request, 'admin_kds.html', {
+        'kds_with_time': kds_with_time,
+        'cook_queue': KitchenScheduler.shared().cook_queue(),
+    })
+
+
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+def admin_kds_queue(request):
+    """
+    API endpoint for the consolidated "what to cook next" queue
+    """
+    batches = []
+    for batch in KitchenScheduler.shared().cook_queue():
+        batches.append({
+            'item_name': batch['item_name'],
+            'category': batch['category'],
+            'quantity': batch['quantity'],
+            'prep_minutes': batch['prep_minutes'],
+            'start_by': batch['start_by'].isoformat(),
+            'deadline': batch['deadline'].isoformat(),
+            'orders': [
+                {'order_id': t['order_id'], 'table': t['table_number'], 'quantity': t['quantity'], 'allergens': t['allergens']}
+                for t in batch['tickets']
+            ],
+        })
+    return JsonResponse({'batches': batches})
+
+
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+@read_from_replica
+def admin_kds_forecast(request):
+    """
+    API endpoint for the prep list: portions of each dish expected per hour on
+    ?date= (default today), as stored by the nightly forecast_demand command
+    """
+    value = request.GET.get('date')
+    try:
+        day = parse_date(value) if value else timezone.localdate()
+    except ValueError:
+        day = None
+    if day is None:
+        return JsonResponse({'error': f'Invalid date: {value}'}, status=400)
+
+    forecasts = DishForecast.objects.filter(date=day).order_by('-total').values(
+        'item_name', 'category', 'total', 'hourly', 'created_at')
+    return FastJsonResponse({'date': day.isoformat(), 'dishes': list(forecasts)})
+
+
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+def admin_floor(request):
+    """
+    Floor plan: every table's occupancy, pending food and waiting time from
+    the in-memory table tracker. Posting action=clear completes the table's
+    open orders once the party has left.
+    """
+    tracker = TableTracker.shared()
+    if request.method == 'POST':
+        try:
+            table = int(request.POST.get('table'))
+        except (TypeError, ValueError):
+            table = None
+        if request.POST.get('action') == 'clear' and table is not None:
+            # From the database, which also has orders other workers took
+            for order in open_orders(table):
+                _complete_order(order)
+        return redirect('admin_floor')
+
+    now = timezone.now()
+    tables = tracker.floor(now)
+    return render(request, 'admin_floor.html', {
+        'tables': tables,
+        'seated': sum(1 for table in tables if table['state'] != 'free'),
+        'waiting': tracker.waiting_longest(FLOOR_LONGEST_WAITS, now),
+        'turnover': tracker.turnover(now),
+    })
 
 
 @login_required
 @user_passes_test(lambda u: u.is_staff)
+def admin_floor_data(request):
+    """
+    API endpoint for the floor plan shown by admin_floor
+    """
+    tracker = TableTracker.shared()
+    now = timezone.now()
+    return FastJsonResponse({
+        'tables': tracker.floor(now),
+        'waiting_longest': [
+            {'table': table, 'waiting_minutes': minutes}
+            for table, minutes in tracker.waiting_longest(FLOOR_LONGEST_WAITS, now)
+        ],
+        'turnover': tracker.turnover(now),
+    })
+
+
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+@read_from_replica
 def admin_feedback(request):
     feedbacks = Feedback.objects.select_related('order').all().order_by('-created_at')
     positive_count = feedbacks.filter(sentiment='positive').count()
@@ -484,15 +1009,171 @@ def admin_feedback(request):
 
     emotion_counts = feedbacks.values('emotion').annotate(count=Count('emotion')).order_by('-count')
 
+    # {aspect label: {'positive': n, 'neutral': n, 'negative': n}} in choice order
+    polarity_keys = {1: 'positive', 0: 'neutral', -1: 'negative'}
+    aspect_counts = {label: dict.fromkeys(polarity_keys.values(), 0) for _, label in FeedbackAspect.ASPECT_CHOICES}
+    aspect_labels = dict(FeedbackAspect.ASPECT_CHOICES)
+    for row in FeedbackAspect.objects.values('aspect', 'polarity').annotate(count=Count('id')):
+        aspect_counts[aspect_labels[row['aspect']]][polarity_keys[row['polarity']]] = row['count']
+
+    search = {
+        'q': request.GET.get('q', '').strip(),
+        'sentiment': request.GET.get('sentiment') or None,
+        'category': request.GET.get('category') or None,
+        'from': request.GET.get('from', ''),
+        'to': request.GET.get('to', ''),
+    }
+    if any(search.values()):
+        date_from = parse_date(search['from']) if search['from'] else None
+        date_to = parse_date(search['to']) if search['to'] else None
+        ids = search_feedback(
+            search['q'],
+            sentiment=search['sentiment'],
+            category=search['category'],
+            date_from=_start_of_day(date_from),
+            # Inclusive of the whole "to" day
+            date_to=_start_of_day(date_to + timedelta(days=1)) if date_to else None,
+            limit=FEEDBACK_SEARCH_LIMIT,
+        )
+        found = Feedback.objects.select_related('order').in_bulk(ids)
+        feedbacks = [found[i] for i in ids if i in found]
+
     return render(request, 'admin_feedback.html', {
         'feedbacks': feedbacks,
+        'search': search,
+        'category_choices': Feedback.CATEGORY_CHOICES,
+        'sentiment_choices': Feedback.SENTIMENT_CHOICES,
         'positive_count': positive_count,
         'negative_count': negative_count,
         'neutral_count': neutral_count,
         'emotion_counts': emotion_counts,
+        'aspect_counts': aspect_counts,
     })
 
 
+def _start_of_day(day):
+    if day is None:
+        return None
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _date_params(request):
+    """
+    ?from= and ?to= as dates, None when absent; ValueError when malformed
+    """
+    dates = []
+    for key in ('from', 'to'):
+        value = request.GET.get(key)
+        try:
+            day = parse_date(value) if value else None
+        except ValueError:
+            day = None
+        if value and day is None:
+            raise ValueError(f'Invalid {key} date: {value}')
+        dates.append(day)
+    return dates
+
+
+def _analytics_range(request):
+    date_from, date_to = _date_params(request)
+    date_to = date_to or timezone.localdate()
+    date_from = date_from or date_to - timedelta(days=settings.ANALYTICS_DEFAULT_DAYS - 1)
+    return date_from, date_to
+
+
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+@read_from_replica
+def admin_analytics(request):
+    """
+    Sales dashboard: revenue by day and category, peak hours, ticket size and
+    table turnover over ?from=..&to= (default the last ANALYTICS_DEFAULT_DAYS days)
+    """
+    report = error = None
+    try:
+        date_from, date_to = _analytics_range(request)
+        report = sales_report(date_from, date_to)
+    except (ValueError, RuntimeError) as e:
+        date_from, date_to = request.GET.get('from', ''), request.GET.get('to', '')
+        error = str(e)
+
+    context = {'report': report, 'error': error, 'date_from': str(date_from), 'date_to': str(date_to)}
+    if report:
+        context.update({
+            'max_hour_orders': max(hour['orders'] for hour in report['hours']) or 1,
+            'max_daily_revenue': max((day['revenue'] for day in report['daily']), default=0) or 1,
+        })
+    return render(request, 'admin_analytics.html', context)
+
+
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+@read_from_replica
+def admin_analytics_data(request):
+    """
+    API endpoint for the sales report shown by admin_analytics
+    """
+    try:
+        date_from, date_to = _analytics_range(request)
+        report = sales_report(date_from, date_to)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except RuntimeError as e:
+        return JsonResponse({'error': str(e)}, status=503)
+    return FastJsonResponse(report)
+
+
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+def admin_export(request, name):
+    """
+    Download orders (one row per item) or feedback as ?format=csv or xlsx,
+    optionally limited to ?from=YYYY-MM-DD&to=YYYY-MM-DD inclusive. CSV is
+    streamed as rows are read; XLSX is built in a temporary file first.
+    """
+    export = exports.EXPORTS.get(name)
+    if export is None:
+        return JsonResponse({'error': f'Unknown export: {name}'}, status=404)
+    file_format = request.GET.get('format', 'csv')
+    if file_format not in exports.FORMATS:
+        return JsonResponse({'error': f"format must be one of {', '.join(exports.FORMATS)}"}, status=400)
+    try:
+        date_from, date_to = _date_params(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    date_from = _start_of_day(date_from)
+    # Inclusive of the whole "to" day
+    date_to = _start_of_day(date_to + timedelta(days=1)) if date_to else None
+
+    filename = f"{name}-{timezone.now():%Y%m%d}.{file_format}"
+    if file_format == 'xlsx':
+        if not exports.XLSX_AVAILABLE:
+            return JsonResponse({'error': 'XLSX export needs xlsxwriter; use format=csv'}, status=501)
+        target = tempfile.TemporaryFile()
+        rows = exports.write_xlsx(export, target, date_from, date_to)
+        target.seek(0)
+        logger.info(f"Exported {rows} {name} rows as XLSX for {request.user}")
+        return FileResponse(target, as_attachment=True, filename=filename, content_type=exports.CONTENT_TYPES['xlsx'])
+
+    # Under ASGI a sync iterator would be read to the end before sending
+    if isinstance(request, ASGIRequest):
+        chunks = exports.acsv_chunks(export, date_from, date_to)
+    else:
+        chunks = exports.csv_chunks(export, date_from, date_to)
+    response = StreamingHttpResponse(chunks, content_type=exports.CONTENT_TYPES['csv'])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+def admin_cache_stats(request):
+    """
+    API endpoint for page and menu fragment cache hit rates in this worker
+    """
+    return JsonResponse({'caches': cache_stats()})
+
+
 def admin_logout(request):
     logout(request)
     return redirect('admin_login')
@@ -0,0 +1,242 @@
+"""
+Discount voucher issuing and redemption
+Codes carry a check character, so mistyped codes are rejected without a
+query, and are prechecked against an in-process bloom filter; a voucher is
+consumed by a single conditional UPDATE, so it can only be spent once
+"""
+
+import hashlib
+import math
+import re
+import secrets
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import DiscountVoucher
+from .caching import voucher_version, cache_is_shared
+
+PREFIX = 'SORRY'
+# No 0/O or 1/I, so codes survive being read out or retyped
+ALPHABET = '23456789ABCDEFGHJKLMNPQRSTUVWXYZ'
+RANDOM_LENGTH = 8
+# Codes issued before check characters: SORRY + 6 uuid hex digits
+LEGACY_CODE = re.compile(r'^SORRY[0-9A-F]{6}$')
+ISSUE_ATTEMPTS = 5
+# Vouchers from concurrent transactions can commit out of id order, so a
+# catch-up re-reads this many ids below the highest one already loaded
+CATCH_UP_OVERLAP = 100
+
+
+def _check_char(body):
+    digest = hashlib.blake2b(body.encode(), digest_size=2).digest()
+    return ALPHABET[int.from_bytes(digest, 'big') % len(ALPHABET)]
+
+
+def new_code():
+    body = PREFIX + ''.join(secrets.choice(ALPHABET) for _ in range(RANDOM_LENGTH))
+    return body + _check_char(body)
+
+
+def normalize_code(code):
+    return re.sub(r'[\s-]', '', code or '').upper()
+
+
+def well_formed(code):
+    """
+    Whether `code` could be a voucher code; a typo fails the check character
+    31 times in 32
+    """
+    if LEGACY_CODE.match(code):
+        return True
+    if len(code) != len(PREFIX) + RANDOM_LENGTH + 1 or not code.startswith(PREFIX):
+        return False
+    body = code[:-1]
+    return all(c in ALPHABET for c in body[len(PREFIX):]) and code[-1] == _check_char(body)
+
+
+def redeemable(now=None):
+    now = now or timezone.now()
+    return DiscountVoucher.objects.filter(is_used=False, is_expired=False).filter(
+        Q(expires_at__isnull=True) | Q(expires_at__gt=now)
+    )
+
+
+class VoucherFilter:
+    """
+    Bloom filter over redeemable voucher codes.
+
+    A code it rejects is refused without a query; at
+    VOUCHER_FILTER_ERROR_RATE a made-up code still gets through to the
+    database. Vouchers issued by any process bump voucher_version, and the
+    filter reads just those rows when it sees the version change. Without a
+    shared cache (REDIS_URL) that version only moves for this process's own
+    vouchers, so the filter also catches up every VOUCHER_FILTER_MAX_AGE
+    seconds; a code issued by another worker may be refused as unknown for
+    that long. Spent and expired codes stay in until the filter outgrows its
+    capacity and is rebuilt; the database check still refuses them.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        self.max_id = 0
+        self.version = None
+        self.caught_up_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls.load()
+        return cls._shared
+
+    @classmethod
+    def reset_shared(cls):
+        with cls._shared_lock:
+            cls._shared = None
+
+    @classmethod
+    def load(cls):
+        # Read the version first: a voucher issued during the load then
+        # shows up as a version change and is caught up
+        version = voucher_version()
+        rows = list(redeemable().values_list('id', 'voucher_code'))
+        voucher_filter = cls(max(settings.VOUCHER_FILTER_CAPACITY, 2 * len(rows)), settings.VOUCHER_FILTER_ERROR_RATE)
+        for pk, code in rows:
+            voucher_filter.add(pk, code)
+        voucher_filter.max_id = DiscountVoucher.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        voucher_filter.version = version
+        return voucher_filter
+
+    def _positions(self, code):
+        digest = hashlib.blake2b(code.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, pk, code):
+        for position in self._positions(code):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+        self.max_id = max(self.max_id, pk)
+
+    def __contains__(self, code):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(code))
+
+    def _due(self, version):
+        if version != self.version:
+            return True
+        # Other workers' vouchers only move a shared cache's version
+        return not cache_is_shared() and time.monotonic() - self.caught_up_at > settings.VOUCHER_FILTER_MAX_AGE
+
+    def catch_up(self):
+        """
+        Add vouchers issued since the last load; one cache read when none were
+        """
+        version = voucher_version()
+        if not self._due(version):
+            return
+        with self._lock:
+            if not self._due(version):
+                return
+            rows = DiscountVoucher.objects.filter(id__gt=self.max_id - CATCH_UP_OVERLAP).values_list('id', 'voucher_code')
+            for pk, code in rows:
+                self.add(pk, code)
+            self.version = version
+            self.caught_up_at = time.monotonic()
+
+
+def voucher_filter():
+    current = VoucherFilter.shared()
+    current.catch_up()
+    if current.count > current.capacity:
+        # Past capacity the false-positive rate climbs; rebuilding also drops spent codes
+        VoucherFilter.reset_shared()
+        current = VoucherFilter.shared()
+    return current
+
+
+def issue_voucher(feedback, customer_name, discount_percentage=10):
+    """
+    Create a voucher with a fresh code, valid for VOUCHER_VALID_DAYS
+    """
+    expires_at = timezone.now() + timedelta(days=settings.VOUCHER_VALID_DAYS)
+    for _ in range(ISSUE_ATTEMPTS):
+        try:
+            # A savepoint, so a collision doesn't break an enclosing transaction
+            with transaction.atomic():
+                return DiscountVoucher.objects.create(
+                    customer_name=customer_name,
+                    feedback=feedback,
+                    voucher_code=new_code(),
+                    discount_percentage=discount_percentage,
+                    expires_at=expires_at,
+                )
+        except IntegrityError:
+            # Code already taken (about 1 in 10^12 per draw); draw another
+            continue
+    raise RuntimeError(f"No unique voucher code after {ISSUE_ATTEMPTS} attempts")
+
+
+def claim_voucher(code):
+    """
+    Mark the voucher with `code` used and return (code, discount percentage).
+    ValueError, with a message for the customer, when it can't be redeemed.
+
+    The checks and the write are one conditional UPDATE, so when two orders
+    race for the same voucher exactly one of them gets it. Claim inside the
+    transaction that places the order, so an order that fails gives the
+    voucher back.
+    """
+    code = normalize_code(code)
+    if not well_formed(code) or code not in voucher_filter():
+        raise ValueError('Unknown voucher code')
+
+    now = timezone.now()
+    if not redeemable(now).filter(voucher_code=code).update(is_used=True, used_at=now):
+        raise ValueError(_refusal(code))
+    discount = DiscountVoucher.objects.filter(voucher_code=code).values_list('discount_percentage', flat=True).get()
+    return code, discount
+
+
+def _refusal(code):
+    voucher = DiscountVoucher.objects.filter(voucher_code=code).values('is_used', 'is_expired', 'expires_at').first()
+    if voucher is None:
+        return 'Unknown voucher code'
+    if voucher['is_used']:
+        return 'This voucher has already been used'
+    return 'This voucher has expired'
+
+
+def attach_voucher(code, order):
+    DiscountVoucher.objects.filter(voucher_code=code).update(order=order)
+
+
+def expire_vouchers(now=None, batch_size=None):
+    """
+    Flag unused vouchers past their expiry date, in batches so no single
+    UPDATE holds locks for long; returns how many were expired
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or settings.VOUCHER_EXPIRY_BATCH_SIZE
+    due = DiscountVoucher.objects.filter(is_used=False, is_expired=False, expires_at__lte=now)
+    expired = 0
+    while True:
+        ids = list(due.order_by('expires_at').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return expired
+        # Re-checked in the UPDATE: a voucher redeemed meanwhile stays used, not expired
+        expired += due.filter(id__in=ids).update(is_expired=True)
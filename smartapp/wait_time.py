@@ -0,0 +1,264 @@
+"""
+Kitchen-load-aware wait time estimation
+Keeps live kitchen load and learned per-dish prep durations in memory
+"""
+
+import threading
+from django.conf import settings
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .models import Order, OrderItem, KDS
+
+# Orders in these states are still occupying the kitchen
+QUEUED_STATUSES = ('pending', 'preparing')
+
+
+def legacy_wait_time(item_count):
+    """
+    The original flat estimate: 15 minutes + 2 minutes per item, capped at 45
+    """
+    return min(15 + item_count * 2, 45)
+
+
+class RollingPrepStat:
+    """
+    Exponentially weighted mean/variance of prep durations (minutes)
+    """
+
+    __slots__ = ('mean', 'var', 'count')
+
+    def __init__(self):
+        self.mean = 0.0
+        self.var = 0.0
+        self.count = 0
+
+    def add(self, minutes, alpha):
+        if self.count == 0:
+            self.mean = float(minutes)
+        else:
+            diff = minutes - self.mean
+            incr = alpha * diff
+            self.mean += incr
+            self.var = (1 - alpha) * (self.var + diff * incr)
+        self.count += 1
+
+
+class WaitTimeEstimator:
+    """
+    Estimates order wait time from the dishes ordered and the current kitchen load.
+
+    The ETA for a new order is the learned prep time of its slowest dish (or the
+    default plus a per-item increment while there is no history), plus the backlog
+    queued in the categories it shares with orders already in the kitchen, spread
+    over the configured number of stations.
+    Every lookup is a dict access, so estimating costs the same regardless of how
+    busy the kitchen is.
+
+    State lives in the process; each worker rebuilds it from the database on first
+    use and `recalculate_queue()` brings stored ETAs back in line with it.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self):
+        self.default_prep = getattr(settings, 'WAIT_TIME_DEFAULT_PREP', 15)
+        self.item_minutes = getattr(settings, 'WAIT_TIME_ITEM_MINUTES', 2)
+        self.max_wait = getattr(settings, 'WAIT_TIME_MAX', 90)
+        self.min_samples = getattr(settings, 'WAIT_TIME_MIN_SAMPLES', 3)
+        self.alpha = getattr(settings, 'WAIT_TIME_SMOOTHING', 0.2)
+        self.stations = max(1, getattr(settings, 'KITCHEN_STATIONS', 4))
+
+        self._lock = threading.RLock()
+        self.dish_stats = {}
+        self.category_stats = {}
+        self.queued_by_category = {}
+        self.order_load = {}
+
+    @classmethod
+    def shared(cls):
+        """
+        Process-wide estimator, loaded from the database on first use
+        """
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    estimator = cls()
+                    estimator.load_from_db()
+                    cls._shared = estimator
+        return cls._shared
+
+    @classmethod
+    def reset_shared(cls):
+        with cls._shared_lock:
+            cls._shared = None
+
+    # Learning
+
+    def learn(self, items, minutes):
+        """
+        Record a finished order's prep duration against each of its dishes.
+        KDS only times whole orders, so every dish in the order gets the same sample.
+        """
+        if minutes is None or minutes <= 0:
+            return
+        with self._lock:
+            for name, category in {(i['name'], i['category']) for i in items}:
+                self.dish_stats.setdefault(name, RollingPrepStat()).add(minutes, self.alpha)
+                self.category_stats.setdefault(category, RollingPrepStat()).add(minutes, self.alpha)
+
+    def prep_minutes(self, name, category):
+        stat = self.dish_stats.get(name)
+        if stat is not None and stat.count >= self.min_samples:
+            return stat.mean
+        stat = self.category_stats.get(category)
+        if stat is not None and stat.count >= self.min_samples:
+            return stat.mean
+        return self.default_prep
+
+    # Kitchen load
+
+    def order_queued(self, order_id, items):
+        with self._lock:
+            if order_id in self.order_load:
+                return
+            load = {}
+            for item in items:
+                load[item['category']] = load.get(item['category'], 0) + item['quantity']
+            self.order_load[order_id] = load
+            for category, qty in load.items():
+                self.queued_by_category[category] = self.queued_by_category.get(category, 0) + qty
+
+    def order_done(self, order_id):
+        with self._lock:
+            load = self.order_load.pop(order_id, None)
+            if not load:
+                return
+            for category, qty in load.items():
+                remaining = self.queued_by_category.get(category, 0) - qty
+                if remaining > 0:
+                    self.queued_by_category[category] = remaining
+                else:
+                    self.queued_by_category.pop(category, None)
+
+    def queued_items(self):
+        return sum(self.queued_by_category.values())
+
+    # Estimation
+
+    def estimate(self, items, queued_by_category=None):
+        """
+        ETA in whole minutes for an order of `items` ({'name', 'category', 'quantity'})
+        """
+        if queued_by_category is None:
+            queued_by_category = self.queued_by_category
+        if not items:
+            return int(round(self.default_prep))
+
+        with self._lock:
+            base = 0.0
+            item_count = 0
+            backlog = 0
+            for item in items:
+                base = max(base, self.prep_minutes(item['name'], item['category']))
+                item_count += item['quantity']
+            for category in {item['category'] for item in items}:
+                backlog = max(backlog, queued_by_category.get(category, 0))
+
+        # Learned prep times already include typical order sizes, so the per-item
+        # increment only applies on top of the default
+        eta = base
+        if base == self.default_prep:
+            eta += self.item_minutes * max(item_count - 1, 0)
+        eta += backlog * self.item_minutes / self.stations
+        return int(min(max(round(eta), 1), self.max_wait))
+
+    def recalculate_queue(self):
+        """
+        Re-estimate every queued order in FIFO order and store the new ETAs.
+        Each order only waits behind the orders placed before it.
+        Returns the number of orders whose estimate changed.
+        """
+        now = timezone.now()
+        orders = list(
+            Order.objects.filter(status__in=QUEUED_STATUSES)
+            .prefetch_related(Prefetch('items', queryset=OrderItem.objects.only(
+                'order_id', 'item_name', 'category', 'quantity')))
+            .order_by('order_time')
+        )
+
+        ahead = {}
+        changed = []
+        with self._lock:
+            for order in orders:
+                items = _order_items(order)
+                elapsed = (now - order.order_time).total_seconds() / 60
+                eta = self.estimate(items, queued_by_category=ahead)
+                new_wait = int(round(elapsed)) + eta
+                if new_wait != order.estimated_wait_time:
+                    order.estimated_wait_time = new_wait
+                    changed.append(order)
+                for item in items:
+                    ahead[item['category']] = ahead.get(item['category'], 0) + item['quantity']
+
+        Order.objects.bulk_update(changed, ['estimated_wait_time'], batch_size=500)
+        return len(changed)
+
+    def load_from_db(self):
+        """
+        Rebuild learned prep times from KDS history and the current kitchen load
+        """
+        history = (
+            KDS.objects.filter(kitchen_status='Ready', start_time__isnull=False, ready_time__isnull=False)
+            .select_related('order')
+            .prefetch_related(Prefetch('order__items', queryset=OrderItem.objects.only(
+                'order_id', 'item_name', 'category', 'quantity')))
+            .order_by('ready_time')
+        )
+        for kds in history.iterator(chunk_size=1000):
+            minutes = (kds.ready_time - kds.start_time).total_seconds() / 60
+            self.learn(_order_items(kds.order), minutes)
+
+        queued = (
+            Order.objects.filter(status__in=QUEUED_STATUSES)
+            .prefetch_related(Prefetch('items', queryset=OrderItem.objects.only(
+                'order_id', 'item_name', 'category', 'quantity')))
+        )
+        for order in queued.iterator(chunk_size=1000):
+            self.order_queued(order.id, _order_items(order))
+
+
+def _order_items(order):
+    return [
+        {'name': item.item_name, 'category': item.category, 'quantity': item.quantity}
+        for item in order.items.all()
+    ]
+
+
+def cart_items(cart, allergen_conflicts=None):
+    """
+    Normalise a submit_order cart into estimator items, carrying each item's
+    allergen conflict bits for the kitchen scheduler
+    """
+    allergen_conflicts = allergen_conflicts or [0] * len(cart)
+    return [
+        {
+            'name': item.get('name'),
+            'category': item.get('category', 'General'),
+            'quantity': int(item.get('quantity', 1)),
+            'allergen_conflicts': conflicts,
+        }
+        for item, conflicts in zip(cart, allergen_conflicts)
+    ]
+
+
+def record_kitchen_ready(kds):
+    """
+    Feed a finished KDS ticket back into the shared estimator
+    """
+    estimator = WaitTimeEstimator.shared()
+    if kds.start_time and kds.ready_time:
+        minutes = (kds.ready_time - kds.start_time).total_seconds() / 60
+        estimator.learn(_order_items(kds.order), minutes)
+    estimator.order_done(kds.order_id)